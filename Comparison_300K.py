@@ -19,11 +19,9 @@ get_ipython().run_line_magic('config', "InlineBackend.figure_format = 'retina'")
 # In[2]:
 
 
-import matplotlib.pyplot as plt
 import numpy as np
-import pandas as pd
-from uncertainties import unumpy as unp
 import pytheos as eos
+import pscale
 
 
 # # 2. Data Input
@@ -38,8 +36,9 @@ import pytheos as eos
 # In[3]:
 
 
-data_PMN_300 = pd.read_csv('./data/Pt_MgO_Ne_300K.csv')
-data_AMN_300 = pd.read_csv('./data/Au_MgO_Ne_300K.csv')
+store = pscale.DataStore('./data')
+data_PMN_300 = store['Pt_MgO_Ne_300K']
+data_AMN_300 = store['Au_MgO_Ne_300K']
 
 
 # In[12]:
@@ -87,37 +86,12 @@ std_Pt =[ eos.platinum.Fei2007bm3(), eos.platinum.Dorogokupets2007(),
 # In[6]:
 
 
-p_MgO_PMN = []; p_MgO_AMN = []; p_Pt_PMN = []; p_Au_AMN = [] 
-for i in range(4):
-    p_MgO_PMN_t = std_MgO[i].cal_p(unp.uarray(v_MgO_PMN, s_v_MgO_PMN), 300.*np.ones(v_Pt_PMN.size))
-    p_MgO_AMN_t = std_MgO[i].cal_p(unp.uarray(v_MgO_AMN, s_v_MgO_AMN), 300.*np.ones(v_Au_AMN.size))
-    p_Pt_PMN_t = std_Pt[i].cal_p(unp.uarray(v_Pt_PMN, s_v_Pt_PMN), 300.*np.ones(v_Pt_PMN.size))
-    p_Au_AMN_t = std_Au[i].cal_p(unp.uarray(v_Au_AMN, s_v_Au_AMN), 300.*np.ones(v_Au_AMN.size))
-    p_MgO_PMN.append(p_MgO_PMN_t)
-    p_MgO_AMN.append(p_MgO_AMN_t)
-    p_Pt_PMN.append(p_Pt_PMN_t)
-    p_Au_AMN.append(p_Au_AMN_t)
+dp_PMN = pscale.dp_dataset(data_PMN_300, std_Pt, std_MgO)
+dp_AMN = pscale.dp_dataset(data_AMN_300, std_Au, std_MgO)
 
 
 # In[7]:
 
 
-f, axarr = plt.subplots(2, 2,                     figsize=(8,6))
-ax = [axarr[0,0], axarr[0,1], axarr[1,0], axarr[1,1]]
-ms = 8; mew = 0.7
-label = ['a', 'b', 'c', 'd']
-
-for i in range(4):
-    ax[i].axhline(y=0, c='k', ls=':')
-    ax[i].errorbar(unp.nominal_values(p_MgO_AMN[i]),             unp.nominal_values(p_Au_AMN[i]) - unp.nominal_values(p_MgO_AMN[i]),             xerr = unp.std_devs(p_MgO_AMN[i]),            yerr = unp.std_devs(p_Au_AMN[i]),            fmt='bo', mec='w', mew=mew, label = 'Au',             ms=ms, capsize=0, lw=0.4)
-    ax[i].errorbar(unp.nominal_values(p_MgO_PMN[i]),             unp.nominal_values(p_Pt_PMN[i]) - unp.nominal_values(p_MgO_PMN[i]),             xerr = unp.std_devs(p_MgO_PMN[i]),            yerr = unp.std_devs(p_Pt_PMN[i]),             fmt='ro', mec='w', mew=mew, label="Pt",             ms=ms, capsize=0, lw=0.4)
-    ax[i].set_xlabel('P(MgO) (GPa)'); ax[i].set_ylabel('$\mathdefault{{\Delta} P}$ (GPa)')
-    l = ax[i].legend(loc=3, numpoints = 1, fontsize = 10)
-    l.get_frame().set_linewidth(0.5)
-    plt.tight_layout(pad=0.4)
-    ax[i].set_ylim(-5.,3.); ax[i].set_xlim(0.,140.)
-    ax[i].set_xticks(ax[i].get_xticks()[::2]); ax[i].set_yticks(ax[i].get_yticks()[::2])
-    ax[i].text(0.08, 0.83,label[i], horizontalalignment='center',            verticalalignment='bottom', transform = ax[i].transAxes,              fontsize = 24)
-
-plt.savefig('f-Compare-300K.pdf', bbox_inches='tight',                         pad_inches=0.1)
+fig = pscale.plot_dp([dp_AMN, dp_PMN], 'f-Compare-300K.pdf', markers=('Au', 'Pt'), xerr=True, xlim=(0., 140.), ylim=(-5., 3.), thin_yticks=True)
 
@@ -19,11 +19,9 @@ get_ipython().run_line_magic('config', "InlineBackend.figure_format = 'retina'")
 # In[2]:
 
 
-import matplotlib.pyplot as plt
 import numpy as np
-import pandas as pd
-from uncertainties import unumpy as unp
 import pytheos as eos
+import pscale
 
 
 # # 2. Data Input
@@ -38,8 +36,9 @@ import pytheos as eos
 # In[3]:
 
 
-data_PM = pd.read_csv('./data/Pt_MgO_HiT.csv')
-data_AM = pd.read_csv('./data/Au_MgO_HiT.csv')
+store = pscale.DataStore('./data')
+data_PM = store['Pt_MgO_HiT']
+data_AM = store['Au_MgO_HiT']
 
 
 # In[9]:
@@ -84,43 +83,46 @@ std_Pt =[ eos.platinum.Fei2007bm3(), eos.platinum.Dorogokupets2007(),
 
 # # 3. Comparing scales
 
+# * P(marker) and P(MgO) of a point share its temperature.  The error bars of $\Delta P$ include this correlation.
+
 # In[7]:
 
 
-p_MgO_PM = []; p_MgO_AM = []; p_Pt_PM = []; p_Au_AM = [] 
-for i in range(4):
-    p_MgO_PM_t = std_MgO[i].cal_p(unp.uarray(v_MgO_PM,s_v_MgO_PM), unp.uarray(T_PM, s_T_PM))
-    p_MgO_AM_t = std_MgO[i].cal_p(unp.uarray(v_MgO_AM,s_v_MgO_AM), unp.uarray(T_AM, s_T_AM))
-    p_Pt_PM_t = std_Pt[i].cal_p(unp.uarray(v_Pt_PM,s_v_Pt_PM), unp.uarray(T_PM, s_T_PM))
-    p_Au_AM_t = std_Au[i].cal_p(unp.uarray(v_Au_AM,s_v_Au_AM), unp.uarray(T_AM, s_T_AM))
-    p_MgO_PM.append(p_MgO_PM_t)
-    p_MgO_AM.append(p_MgO_AM_t)
-    p_Pt_PM.append(p_Pt_PM_t)
-    p_Au_AM.append(p_Au_AM_t)
+dp_PM = pscale.dp_dataset(data_PM, std_Pt, std_MgO)
+dp_AM = pscale.dp_dataset(data_AM, std_Au, std_MgO)
 
 
 # In[8]:
 
 
-f, axarr = plt.subplots(2, 2,                     figsize=(8,6))
-ax = [axarr[0,0], axarr[0,1], axarr[1,0], axarr[1,1]]
-ms = 8; mew = 0.7
-label = ['a', 'b', 'c', 'd']
+fig = pscale.plot_dp([dp_AM, dp_PM], 'f-Compare-HighT.pdf', markers=('Au', 'Pt'), xerr=False, xlim=(0., 160.), ylim=(-8., 4.))
+
+
+# * $\Delta P$(P) trends are quadratic fits, the ranges are 95% bootstrap intervals of $10^4$ resamples.
+
+# In[12]:
 
-for i in range(4):
-    ax[i].axhline(y=0, c='k', ls=':')
-    ax[i].errorbar(unp.nominal_values(p_MgO_AM[i]),             unp.nominal_values(p_Au_AM[i]) - unp.nominal_values(p_MgO_AM[i]),             yerr = unp.std_devs(p_Au_AM[i]),             fmt='bo', mec='w', mew=mew, label = 'Au',             ms=ms, capsize=0, lw=0.4)
-    ax[i].errorbar(unp.nominal_values(p_MgO_PM[i]),             unp.nominal_values(p_Pt_PM[i]) - unp.nominal_values(p_MgO_PM[i]),             yerr = unp.std_devs(p_Pt_PM[i]),             fmt='ro', mec='w', mew=mew, label="Pt",             ms=ms, capsize=0, lw=0.4)
-    ax[i].set_xlabel('P(MgO) (GPa)'); ax[i].set_ylabel('$\mathdefault{{\Delta} P}$ (GPa)')
-    l = ax[i].legend(loc=3, numpoints = 1, fontsize = 10)
-    l.get_frame().set_linewidth(0.5)
-    plt.tight_layout(pad=0.4)
-    ax[i].set_ylim(-8.,4.); ax[i].set_xlim(0.,160.)
-    ax[i].set_xticks(ax[i].get_xticks()[::2])
-    ax[i].text(0.08, 0.83,label[i], horizontalalignment='center',            verticalalignment='bottom', transform = ax[i].transAxes,              fontsize = 24)
 
-plt.savefig('f-Compare-HighT.pdf', bbox_inches='tight',                         pad_inches=0.1)
+tr_AM = pscale.dp_trend(dp_AM.p_mgo, dp_AM.dp, dp_AM.s_dp, at=(24., 135.))
+tr_PM = pscale.dp_trend(dp_PM.p_mgo, dp_PM.dp, dp_PM.s_dp, at=(24., 135.))
+lo, hi = np.percentile(tr_AM.samples - tr_PM.samples, [2.5, 97.5], axis=0)
+for i in range(4):
+    for j, p in enumerate(tr_AM.at):
+        print('{}  {:5.0f} GPa  Au - Pt {:5.2f} [{:5.2f}, {:5.2f}] GPa'.format(
+            'abcd'[i], p, tr_AM.fit[i, j] - tr_PM.fit[i, j], lo[i, j], hi[i, j]))
 
 
 # * A 3 GPa difference at 24 GPa is clearly visible between Au and Pt throughout the comparisons.
 # * MgO scale is severe need for improvements in any cases.
+
+# # 4. Cross-calibration
+
+# * Pressure offsets of all scales fitted jointly to both datasets, relative to MgO-Speziale2001.
+# * `thermal=True` also fits a scaling of the thermal pressure of every scale.
+
+# In[11]:
+
+
+cal = pscale.calibrate([data_AM, data_PM], {'MgO': std_MgO, 'Au': std_Au, 'Pt': std_Pt}, thermal=False)
+for name, a, s_a in zip(cal.names, cal.params[:, 0], cal.sigma[:, 0]):
+    print('{:<22s} {:6.2f} +/- {:.2f} GPa'.format(name, a, s_a))
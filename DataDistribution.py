@@ -19,11 +19,14 @@ get_ipython().run_line_magic('config', "InlineBackend.figure_format = 'retina'")
 # In[8]:
 
 
+import os
 import matplotlib.pyplot as plt
 import numpy as np
-import pandas as pd
-from uncertainties import unumpy as unp
 import pytheos as eos
+import pscale
+
+# cache pressures only when PSCALE_CACHE_DIR names a cache directory
+cache = 'PSCALE_CACHE_DIR' in os.environ
 
 
 # # 2. Data Input
@@ -38,10 +41,11 @@ import pytheos as eos
 # In[9]:
 
 
-data_PM = pd.read_csv('./data/Pt_MgO_HiT.csv')
-data_AM = pd.read_csv('./data/Au_MgO_HiT.csv')
-data_PMN_300 = pd.read_csv('./data/Pt_MgO_Ne_300K.csv')
-data_AMN_300 = pd.read_csv('./data/Au_MgO_Ne_300K.csv')
+store = pscale.DataStore('./data')
+data_PM = store['Pt_MgO_HiT']
+data_AM = store['Au_MgO_HiT']
+data_PMN_300 = store['Pt_MgO_Ne_300K']
+data_AMN_300 = store['Au_MgO_Ne_300K']
 
 
 # In[10]:
@@ -89,16 +93,21 @@ std_Pt  = eos.platinum.Dorogokupets2007()
 # In[12]:
 
 
-p_MgO_PM = std_MgO.cal_p(unp.uarray(v_MgO_PM, s_v_MgO_PM), unp.uarray(T_PM, s_T_PM))
-p_MgO_AM = std_MgO.cal_p(unp.uarray(v_MgO_AM, s_v_MgO_AM), unp.uarray(T_AM, s_T_AM))
-p_Pt_PM = std_Pt.cal_p(unp.uarray(v_Pt_PM, s_v_Pt_PM), unp.uarray(T_PM, s_T_PM))
-p_Au_AM = std_Au.cal_p(unp.uarray(v_Au_AM, s_v_Au_AM), unp.uarray(T_AM, s_T_AM))
+p_MgO_PM, s_p_MgO_PM = pscale.cal_p_linear(std_MgO, v_MgO_PM, T_PM, s_v=s_v_MgO_PM, s_temp=s_T_PM, cache=cache)
+p_MgO_AM, s_p_MgO_AM = pscale.cal_p_linear(std_MgO, v_MgO_AM, T_AM, s_v=s_v_MgO_AM, s_temp=s_T_AM, cache=cache)
+p_Pt_PM, s_p_Pt_PM = pscale.cal_p_linear(std_Pt, v_Pt_PM, T_PM, s_v=s_v_Pt_PM, s_temp=s_T_PM, cache=cache)
+p_Au_AM, s_p_Au_AM = pscale.cal_p_linear(std_Au, v_Au_AM, T_AM, s_v=s_v_Au_AM, s_temp=s_T_AM, cache=cache)
+
+p_MgO_PMN, s_p_MgO_PMN = pscale.cal_p_linear(std_MgO, v_MgO_PMN, T_PMN, s_v=s_v_MgO_PMN, cache=cache)
+p_MgO_AMN, s_p_MgO_AMN = pscale.cal_p_linear(std_MgO, v_MgO_AMN, T_AMN, s_v=s_v_MgO_AMN, cache=cache)
+p_Pt_PMN, s_p_Pt_PMN = pscale.cal_p_linear(std_Pt, v_Pt_PMN, T_PMN, s_v=s_v_Pt_PMN, cache=cache)
+p_Au_AMN, s_p_Au_AMN = pscale.cal_p_linear(std_Au, v_Au_AMN, T_AMN, s_v=s_v_Au_AMN, cache=cache)
+
+geo = pscale.geotherm(std_MgO, np.linspace(24., 135., 112), t_anchor=1873., p_anchor=24., cache=cache)
 
-p_MgO_PMN = std_MgO.cal_p(unp.uarray(v_MgO_PMN,s_v_MgO_PMN), T_PMN)
-p_MgO_AMN = std_MgO.cal_p(unp.uarray(v_MgO_AMN,s_v_MgO_AMN), T_AMN)
-p_Pt_PMN = std_Pt.cal_p(unp.uarray(v_Pt_PMN,s_v_Pt_PMN), T_PMN)
-p_Au_AMN = std_Au.cal_p(unp.uarray(v_Au_AMN,s_v_Au_AMN), T_AMN)
 
+# * The gray band is the mantle temperature of the paper, 1873 K at 660 km (24 GPa) to 2505 K at the CMB (135 GPa).
+# * The dashed line is the adiabat of MgO-D07 through 1873 K at 24 GPa from `pscale.geotherm`.  It neglects the entropy of the electronic and anharmonic terms of the scale.
 
 # In[13]:
 
@@ -106,19 +115,20 @@ p_Au_AMN = std_Au.cal_p(unp.uarray(v_Au_AMN,s_v_Au_AMN), T_AMN)
 f, ax = plt.subplots(1, 1,                     figsize=(6,4))
 ms = 8; mew = 1
 
-ax.errorbar(unp.nominal_values(p_MgO_AM), T_AM, #            xerr = unp.std_devs(p_MgO_AM), yerr = s_T_AM, \
+ax.errorbar(p_MgO_AM, T_AM, #            xerr = s_p_MgO_AM, yerr = s_T_AM, \
             fmt='o', mfc='None', mec='b', mew=mew, label = 'Au+MgO', \
             ms=ms, capsize=0, lw=0.4, ecolor='b')
-ax.errorbar(unp.nominal_values(p_MgO_PM), T_PM, #            xerr = unp.std_devs(p_MgO_PM), yerr = s_T_PM, \
+ax.errorbar(p_MgO_PM, T_PM, #            xerr = s_p_MgO_PM, yerr = s_T_PM, \
             fmt='o', mfc='None', mec='r', mew=mew, label="Pt+MgO", \
             ms=ms, capsize=0, lw=0.4, ecolor='r')
-ax.errorbar(unp.nominal_values(p_MgO_AMN), T_AMN, #            xerr = unp.std_devs(p_MgO_AMN), \
+ax.errorbar(p_MgO_AMN, T_AMN, #            xerr = s_p_MgO_AMN, \
             fmt='o', mfc='None', mec='b', mew=mew, \
             ms=ms, capsize=0, lw=0.4, ecolor='b')
-ax.errorbar(unp.nominal_values(p_MgO_PMN), T_PMN, #            xerr = unp.std_devs(p_MgO_PMN), \
+ax.errorbar(p_MgO_PMN, T_PMN, #            xerr = s_p_MgO_PMN, \
             fmt='o', mfc='None', mec='r', mew=mew, \
             ms=ms, capsize=0, lw=0.4, ecolor='r')
 ax.plot([24.,135.], [1873., 2505.], 'k-', zorder=0, lw=15, alpha=0.3)
+ax.plot(geo.p, geo.temp[0], 'k--', zorder=0, lw=1, label='MgO-D07 adiabat')
 ax.set_xlabel('Pressure (GPa)'); ax.set_ylabel('Temperature (K)')
 l = ax.legend(loc='upper left', numpoints = 1, fontsize = 10,              handletextpad=0)
 l.get_frame().set_linewidth(0.5)
@@ -0,0 +1,30 @@
+"""
+pscale: helpers for intercomparing pressure scales built on pytheos.
+
+The scripts in this tutorial evaluate the same (V, T) datasets against
+many pytheos scales.  The functions here batch those evaluations so that
+a comparison is one call instead of a loop over scales and datasets.
+"""
+from .batch import cal_p_batch, make_inputs
+from .linear import cal_p_linear
+from .montecarlo import cal_p_mc
+from .cache import ResultCache, get_cache
+from .table import PressureTable, get_table
+from .inverse import cal_v, cal_v_batch
+from .boundaries import convert_boundaries, select_boundary
+from .store import DataStore
+from .graph import Graph
+from .stream import StreamMonitor
+from .render import DPTemplate, plot_dp
+from .calibration import calibrate, corrected_p
+from .grid import dp_grid, scale_pairs
+from .runs import discover, process_runs
+from .deltap import cal_dp, dp_cov, dp_dataset
+from .registry import get_scale, scale_ids
+from .ensemble import cal_p_ensemble, ensemble_budget, sample_params
+from .bootstrap import dp_trend
+from .profiles import adiabat, geotherm, cal_p_along
+from .thermo import cal_thermo, clapeyron
+from .index import PTIndex
+# last: with PSCALE_TRACE set, tracing wraps the functions imported above
+from . import trace
@@ -0,0 +1,167 @@
+"""
+The Delta P comparisons of Comparison_300K and Comparison_High_T as a
+dependency graph: load -> pressure -> Delta P -> figure.
+
+    load/<dataset>                            CSV contents
+    p/<dataset>/<phase>/<scale>               scale token
+    dp/<dataset>/<MgO scale>/<marker scale>   -
+    figure/<figure>                           plot settings
+
+A load node reads the valid rows of a dataset, a pressure node
+calculates the pressure of one phase with one scale and the terms of its
+uncertainty, and a Delta P node only subtracts the pressures of a pair
+and combines their uncertainties.  The nodes call the functions the
+scripts call through `pscale.dp_dataset` (`pscale.deltap.p_terms` and
+`pscale.deltap.combine_dp`) and `pscale.plot_dp`, so the figures have
+one definition.  Changing one row of a CSV file recomputes that dataset
+downstream of its load node; swapping one scale recomputes the pressures
+with that scale, the cheap Delta P of the pairs with it and the figure.
+Everything else is skipped.
+
+DataDistribution and Mantle_Boundaries are not part of the graph: their
+figures are annotated by hand in the scripts, and `pscale.runner` runs
+them as they are.
+
+    python -m pscale.analyses [--path DIR]
+"""
+from collections import OrderedDict
+import argparse
+import os
+import numpy as np
+from .registry import get_scale
+from .cache import scale_token
+from .deltap import DPResult, combine_dp, p_terms
+from .graph import Graph, file_token
+from .render import plot_dp
+from .store import DataStore
+
+# scales of the four panels (a-d), as in the notebooks
+scales = OrderedDict([
+    ('MgO', ('Speziale2001', 'Dorogokupets2007', 'Tange2009',
+             'Dorogokupets2015')),
+    ('Au', ('Fei2007bm3', 'Dorogokupets2007', 'Yokoo2009',
+            'Dorogokupets2015')),
+    ('Pt', ('Fei2007bm3', 'Dorogokupets2007', 'Yokoo2009',
+            'Dorogokupets2015'))])
+
+# figures with their datasets (marker, dataset) and plot settings
+comparisons = OrderedDict([
+    ('f-Compare-300K.pdf', {
+        'datasets': (('Au', 'Au_MgO_Ne_300K'), ('Pt', 'Pt_MgO_Ne_300K')),
+        'settings': {'xerr': True, 'xlim': (0., 140.), 'ylim': (-5., 3.),
+                     'thin_yticks': True}}),
+    ('f-Compare-HighT.pdf', {
+        'datasets': (('Au', 'Au_MgO_HiT'), ('Pt', 'Pt_MgO_HiT')),
+        'settings': {'xerr': False, 'xlim': (0., 160.), 'ylim': (-8., 4.),
+                     'thin_yticks': False}})])
+
+
+def _load_node(store, name):
+    def load():
+        dataset = store[name]
+        __, v, s_v, v_mgo, s_v_mgo, temp, s_temp = dataset.marker_columns()
+        ok = dataset.marker_valid()
+        sigma = np.stack([np.zeros(ok.sum()) if s is None else s[ok]
+                          for s in (s_v, s_v_mgo, s_temp)], -1)
+        return v[ok], v_mgo[ok], temp[ok], sigma
+    return load
+
+
+def _pressure_node(scale, column):
+    # column of the volume in the load node, 0 marker, 1 MgO
+    def pressure(columns):
+        p, dpdv, dpdt, terms = p_terms(scale, columns[column], columns[2])
+        s_params = np.sqrt(sum((np.square(term) for term in terms.values()),
+                               np.zeros_like(p)))
+        return p, dpdv, dpdt, s_params
+    return pressure
+
+
+def _dp(columns, pressure, pressure_mgo):
+    # scale parameters of different scales are independent, so the
+    # parameter errors of the two pressures enter as separate variables
+    p_mgo, dp, s_p_mgo, s_dp, __, __, s_p = combine_dp(
+        tuple(pressure[:3]) + ({'marker': pressure[3]},),
+        tuple(pressure_mgo[:3]) + ({'MgO': pressure_mgo[3]},), columns[3])
+    return p_mgo, dp, s_p_mgo, s_dp, s_p
+
+
+def _figure_node(filename, markers, settings):
+    def figure(*pairs):
+        # pairs of all markers of panel a, then b, ...
+        n = len(markers)
+        results = [DPResult(*[np.stack([pair[q] for pair in pairs[k::n]])
+                              for q in range(4)], None, None, None,
+                            np.stack([pair[4] for pair in pairs[k::n]]))
+                   for k in range(n)]
+        plot_dp(results, filename, markers=markers, **settings).close()
+    return figure
+
+
+def build_graph(path='.', scales=scales, comparisons=comparisons,
+                cache=True):
+    """
+    build the graph of the Delta P comparisons
+
+    :param path: directory with data/ and the figures
+    :param scales: dict of phase and four scale class names
+    :param comparisons: dict of figure file and its datasets and settings
+    :param cache: ResultCache, True for the shared cache in `pscale.cache`
+    :return: Graph
+    """
+    g = Graph(cache=cache)
+    store = DataStore(os.path.join(path, 'data'))
+    for figure, spec in comparisons.items():
+        markers = tuple(m for m, __ in spec['datasets'])
+        deps = []
+        for i in range(4):
+            for marker, name in spec['datasets']:
+                load = 'load/' + name
+                if load not in g.nodes:
+                    csv = os.path.join(path, 'data', name + '.csv')
+                    g.add(load, _load_node(store, name),
+                          key=(file_token(csv),))
+                pressures = []
+                for phase in (marker, 'MgO'):
+                    node = 'p/{}/{}/{}'.format(name, phase, scales[phase][i])
+                    if node not in g.nodes:
+                        scale = get_scale('{}-{}'.format(phase,
+                                                         scales[phase][i]))
+                        g.add(node, _pressure_node(scale, int(phase == 'MgO')),
+                              deps=[load], key=(scale_token(scale),))
+                    pressures.append(node)
+                node = 'dp/{}/{}/{}'.format(name, scales['MgO'][i],
+                                            scales[marker][i])
+                if node not in g.nodes:
+                    g.add(node, _dp, deps=[load] + pressures)
+                deps.append(node)
+        g.add('figure/' + figure,
+              _figure_node(os.path.join(path, figure), markers,
+                           spec['settings']),
+              deps=deps, key=(repr(sorted(spec['settings'].items())),
+                              repr(markers)),
+              output=os.path.join(path, figure))
+    return g
+
+
+def main(argv=None):
+    """
+    command line entry point
+
+    :param argv: command line arguments, None for sys.argv
+    """
+    parser = argparse.ArgumentParser(
+        prog='python -m pscale.analyses',
+        description='Rebuild the stale parts of the Delta P comparisons.')
+    parser.add_argument('--path', default='.',
+                        help='directory with data/ and the figures')
+    args = parser.parse_args(argv)
+    import matplotlib
+    matplotlib.use('Agg')
+    g = build_graph(args.path)
+    g.run()
+    print(g.report())
+
+
+if __name__ == '__main__':
+    main()
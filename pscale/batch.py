@@ -0,0 +1,97 @@
+"""
+Batched pressure evaluation for a list of scales sharing one dataset.
+
+Comparison scripts used to call `cal_p` once per scale per
+dataset, rebuilding the `unp.uarray` inputs every time.  Here the inputs
+are built once and all scales write into one (n_scales x n_points) array.
+Only rows with valid (not nan) inputs are computed; their results are
+scattered into outputs that are nan elsewhere, and no `uncertainties`
+object is built for an invalid row.
+"""
+import numpy as np
+from uncertainties import unumpy as unp
+from .linear import cal_p_linear
+
+
+def make_inputs(v, temp, s_v=None, s_temp=None):
+    """
+    build volume and temperature inputs for `cal_p` once
+
+    :param v: unit-cell volume in A^3
+    :param temp: temperature in K, scalar or array
+    :param s_v: uncertainty of volume, None for no uncertainty
+    :param s_temp: uncertainty of temperature, None for no uncertainty
+    :return: volume and temperature arrays, unp.uarray if uncertainty is
+        given
+    """
+    v = np.asarray(v, dtype=float)
+    temp = np.broadcast_to(np.asarray(temp, dtype=float), v.shape)
+    v_in = v if s_v is None else unp.uarray(v, np.asarray(s_v, dtype=float))
+    if s_temp is None:
+        temp_in = np.array(temp)
+    else:
+        temp_in = unp.uarray(temp, np.asarray(s_temp, dtype=float))
+    return v_in, temp_in
+
+
+def _valid(v, temp, s_v, s_temp):
+    """
+    :return: mask of the rows whose inputs are all not nan
+    """
+    ok = ~np.isnan(v) & ~np.isnan(temp)
+    for s in (s_v, s_temp):
+        if s is not None:
+            ok &= ~np.isnan(np.broadcast_to(np.asarray(s, dtype=float),
+                                            v.shape))
+    return ok
+
+
+def _take(x, ok):
+    return None if x is None else \
+        np.broadcast_to(np.asarray(x, dtype=float), ok.shape)[ok]
+
+
+def cal_p_batch(scales, v, temp, s_v=None, s_temp=None, mode='ufloat',
+                cache=None, valid=None):
+    """
+    calculate pressures for a list of scales for the same dataset
+
+    :param scales: list of pytheos scale objects
+    :param v: unit-cell volume in A^3
+    :param temp: temperature in K, scalar or array
+    :param s_v: uncertainty of volume, None for no uncertainty
+    :param s_temp: uncertainty of temperature, None for no uncertainty
+    :param mode: 'ufloat' to propagate uncertainties with `uncertainties`
+        or 'linear' for the float-array propagation in `pscale.linear`
+    :param cache: for 'linear', ResultCache or True for the shared cache,
+        see `pscale.cache`
+    :param valid: boolean mask of the rows to compute, e.g.
+        `Dataset.valid('Pt')`, None for the rows whose inputs are not nan
+    :return: for 'ufloat', pressures in GPa in (n_scales x n_points)
+        array, where p[i] is the result of scales[i].cal_p.
+        for 'linear', nominal pressures and standard deviations as two
+        (n_scales x n_points) float arrays.  Rows not computed are nan.
+    """
+    if mode not in ('ufloat', 'linear'):
+        raise ValueError('mode should be either ufloat or linear')
+    v = np.asarray(v, dtype=float).ravel()
+    temp = np.broadcast_to(np.asarray(temp, dtype=float), v.shape)
+    ok = _valid(v, temp, s_v, s_temp) if valid is None else \
+        np.asarray(valid, dtype=bool)
+    v_ok, temp_ok, s_v, s_temp = [_take(x, ok)
+                                  for x in (v, temp, s_v, s_temp)]
+    if mode == 'linear':
+        p = np.full((len(scales), v.size), np.nan)
+        s_p = np.full_like(p, np.nan)
+        if v_ok.size:
+            for i, scale in enumerate(scales):
+                p[i, ok], s_p[i, ok] = cal_p_linear(
+                    scale, v_ok, temp_ok, s_v=s_v, s_temp=s_temp,
+                    cache=cache)
+        return p, s_p
+    p = np.full((len(scales), v.size), np.nan, dtype=object)
+    if v_ok.size:
+        v_in, temp_in = make_inputs(v_ok, temp_ok, s_v=s_v, s_temp=s_temp)
+        for i, scale in enumerate(scales):
+            p[i, ok] = scale.cal_p(v_in, temp_in)
+    return p
@@ -0,0 +1,309 @@
+"""
+Benchmarks of pressure evaluation and uncertainty propagation.
+
+Every case is one scale, one temperature regime, one propagation mode and
+one number of points:
+
+    regimes   300K      T = 300 K, as in Comparison_300K
+              highT     T = 1500-2500 K with sigma T, as in
+                        Comparison_High_T
+    modes     pytheos   scale.cal_p with float inputs
+              ufloat    scale.cal_p with unp.uarray inputs, as in the
+                        notebooks
+              kernel    float kernels, `pscale.kernels.cal_p_any`
+              linear    `pscale.linear.cal_p_linear`
+              mc        `pscale.montecarlo.cal_p_mc`, 1000 draws
+
+Inputs are drawn from a seeded generator in the compression range of the
+datasets (V/V0 = 0.72-0.97), so runs are comparable across machines and
+library versions.  The sweep over point counts of a scale and mode stops
+once the next size is expected to take longer than a time budget, which
+keeps the per-object modes from running for hours at 10^7 points.
+
+Results go to a JSON file together with the library versions.  Given a
+baseline file from an earlier run, every case found in both is compared,
+and a case is a regression when its time per point grew by more than the
+threshold.
+
+    python -m pscale.bench -o bench.json --baseline baseline.json
+"""
+from collections import OrderedDict
+import argparse
+import json
+import platform
+import sys
+import time
+import numpy as np
+from uncertainties import unumpy as unp
+from . import kernels
+from .registry import get_scale
+from .inverse import get_v0
+from .linear import cal_p_linear
+from .montecarlo import cal_p_mc
+
+# scales used by the notebooks
+scales = OrderedDict([
+    ('MgO', ('Speziale2001', 'Dorogokupets2007', 'Tange2009',
+             'Dorogokupets2015')),
+    ('Au', ('Fei2007bm3', 'Dorogokupets2007', 'Yokoo2009',
+            'Dorogokupets2015', 'Tsuchiya2003')),
+    ('Pt', ('Fei2007bm3', 'Dorogokupets2007', 'Yokoo2009',
+            'Dorogokupets2015', 'Holmes1989'))])
+
+regimes = ('300K', 'highT')
+modes = ('pytheos', 'ufloat', 'kernel', 'linear', 'mc')
+sizes = tuple(10 ** k for k in range(1, 8))
+
+
+def make_case_inputs(scale, regime, n, seed=0):
+    """
+    draw inputs of a benchmark case
+
+    :param scale: pytheos scale object
+    :param regime: '300K' or 'highT'
+    :param n: number of points
+    :param seed: seed for the random number generator
+    :return: v, s_v, temp, s_temp as float arrays
+    """
+    rng = np.random.default_rng(seed)
+    v = get_v0(scale) * rng.uniform(0.72, 0.97, n)
+    s_v = 1.e-3 * v
+    if regime == '300K':
+        temp = np.full(n, 300.)
+        s_temp = np.zeros(n)
+    elif regime == 'highT':
+        temp = rng.uniform(1500., 2500., n)
+        s_temp = np.full(n, 40.)
+    else:
+        raise ValueError('unknown regime {}'.format(regime))
+    return v, s_v, temp, s_temp
+
+
+def run_case(scale, mode, v, s_v, temp, s_temp):
+    """
+    evaluate one benchmark case
+
+    :param scale: pytheos scale object
+    :param mode: one of `modes`
+    :param v: unit-cell volume in A^3
+    :param s_v: uncertainty of volume
+    :param temp: temperature in K
+    :param s_temp: uncertainty of temperature
+    :return: pressures as returned by the mode
+    """
+    if mode == 'pytheos':
+        return scale.cal_p(v, temp)
+    if mode == 'ufloat':
+        return scale.cal_p(unp.uarray(v, s_v), unp.uarray(temp, s_temp))
+    if mode == 'kernel':
+        return kernels.cal_p_any(scale, v, temp)
+    if mode == 'linear':
+        return cal_p_linear(scale, v, temp, s_v=s_v, s_temp=s_temp)
+    if mode == 'mc':
+        return cal_p_mc([scale], v, temp, s_v=s_v, s_temp=s_temp,
+                        n_draws=1000, q=None, processes=1)
+    raise ValueError('unknown mode {}'.format(mode))
+
+
+def _time(func, repeat):
+    times = []
+    for __ in range(repeat):
+        t0 = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - t0)
+    return min(times), float(np.median(times))
+
+
+def run_benchmarks(scales=scales, regimes=regimes, modes=modes, sizes=sizes,
+                   repeat=3, budget=10., seed=0, report=None):
+    """
+    run the benchmark sweep
+
+    :param scales: dict of material and scale class names
+    :param regimes: temperature regimes, see `make_case_inputs`
+    :param modes: propagation modes, see `run_case`
+    :param sizes: numbers of points, in increasing order
+    :param repeat: timed runs per case, the fastest is kept
+    :param budget: skip sizes expected to take longer than this many
+        seconds per run
+    :param seed: seed for the inputs
+    :param report: function called with every result as it finishes
+    :return: list of result dicts with material, scale, regime, mode, n,
+        time (fastest run in s), median (s), per_point (s) and status
+        ('ok', 'skipped' or the error message)
+    """
+    results = []
+    for material, names in scales.items():
+        for name in names:
+            scale = get_scale('{}-{}'.format(material, name))
+            for regime in regimes:
+                for mode in modes:
+                    per_point = None
+                    for n in sizes:
+                        result = OrderedDict([
+                            ('material', material), ('scale', name),
+                            ('regime', regime), ('mode', mode), ('n', n),
+                            ('time', None), ('median', None),
+                            ('per_point', None), ('status', 'ok')])
+                        if per_point is False or (
+                                per_point is not None and
+                                per_point * n > budget):
+                            result['status'] = 'skipped'
+                        else:
+                            args = make_case_inputs(scale, regime, n, seed)
+                            try:
+                                # warm-up outside the timing
+                                run_case(scale, mode, *[a[:1] for a in args])
+                                t, median = _time(
+                                    lambda: run_case(scale, mode, *args),
+                                    repeat)
+                            except (ValueError, ArithmeticError,
+                                    MemoryError, UnboundLocalError) as e:
+                                result['status'] = '{}: {}'.format(
+                                    type(e).__name__, e)
+                                per_point = False
+                            else:
+                                per_point = t / n
+                                result.update(time=t, median=median,
+                                              per_point=per_point)
+                        results.append(result)
+                        if report is not None:
+                            report(result)
+    return results
+
+
+def environment():
+    """
+    :return: dict of the versions that affect the timings
+    """
+    import scipy
+    import uncertainties
+    import pytheos
+    return OrderedDict([
+        ('python', sys.version.split()[0]),
+        ('platform', platform.platform()),
+        ('machine', platform.machine()),
+        ('numpy', np.__version__), ('scipy', scipy.__version__),
+        ('uncertainties', uncertainties.__version__),
+        ('pytheos', getattr(pytheos, '__version__', 'unknown')),
+        ('date', time.strftime('%Y-%m-%dT%H:%M:%S'))])
+
+
+def save(filename, results):
+    """
+    write benchmark results as JSON
+
+    :param filename: output file
+    :param results: list of result dicts from `run_benchmarks`
+    """
+    with open(filename, 'w') as f:
+        json.dump({'environment': environment(), 'results': results}, f,
+                  indent=1)
+
+
+def load(filename):
+    """
+    :param filename: file written by `save`
+    :return: list of result dicts
+    """
+    with open(filename) as f:
+        return json.load(f)['results']
+
+
+def compare(results, baseline, threshold=0.25, min_time=1.e-3):
+    """
+    compare results against a baseline
+
+    :param results: list of result dicts
+    :param baseline: list of result dicts of an earlier run
+    :param threshold: allowed relative increase of the time per point
+    :param min_time: cases faster than this many seconds in both runs are
+        not flagged, their timings are mostly noise
+    :return: list of (result, baseline time, ratio, regression) for the
+        cases timed in both
+    """
+    def case(r):
+        return r['material'], r['scale'], r['regime'], r['mode'], r['n']
+
+    base = {case(r): r for r in baseline if r['status'] == 'ok'}
+    out = []
+    for r in results:
+        b = base.get(case(r))
+        if r['status'] != 'ok' or b is None:
+            continue
+        ratio = r['time'] / b['time']
+        slow = ratio > 1. + threshold and max(r['time'], b['time']) > min_time
+        out.append((r, b['time'], ratio, slow))
+    return out
+
+
+def _format(r):
+    return '{:<4s}{:<17s}{:<6s}{:<8s}{:>9d}'.format(
+        r['material'], r['scale'], r['regime'], r['mode'], r['n'])
+
+
+def main(argv=None):
+    """
+    command line entry point
+
+    :param argv: command line arguments, None for sys.argv
+    :return: exit status, 1 if a regression was found
+    """
+    parser = argparse.ArgumentParser(
+        prog='python -m pscale.bench',
+        description='Benchmark pressure evaluation for the scales of the '
+        'notebooks.')
+    parser.add_argument('-o', '--output', default='bench.json',
+                        help='JSON file for the results')
+    parser.add_argument('--baseline', default=None,
+                        help='JSON file of an earlier run to compare with')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='allowed relative slowdown (default: 0.25)')
+    parser.add_argument('--sizes', type=int, nargs='+', default=sizes,
+                        help='numbers of points')
+    parser.add_argument('--modes', nargs='+', default=modes, choices=modes)
+    parser.add_argument('--regimes', nargs='+', default=regimes,
+                        choices=regimes)
+    parser.add_argument('--scales', nargs='+', default=None,
+                        metavar='MATERIAL/SCALE',
+                        help='e.g. MgO/Speziale2001, default: all')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='timed runs per case')
+    parser.add_argument('--budget', type=float, default=10.,
+                        help='seconds per run before larger sizes are '
+                        'skipped')
+    args = parser.parse_args(argv)
+    selected = scales
+    if args.scales:
+        selected = OrderedDict()
+        for s in args.scales:
+            material, name = s.split('/')
+            selected.setdefault(material, ())
+            selected[material] += (name,)
+
+    def report(r):
+        if r['status'] == 'ok':
+            print('{} {:10.3e} s {:10.3e} s/pt'.format(
+                _format(r), r['time'], r['per_point']), flush=True)
+        elif r['status'] != 'skipped':
+            print('{} {}'.format(_format(r), r['status']), flush=True)
+
+    results = run_benchmarks(selected, regimes=args.regimes,
+                             modes=args.modes, sizes=sorted(args.sizes),
+                             repeat=args.repeat, budget=args.budget,
+                             report=report)
+    save(args.output, results)
+    if args.baseline is None:
+        return 0
+    checked = compare(results, load(args.baseline), args.threshold)
+    slow = [c for c in checked if c[3]]
+    for r, t_base, ratio, __ in slow:
+        print('REGRESSION {} {:10.3e} s -> {:10.3e} s ({:.2f}x)'.format(
+            _format(r), t_base, r['time'], ratio))
+    print('{} cases compared, {} regressions (threshold {:.0%})'.format(
+        len(checked), len(slow), args.threshold))
+    return int(bool(slow))
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,156 @@
+"""
+Bootstrap confidence bands of Delta P(P) trends.
+
+Rows of every scale combination are resampled with replacement and a
+trend of Delta P against P(MgO) is fitted to every resample: a weighted
+polynomial, or a local-linear smoother with a Gaussian kernel evaluated
+at the requested pressures.  Both fits need only weighted sums over the
+rows, so a resample enters through how often it picks every row.  A
+chunk of resamples is drawn as one (n_resamples x n_rows) index matrix,
+turned into counts with one `bincount`, and the sums of all resamples are
+one matrix product of the counts with per-row features.  The small
+normal equations are then solved for all resamples at once.
+
+Chunks of resamples are spread over a process pool.  Every chunk has its
+own child seed from `np.random.SeedSequence(seed)`, so results do not
+depend on the number of processes, and the resampled trends of different
+combinations with the same resample index are independent draws that can
+be subtracted, e.g. Au against Pt.
+"""
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+import os
+import numpy as np
+
+TrendResult = namedtuple('TrendResult', ['at', 'fit', 'lo', 'hi', 'std',
+                                         'samples', 'level', 'n_points'])
+TrendResult.__doc__ = """
+result of `dp_trend`
+
+:param at: pressures of the bands in GPa, (n_at)
+:param fit: trend of the full data at `at`, (n_combos x n_at)
+:param lo: lower bound of the confidence band, (n_combos x n_at)
+:param hi: upper bound of the confidence band, (n_combos x n_at)
+:param std: bootstrap standard deviation, (n_combos x n_at)
+:param samples: trends of all resamples, (n_boot x n_combos x n_at)
+:param level: confidence level in %
+:param n_points: number of finite rows of every combination
+"""
+
+
+def _features(p, dp, w, at, degree, bandwidth):
+    """
+    per-row terms whose count-weighted sums give the fit
+
+    :return: features, (n_rows x n_features)
+    """
+    if bandwidth is None:
+        k = np.arange(2 * degree + 1)
+        x = p[:, None] ** k
+        return np.concatenate([w[:, None] * x,
+                               (w * dp)[:, None] * x[:, :degree + 1]], 1)
+    u = p[:, None] - at[None, :]
+    kw = w[:, None] * np.exp(-0.5 * np.square(u / bandwidth))
+    return np.concatenate([kw, kw * u, kw * u * u, kw * dp[:, None],
+                           kw * u * dp[:, None]], 1)
+
+
+def _solve(sums, at, degree, bandwidth):
+    """
+    trends at `at` from the feature sums of many resamples
+
+    :param sums: (n_resamples x n_features)
+    :return: (n_resamples x n_at)
+    """
+    if bandwidth is None:
+        n = degree + 1
+        moments = sums[:, :2 * degree + 1]
+        a = moments[:, np.add.outer(np.arange(n), np.arange(n))]
+        b = sums[:, 2 * degree + 1:, None]
+        try:
+            coef = np.linalg.solve(a, b)[..., 0]
+        except np.linalg.LinAlgError:
+            # resamples with fewer distinct rows than coefficients
+            coef = np.einsum('rij,rj->ri', np.linalg.pinv(a), b[..., 0])
+        return coef.dot(at[None, :] ** np.arange(n)[:, None])
+    s0, s1, s2, t0, t1 = np.split(sums, 5, axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return (s2 * t0 - s1 * t1) / (s0 * s2 - s1 * s1)
+
+
+def _boot_chunk(task):
+    """
+    fit the trends of one chunk of resamples for all combinations
+
+    :return: trends, (n_resamples x n_combos x n_at)
+    :note: internal function, runs in worker processes
+    """
+    features, n, seed, at, degree, bandwidth = task
+    rng = np.random.default_rng(seed)
+    out = np.empty((n, len(features), at.size))
+    for c, f in enumerate(features):
+        m = f.shape[0]
+        idx = rng.integers(0, m, (n, m))
+        idx += np.arange(n)[:, None] * m
+        counts = np.bincount(idx.ravel(), minlength=n * m).reshape(n, m)
+        out[:, c] = _solve(counts.dot(f), at, degree, bandwidth)
+    return out
+
+
+def dp_trend(p, dp, s_dp=None, at=(24., 135.), degree=2, bandwidth=None,
+             n_boot=10000, level=95., seed=0, max_elements=2 ** 22,
+             processes=None):
+    """
+    fit Delta P(P) trends and bootstrap their confidence bands
+
+    :param p: P(MgO) in GPa, (n_combos x n_rows) or (n_rows)
+    :param dp: Delta P in GPa, same shape as p.  Rows with nan are left
+        out of that combination.
+    :param s_dp: standard deviation of Delta P for 1/sigma^2 weights, None
+        for equal weights
+    :param at: pressures of the bands in GPa
+    :param degree: degree of the polynomial trend
+    :param bandwidth: bandwidth in GPa of a local-linear smoother used
+        instead of the polynomial, None for the polynomial
+    :param n_boot: number of resamples
+    :param level: confidence level in %
+    :param seed: seed for the random number generator
+    :param max_elements: maximum size of the index matrix of a chunk
+    :param processes: number of worker processes, None for all cores,
+        1 to run in this process
+    :return: TrendResult, percentile bands of the resampled trends
+    :note: p is centered on the band pressures' mean inside the fit, which
+        keeps the normal equations well conditioned.
+    """
+    p, dp = np.broadcast_arrays(np.atleast_2d(np.asarray(p, dtype=float)),
+                                np.atleast_2d(np.asarray(dp, dtype=float)))
+    w = np.ones(p.shape) if s_dp is None else \
+        1. / np.square(np.broadcast_to(np.asarray(s_dp, dtype=float),
+                                       p.shape))
+    at = np.atleast_1d(np.asarray(at, dtype=float))
+    center = at.mean() if bandwidth is None else 0.
+    features = []
+    n_points = []
+    for c in range(p.shape[0]):
+        ok = np.isfinite(p[c]) & np.isfinite(dp[c]) & np.isfinite(w[c])
+        features.append(_features(p[c, ok] - center, dp[c, ok], w[c, ok],
+                                  at - center, degree, bandwidth))
+        n_points.append(int(ok.sum()))
+    fit = np.stack([_solve(f.sum(axis=0)[None], at - center, degree,
+                           bandwidth)[0] for f in features])
+    per_chunk = max(1, max_elements // max(max(n_points), 1))
+    n_chunks = -(-n_boot // per_chunk)
+    seeds = np.random.SeedSequence(seed).spawn(n_chunks)
+    tasks = [(features, min(per_chunk, n_boot - c * per_chunk), seeds[c],
+              at - center, degree, bandwidth) for c in range(n_chunks)]
+    if processes is None:
+        processes = os.cpu_count() or 1
+    if processes > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            samples = np.concatenate(list(pool.map(_boot_chunk, tasks)))
+    else:
+        samples = np.concatenate([_boot_chunk(task) for task in tasks])
+    alpha = (100. - level) / 2.
+    lo, hi = np.nanpercentile(samples, [alpha, 100. - alpha], axis=0)
+    return TrendResult(at, fit, lo, hi, np.nanstd(samples, axis=0, ddof=1),
+                       samples, level, n_points)
@@ -0,0 +1,129 @@
+"""
+Conversion of published phase boundaries to other pressure scales.
+
+A boundary table lists points as published: boundary, reference,
+material of the pressure standard, the scale the authors used, P (GPa)
+and T (K).  The volume of the standard is recovered from the original
+scale with `pscale.inverse.cal_v`, and the target scales are evaluated at
+that volume and temperature.  Rows are grouped by (material, scale), so
+the work is one vectorized call per group and target, not one per point.
+"""
+from collections import OrderedDict, namedtuple
+import numpy as np
+from . import kernels
+from .inverse import cal_v
+from .registry import get_scale, has_scale
+from .thermo import convert_slope
+
+BoundaryResult = namedtuple('BoundaryResult', ['labels', 'p', 'v', 'groups',
+                                               'group', 'slopes',
+                                               'local_slopes'])
+BoundaryResult.__doc__ = """
+result of `convert_boundaries`
+
+:param labels: target labels
+:param p: converted pressures in GPa, (n_targets x n_rows), nan where the
+    material has no such scale
+:param v: unit-cell volumes of the standard in A^3, (n_rows)
+:param groups: list of (boundary, reference, material, scale) tuples
+:param group: index in `groups` of every row
+:param slopes: Clapeyron slopes dP/dT in MPa/K, (n_targets x n_groups)
+:param local_slopes: Clapeyron slopes in MPa/K at every row, the slope of
+    the group in the original scale converted with the analytic
+    derivatives of both scales (see `pscale.thermo.clapeyron`),
+    (n_targets x n_rows)
+"""
+
+
+def _slopes(group, n_groups, temp, p):
+    """
+    fit dP/dT by least squares within every group
+
+    :param group: group index of every row
+    :param n_groups: number of groups
+    :param temp: temperature in K, (n_rows)
+    :param p: pressure in GPa, (n_targets x n_rows)
+    :return: slopes in GPa/K, (n_targets x n_groups), nan for groups with
+        a single temperature
+    """
+    n = np.bincount(group, minlength=n_groups)
+    dt = temp - (np.bincount(group, temp, minlength=n_groups) / n)[group]
+    sum_p = np.zeros((p.shape[0], n_groups))
+    np.add.at(sum_p, (slice(None), group), p)
+    dp = p - (sum_p / n)[:, group]
+    cov = np.zeros((p.shape[0], n_groups))
+    np.add.at(cov, (slice(None), group), dp * dt)
+    var = np.bincount(group, dt * dt, minlength=n_groups)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(var > 0., cov / var, np.nan)
+
+
+def convert_boundaries(table, targets, offsets=None):
+    """
+    convert boundary points to target scales
+
+    :param table: pandas DataFrame or structured array with columns
+        boundary, reference, material, scale, P and T
+    :param targets: dict of label and pytheos class name or short code
+        ('D07', see `pscale.registry`), or a list of them used as labels
+    :param offsets: dict of (label, material) and a pressure correction in
+        GPa added to that target, e.g. {('mD07', 'Au'): -2.5}
+    :return: BoundaryResult
+    """
+    if not isinstance(targets, dict):
+        targets = OrderedDict((name, name) for name in targets)
+    labels = list(targets)
+    offsets = offsets or {}
+    material = np.asarray(table['material']).astype(str)
+    original = np.asarray(table['scale']).astype(str)
+    p_in = np.asarray(table['P'], dtype=float)
+    temp = np.asarray(table['T'], dtype=float)
+    keys = list(zip(*[np.asarray(table[name]).astype(str).tolist() for name
+                      in ('boundary', 'reference', 'material', 'scale')]))
+    groups = list(OrderedDict.fromkeys(keys))
+    index = {key: i for i, key in enumerate(groups)}
+    group = np.array([index[key] for key in keys], dtype=np.intp)
+    # slopes of the groups as published, in GPa/K
+    slope_in = _slopes(group, len(groups), temp, p_in[None])[0][group]
+    v = np.full(p_in.size, np.nan)
+    dpdv_in = np.full(p_in.size, np.nan)
+    dpdt_in = np.full(p_in.size, np.nan)
+    for mat, name in OrderedDict.fromkeys(zip(material, original)):
+        rows = (material == mat) & (original == name)
+        scale = get_scale('{}-{}'.format(mat, name))
+        v[rows] = cal_v(scale, p_in[rows], temp[rows])
+        __, dpdv_in[rows], dpdt_in[rows] = kernels.cal_p_any(
+            scale, v[rows], temp[rows])
+    p = np.full((len(labels), p_in.size), np.nan)
+    local = np.full((len(labels), p_in.size), np.nan)
+    for mat in OrderedDict.fromkeys(material):
+        rows = material == mat
+        for k, label in enumerate(labels):
+            scale_id = '{}-{}'.format(mat, targets[label])
+            if not has_scale(scale_id):
+                continue
+            p_k, dpdv, dpdt = kernels.cal_p_any(get_scale(scale_id), v[rows],
+                                                temp[rows])
+            p[k, rows] = p_k + offsets.get((label, mat), 0.)
+            local[k, rows] = convert_slope(slope_in[rows], dpdv_in[rows],
+                                           dpdt_in[rows], dpdv, dpdt) * 1.e3
+    slopes = _slopes(group, len(groups), temp, p) * 1.e3
+    return BoundaryResult(labels, p, v, groups, group, slopes, local)
+
+
+def select_boundary(table, result, label, **columns):
+    """
+    pick converted points of one boundary, e.g. for plotting
+
+    :param table: boundary table given to `convert_boundaries`
+    :param result: BoundaryResult
+    :param label: target label
+    :param columns: column values the rows must match, e.g.
+        boundary='ppv', material='Au'
+    :return: pressures in GPa, temperatures in K
+    """
+    rows = np.ones(result.v.size, dtype=bool)
+    for name, value in columns.items():
+        rows &= np.asarray(table[name]).astype(str) == value
+    return result.p[result.labels.index(label), rows], \
+        np.asarray(table['T'], dtype=float)[rows]
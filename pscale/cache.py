@@ -0,0 +1,248 @@
+"""
+Content-addressed cache for pressure evaluations.
+
+Keys are a hash of the scale (class, equations and every parameter with
+its uncertainty) and of the input arrays, so the same evaluation is found
+again from another script or a later session.  Every key also holds a
+code token made of `VERSION`, the source of the modules that compute
+cached results and the installed pytheos version, so results computed
+before a fix in the kernels or the propagation are not served again.
+
+Results are kept in an in-memory LRU tier and in an on-disk tier of .npz
+files that is trimmed to `max_bytes`, least recently used first.
+
+The shared cache used with `cache=True` lives in the directory given by
+the PSCALE_CACHE_DIR environment variable, or ~/.cache/pscale.
+"""
+from collections import OrderedDict
+import hashlib
+import os
+import numpy as np
+
+# bump for changes that the code token does not see
+VERSION = '1'
+# modules whose results are cached
+_CODE_FILES = ('kernels.py', 'linear.py', 'inverse.py', 'montecarlo.py',
+               'profiles.py', 'table.py', 'cache.py')
+_code_token = None
+
+
+def code_token():
+    """
+    :return: hex digest of `VERSION`, the source of the modules that
+        compute cached results and the pytheos version
+    """
+    global _code_token
+    if _code_token is None:
+        from importlib import metadata
+        h = hashlib.sha1(VERSION.encode())
+        for name in _CODE_FILES:
+            with open(os.path.join(os.path.dirname(__file__), name),
+                      'rb') as f:
+                h.update(f.read())
+        try:
+            h.update(metadata.version('pytheos').encode())
+        except metadata.PackageNotFoundError:
+            pass
+        _code_token = h.hexdigest()
+    return _code_token
+
+
+def scale_token(scale):
+    """
+    make a string that identifies a scale by its content
+
+    :param scale: pytheos scale object
+    :return: string with class, equations and parameters
+    :note: floats are written with float.hex so that the token changes
+        with any change in a parameter
+    """
+    def _hex(x):
+        return float(x).hex()
+
+    parts = [type(scale).__module__, type(scale).__name__]
+    for name in ('eqn_st', 'eqn_th', 'eqn_el', 'eqn_anh', 'n', 'z', 't_ref',
+                 'three_r'):
+        value = getattr(scale, name, None)
+        parts.append('{}={}'.format(
+            name, _hex(value) if isinstance(value, float) else value))
+    for name in ('params_st', 'params_th', 'params_el', 'params_anh',
+                 'params_hugoniot', 'params_therm'):
+        params = getattr(scale, name, None)
+        if params is None:
+            continue
+        for key, value in params.items():
+            parts.append('{}.{}={}+/-{}'.format(
+                name, key, _hex(getattr(value, 'nominal_value', value)),
+                _hex(getattr(value, 'std_dev', 0.))))
+    return ';'.join(parts)
+
+
+def make_key(*parts):
+    """
+    hash strings and arrays into a cache key
+
+    :param parts: strings, numbers, None or arrays
+    :return: hex digest, including `code_token`
+    """
+    h = hashlib.sha1(code_token().encode())
+    for part in parts:
+        if part is None:
+            h.update(b'None')
+        elif isinstance(part, str):
+            h.update(part.encode())
+        else:
+            a = np.ascontiguousarray(part, dtype=float)
+            h.update(str(a.shape).encode())
+            h.update(a.tobytes())
+        h.update(b'|')
+    return h.hexdigest()
+
+
+class ResultCache(object):
+    """
+    two-tier cache of tuples of float arrays
+    """
+
+    def __init__(self, path=None, max_items=256, max_bytes=512 * 2 ** 20):
+        """
+        :param path: directory for the on-disk tier, None for memory only
+        :param max_items: number of results kept in memory
+        :param max_bytes: size limit of the on-disk tier in bytes
+        """
+        self.path = path
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self._memory = OrderedDict()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if path is not None:
+            os.makedirs(path, exist_ok=True)
+
+    def _file(self, key):
+        return os.path.join(self.path, key + '.npz')
+
+    def get(self, key):
+        """
+        look up a result
+
+        :param key: key from `make_key`
+        :return: tuple of arrays or None
+        """
+        if key in self._memory:
+            self._memory.move_to_end(key)
+            self.memory_hits += 1
+            return self._memory[key]
+        if self.path is not None:
+            f = self._file(key)
+            try:
+                with np.load(f) as data:
+                    value = tuple(data['arr_{}'.format(i)]
+                                  for i in range(len(data.files)))
+                os.utime(f)
+            except (OSError, ValueError, KeyError):
+                value = None
+            if value is not None:
+                self.disk_hits += 1
+                self._remember(key, value)
+                return value
+        self.misses += 1
+        return None
+
+    def put(self, key, value):
+        """
+        store a result
+
+        :param key: key from `make_key`
+        :param value: tuple of arrays
+        """
+        value = tuple(np.asarray(v) for v in value)
+        self._remember(key, value)
+        if self.path is None:
+            return
+        tmp = os.path.join(self.path, '.{}.{}.tmp.npz'.format(key,
+                                                              os.getpid()))
+        np.savez(tmp, *value)
+        os.replace(tmp, self._file(key))
+        self._evict()
+
+    def _remember(self, key, value):
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_items:
+            self._memory.popitem(last=False)
+
+    def _evict(self):
+        """
+        remove least recently used files until the disk tier fits
+        """
+        entries = []
+        for name in os.listdir(self.path):
+            if not name.endswith('.npz') or name.startswith('.'):
+                continue
+            try:
+                st = os.stat(os.path.join(self.path, name))
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, name))
+        total = sum(e[1] for e in entries)
+        for __, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.path, name))
+            except OSError:
+                pass
+            total -= size
+
+    def disk_bytes(self):
+        """
+        :return: size of the on-disk tier in bytes
+        """
+        if self.path is None:
+            return 0
+        return sum(os.path.getsize(os.path.join(self.path, name))
+                   for name in os.listdir(self.path) if name.endswith('.npz'))
+
+    def stats(self):
+        """
+        :return: dict of hit/miss counters and sizes
+        """
+        return {'memory_hits': self.memory_hits, 'disk_hits': self.disk_hits,
+                'misses': self.misses, 'memory_items': len(self._memory),
+                'disk_bytes': self.disk_bytes()}
+
+    def clear(self):
+        """
+        empty both tiers and reset the counters
+        """
+        self._memory.clear()
+        if self.path is not None:
+            for name in os.listdir(self.path):
+                if name.endswith('.npz'):
+                    os.remove(os.path.join(self.path, name))
+        self.memory_hits = self.disk_hits = self.misses = 0
+
+
+_default = None
+
+
+def get_cache(cache=True):
+    """
+    resolve the `cache` argument of the pscale functions
+
+    :param cache: ResultCache, True for the shared cache, None or False for
+        no caching
+    :return: ResultCache or None
+    """
+    global _default
+    if (cache is None) or (cache is False):
+        return None
+    if cache is True:
+        if _default is None:
+            path = os.environ.get('PSCALE_CACHE_DIR', os.path.join(
+                os.path.expanduser('~'), '.cache', 'pscale'))
+            _default = ResultCache(path)
+        return _default
+    return cache
@@ -0,0 +1,163 @@
+"""
+Least-squares cross-calibration of pressure scales.
+
+Every scale gets a correction
+
+    P'(V, T) = P(V, T) + a + b * P_th(V, T),
+
+a pressure offset a and a scaling b of its thermal pressure
+P_th(V, T) = P(V, T) - P(V, 300 K).  In a dataset of a marker measured
+with MgO, every pair of a marker scale and an MgO scale gives residuals
+
+    r = P'_marker(V_marker, T) - P'_MgO(V_MgO, T),
+
+which are linear in the corrections, so the Jacobian is exact and
+analytic: 1 and P_th for the marker, -1 and -P_th for MgO.  All pairs of
+all datasets are fitted jointly.  Only the 4 x 4 normal-equation block of
+each pair is accumulated, so the cost is linear in points x pairs and the
+solve is over 2 x n_scales parameters.
+
+Residuals are weighted by their uncertainty from sigma V of both phases
+and sigma T (correlated through dP/dT of both scales).  Offsets are
+defined only relative to each other, so the corrections of a reference
+scale are held at zero.
+"""
+from collections import OrderedDict, namedtuple
+import numpy as np
+from . import kernels
+from .registry import get_scale
+
+CalibrationResult = namedtuple('CalibrationResult', [
+    'names', 'params', 'sigma', 'cov', 'chi2', 'dof', 'n_points'])
+CalibrationResult.__doc__ = """
+result of `calibrate`
+
+:param names: scale names, 'Au-Dorogokupets2007'
+:param params: offset a in GPa and thermal-pressure scaling b for every
+    scale, (n_scales x 2)
+:param sigma: standard deviations of params, (n_scales x 2)
+:param cov: covariance of params in the order a_0, b_0, a_1, ...,
+    (2 n_scales x 2 n_scales), zero for fixed parameters
+:param chi2: weighted sum of squared residuals
+:param dof: degrees of freedom
+:param n_points: number of residuals
+"""
+
+
+def _terms(scale, v, temp, t_ref=300.):
+    """
+    :return: pressure, thermal pressure above t_ref, dP/dV and dP/dT
+    """
+    p, dpdv, dpdt = kernels.cal_p_any(scale, v, temp)
+    p_ref = kernels.cal_p_any(scale, v, np.full_like(v, t_ref),
+                              deriv_t=False)[0]
+    return p, p - p_ref, dpdv, dpdt
+
+
+def calibrate(datasets, scales, reference=None, thermal=True, prior=None,
+              scale_cov=True):
+    """
+    fit offsets and thermal-pressure scalings of pressure scales
+
+    :param datasets: `pscale.store.Dataset` objects of marker-MgO pairs,
+        e.g. store['Au_MgO_HiT']
+    :param scales: dict of material ('Au', 'Pt', 'MgO') and list of
+        pytheos scale objects
+    :param reference: name of the scale held fixed, e.g.
+        'MgO-Speziale2001', default the first MgO scale
+    :param thermal: fit thermal-pressure scalings, False for offsets only
+    :param prior: (sigma a in GPa, sigma b) of a zero-mean Gaussian prior
+        on the corrections, None for none.  Needed when b is not
+        constrained, e.g. by 300 K data only.
+    :param scale_cov: scale the covariance by chi2 / dof
+    :return: CalibrationResult
+    :note: the residuals of one point with different scale pairs share the
+        measurement and are treated as independent, so the covariance is
+        a lower bound unless scale_cov is True.
+    """
+    names = ['{}-{}'.format(material, type(scale).__name__)
+             for material, objs in scales.items() for scale in objs]
+    if reference is None:
+        reference = [n for n in names if n.startswith('MgO-')][0]
+    n_par = 2 * len(names)
+    normal = np.zeros((n_par, n_par))
+    rhs = np.zeros(n_par)
+    chi2_0 = 0.
+    n_points = 0
+    for dataset in datasets:
+        marker, v, s_v, v_mgo, s_v_mgo, temp, s_temp = dataset.marker_columns()
+        s_v = np.zeros_like(v) if s_v is None else s_v
+        s_v_mgo = np.zeros_like(v) if s_v_mgo is None else s_v_mgo
+        s_temp = np.zeros_like(v) if s_temp is None else s_temp
+        ok = dataset.marker_valid()
+        terms = OrderedDict()
+        for material, x in ((marker, v[ok]), ('MgO', v_mgo[ok])):
+            for scale in scales[material]:
+                terms['{}-{}'.format(material, type(scale).__name__)] = \
+                    _terms(scale, x, temp[ok])
+        for name_m in terms:
+            if not name_m.startswith(marker + '-'):
+                continue
+            p_m, th_m, dpdv_m, dpdt_m = terms[name_m]
+            for name_g in terms:
+                if not name_g.startswith('MgO-'):
+                    continue
+                p_g, th_g, dpdv_g, dpdt_g = terms[name_g]
+                r = p_m - p_g
+                w = 1. / (np.square(dpdv_m * s_v[ok]) +
+                          np.square(dpdv_g * s_v_mgo[ok]) +
+                          np.square((dpdt_m - dpdt_g) * s_temp[ok]))
+                i, k = names.index(name_m), names.index(name_g)
+                index = np.array([2 * i, 2 * i + 1, 2 * k, 2 * k + 1])
+                jac = np.stack([np.ones_like(r), th_m, -np.ones_like(r),
+                                -th_g], -1)
+                normal[np.ix_(index, index)] += np.einsum(
+                    'n,ni,nj->ij', w, jac, jac)
+                rhs[index] -= np.einsum('n,ni,n->i', w, jac, r)
+                chi2_0 += np.sum(w * r * r)
+                n_points += r.size
+    free = np.ones(n_par, dtype=bool)
+    free[2 * names.index(reference) + np.arange(2)] = False
+    if not thermal:
+        free[1::2] = False
+    posterior = normal.copy()
+    if prior is not None:
+        posterior[np.diag_indices(n_par)] += np.tile(
+            1. / np.square(np.asarray(prior, dtype=float)), len(names))
+    try:
+        inv = np.linalg.inv(posterior[np.ix_(free, free)])
+    except np.linalg.LinAlgError:
+        raise ValueError('the corrections are not constrained by the data, '
+                         'fix more of them or give a prior')
+    x = np.zeros(n_par)
+    x[free] = inv.dot(rhs[free])
+    # sum of w (r + J x)^2 from the accumulated blocks
+    chi2 = chi2_0 - 2. * x.dot(rhs) + x.dot(normal).dot(x)
+    dof = n_points - int(free.sum())
+    cov = np.zeros((n_par, n_par))
+    cov[np.ix_(free, free)] = inv * (chi2 / dof if scale_cov else 1.)
+    return CalibrationResult(names, x.reshape(-1, 2),
+                             np.sqrt(np.diag(cov)).reshape(-1, 2), cov, chi2,
+                             dof, n_points)
+
+
+def corrected_p(result, name, v, temp):
+    """
+    calculate pressure with the fitted correction of a scale
+
+    :param result: CalibrationResult
+    :param name: scale name, e.g. 'Au-Dorogokupets2007'
+    :param v: unit-cell volume in A^3
+    :param temp: temperature in K
+    :return: corrected pressure in GPa and its standard deviation from the
+        covariance of the correction
+    """
+    scale = get_scale(name)
+    v = np.asarray(v, dtype=float)
+    temp = np.broadcast_to(np.asarray(temp, dtype=float), v.shape)
+    p, p_th = _terms(scale, v, temp)[:2]
+    k = result.names.index(name)
+    a, b = result.params[k]
+    cov = result.cov[2 * k:2 * k + 2, 2 * k:2 * k + 2]
+    s_p = np.sqrt(cov[0, 0] + 2. * cov[0, 1] * p_th + cov[1, 1] * p_th ** 2)
+    return p + a + b * p_th, s_p
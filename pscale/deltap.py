@@ -0,0 +1,196 @@
+"""
+Delta P with correlated uncertainties.
+
+P(marker) and P(MgO) of one measurement share its temperature, so their
+errors are correlated and the variance of Delta P = P(marker) - P(MgO)
+is not the sum of the two variances.  With `uncertainties` this needs
+object arrays that carry the dependencies of every element.  Here every
+measurement keeps one small Jacobian of Delta P over (V(marker), V(MgO),
+T) per scale pair, and the measurement sigmas are diagonal, so
+
+    var(Delta P) = sum_i (J_i sigma_i)^2 + parameter terms,
+
+and the covariance between the Delta P of two scale pairs at the same
+point is sum_i J_i J'_i sigma_i^2 plus the parameter terms they share.
+Everything is plain array math in O(n_pairs x n) memory.
+
+Scale parameters are handled as in `pscale.linear`: every uncertain
+parameter is its own variable, so a scale contributes the same error to
+all points, and different scales are independent.
+"""
+from collections import namedtuple
+import numpy as np
+from . import kernels
+from .linear import param_sensitivities
+
+DPResult = namedtuple('DPResult', ['p_mgo', 'dp', 's_p_mgo', 's_dp', 'jac',
+                                   'sigma', 'params', 's_p'])
+DPResult.__doc__ = """
+result of `cal_dp`
+
+:param p_mgo: P(MgO) in GPa, (n_pairs x n)
+:param dp: Delta P = P(marker) - P(MgO) in GPa, (n_pairs x n)
+:param s_p_mgo: standard deviation of P(MgO), (n_pairs x n)
+:param s_dp: standard deviation of Delta P with the correlation through
+    T, (n_pairs x n)
+:param jac: derivatives of Delta P over V(marker), V(MgO) and T,
+    (n_pairs x n x 3)
+:param sigma: sigmas of V(marker), V(MgO) and T, (n x 3)
+:param params: for every pair, dict of scale parameter variable and the
+    resulting error of Delta P, (n,)
+:param s_p: standard deviation of P(marker), (n_pairs x n)
+"""
+
+
+def _param_terms(scale, v, temp):
+    """
+    :return: dict of scale parameter variable and dP/dx times sigma(x)
+    """
+    if kernels.is_supported(scale):
+        return param_sensitivities(scale, v, temp)
+    p = np.ravel(scale.cal_p(v, temp))
+    terms = {}
+    for k, x in enumerate(p):
+        for variable, value in x.error_components().items():
+            terms.setdefault(variable, np.zeros(p.size))[k] = value
+    return terms
+
+
+def p_terms(scale, v, temp, params=True):
+    """
+    calculate pressure with the terms of its uncertainty
+
+    :param scale: pytheos scale object
+    :param v: unit-cell volume in A^3
+    :param temp: temperature in K
+    :param params: include uncertainties of the scale parameters
+    :return: P, dP/dV, dP/dT and dict of scale parameter variable and
+        dP/dx times sigma(x)
+    """
+    p, dpdv, dpdt = kernels.cal_p_any(scale, v, temp)
+    return p, dpdv, dpdt, _param_terms(scale, v, temp) if params else {}
+
+
+def combine_dp(marker, mgo, sigma):
+    """
+    combine the pressures of a marker and MgO at the same points
+
+    :param marker: `p_terms` of the marker scale
+    :param mgo: `p_terms` of the MgO scale
+    :param sigma: sigmas of V(marker), V(MgO) and T, (n x 3)
+    :return: P(MgO), Delta P, sigma P(MgO), sigma Delta P, Jacobian
+        (n x 3), dict of scale parameter variable and error of Delta P,
+        and sigma P(marker)
+    """
+    p, dpdv, dpdt, terms = marker
+    p_mgo, dpdv_mgo, dpdt_mgo, terms_mgo = mgo
+    jac = np.stack([dpdv, -dpdv_mgo, dpdt - dpdt_mgo], -1)
+    pair = dict(terms)
+    for variable, term in terms_mgo.items():
+        pair[variable] = pair.get(variable, 0.) - term
+    var_p = np.square(dpdv * sigma[..., 0]) + \
+        np.square(dpdt * sigma[..., 2]) + \
+        sum(np.square(term) for term in terms.values())
+    var_mgo = np.square(dpdv_mgo * sigma[..., 1]) + \
+        np.square(dpdt_mgo * sigma[..., 2]) + \
+        sum(np.square(term) for term in terms_mgo.values())
+    var = np.sum(np.square(jac * sigma), axis=-1) + \
+        sum(np.square(term) for term in pair.values())
+    return (p_mgo, p - p_mgo, np.sqrt(var_mgo), np.sqrt(var), jac, pair,
+            np.sqrt(var_p))
+
+
+def cal_dp(marker_scales, mgo_scales, v, v_mgo, temp, s_v=None,
+           s_v_mgo=None, s_temp=None, params=True):
+    """
+    calculate Delta P and its uncertainty for pairs of scales
+
+    :param marker_scales: pytheos scales of the marker
+    :param mgo_scales: pytheos scales of MgO, paired with marker_scales
+    :param v: unit-cell volume of the marker in A^3
+    :param v_mgo: unit-cell volume of MgO in A^3
+    :param temp: temperature in K, scalar or array
+    :param s_v: uncertainty of v, None for no uncertainty
+    :param s_v_mgo: uncertainty of v_mgo, None for no uncertainty
+    :param s_temp: uncertainty of temperature, None for no uncertainty
+    :param params: include uncertainties of the scale parameters
+    :return: DPResult
+    """
+    v, v_mgo, temp = np.broadcast_arrays(
+        *[np.atleast_1d(np.asarray(x, dtype=float))
+          for x in (v, v_mgo, temp)])
+    sigma = np.stack([np.broadcast_to(0. if s is None else
+                                      np.asarray(s, dtype=float), v.shape)
+                      for s in (s_v, s_v_mgo, s_temp)], -1)
+    n_pairs = len(marker_scales)
+    p_mgo = np.empty((n_pairs,) + v.shape)
+    dp = np.empty_like(p_mgo)
+    s_p_mgo = np.empty_like(p_mgo)
+    s_dp = np.empty_like(p_mgo)
+    s_p = np.empty_like(p_mgo)
+    jac = np.empty((n_pairs,) + v.shape + (3,))
+    terms = []
+    for k, (scale, scale_mgo) in enumerate(zip(marker_scales, mgo_scales)):
+        p_mgo[k], dp[k], s_p_mgo[k], s_dp[k], jac[k], pair, s_p[k] = \
+            combine_dp(p_terms(scale, v, temp, params),
+                       p_terms(scale_mgo, v_mgo, temp, params), sigma)
+        terms.append(pair)
+    return DPResult(p_mgo, dp, s_p_mgo, s_dp, jac, sigma, terms, s_p)
+
+
+def _scatter(result, ok):
+    """
+    :param result: DPResult of the rows in ok
+    :param ok: boolean mask of the computed rows
+    :return: DPResult of all the rows, nan for the rows not computed
+    """
+    def full(x, axis):
+        out = np.full(x.shape[:axis] + ok.shape + x.shape[axis + 1:],
+                      np.nan)
+        out[(slice(None),) * axis + (ok,)] = x
+        return out
+    params = [dict((variable, full(np.broadcast_to(term, (ok.sum(),)), 0))
+                   for variable, term in pair.items())
+              for pair in result.params]
+    return DPResult(full(result.p_mgo, 1), full(result.dp, 1),
+                    full(result.s_p_mgo, 1), full(result.s_dp, 1),
+                    full(result.jac, 1), full(result.sigma, 0), params,
+                    full(result.s_p, 1))
+
+
+def dp_dataset(dataset, marker_scales, mgo_scales, params=True):
+    """
+    calculate Delta P of a marker-MgO dataset for pairs of scales
+
+    :param dataset: `pscale.store.Dataset`, e.g. store['Au_MgO_HiT']
+    :param marker_scales: pytheos scales of the marker
+    :param mgo_scales: pytheos scales of MgO, paired with marker_scales
+    :param params: include uncertainties of the scale parameters
+    :return: DPResult, see `cal_dp`.  Only the rows valid in the marker,
+        MgO and T columns are computed; the other rows are nan.
+    """
+    __, v, s_v, v_mgo, s_v_mgo, temp, s_temp = dataset.marker_columns()
+    ok = dataset.marker_valid()
+    result = cal_dp(marker_scales, mgo_scales, v[ok], v_mgo[ok], temp[ok],
+                    s_v=None if s_v is None else s_v[ok],
+                    s_v_mgo=None if s_v_mgo is None else s_v_mgo[ok],
+                    s_temp=None if s_temp is None else s_temp[ok],
+                    params=params)
+    return _scatter(result, ok)
+
+
+def dp_cov(result):
+    """
+    calculate covariances of Delta P between scale pairs at every point
+
+    :param result: DPResult
+    :return: covariance matrices, (n x n_pairs x n_pairs).  The diagonal
+        is result.s_dp squared.
+    """
+    cov = np.einsum('ani,bni,ni->nab', result.jac, result.jac,
+                    np.square(result.sigma))
+    for a, pair_a in enumerate(result.params):
+        for b, pair_b in enumerate(result.params):
+            for variable in set(pair_a).intersection(pair_b):
+                cov[:, a, b] += pair_a[variable] * pair_b[variable]
+    return cov
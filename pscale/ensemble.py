@@ -0,0 +1,186 @@
+"""
+Pressure for ensembles of scale parameters.
+
+The comparison scripts use the nominal parameters of every scale, but the
+spread between scales is of the same size as the uncertainties of V0,
+K0, K0' and the thermal parameters.  Here parameters of a scale are given
+as arrays of samples, e.g. {'k0': k0_draws, 'k0p': k0p_draws}, and the
+float kernels in `pscale.kernels` evaluate all samples x all points in
+one broadcast: the samples enter as (n_samples x 1) columns and the data
+as a (1 x n_points) row.  A name applies to every part of the scale that
+has the parameter ('v0' to the static and thermal parts alike); a
+(part, name) key such as ('th', 'gamma0') to that part only.
+
+The broadcast is cut into chunks of at most `max_elements` values, so
+memory is bounded for any number of samples.  `cal_p_ensemble` writes
+every pressure into one array, which may be a memmap; `ensemble_budget`
+keeps only running moments and the covariance of the pressure with every
+sampled parameter, and gives the mean, spread and a first-order budget of
+the variance by parameter.
+"""
+from collections import OrderedDict, namedtuple
+import numpy as np
+from . import kernels
+
+BudgetResult = namedtuple('BudgetResult', ['names', 'mean', 'std', 'slopes',
+                                           'budget', 'n_samples'])
+BudgetResult.__doc__ = """
+result of `ensemble_budget`
+
+:param names: sampled parameters, keys of the samples
+:param mean: mean pressure in GPa, (n_points)
+:param std: standard deviation of pressure in GPa, (n_points)
+:param slopes: least-squares dP/dx of every parameter, (n_params x n_points)
+:param budget: variance of pressure from every parameter in GPa^2,
+    slope^2 var(x), (n_params x n_points)
+:param n_samples: number of samples
+"""
+
+
+def _targets(scale, key):
+    """
+    :return: list of (part, index) of the parameters a samples key sets
+    """
+    part, name = key if isinstance(key, tuple) else (None, key)
+    targets = []
+    for group, params, eqn, __ in kernels.groups:
+        if (part not in (None, group)) or (getattr(scale, eqn) is None) or \
+                (getattr(scale, params) is None):
+            continue
+        names = list(getattr(scale, params))
+        if name in names:
+            targets.append((group, names.index(name)))
+    if not targets:
+        raise KeyError('{} has no parameter {!r}'.format(
+            type(scale).__name__, key))
+    return targets
+
+
+def sample_params(scale, n_samples, seed=0):
+    """
+    draw parameters of a scale from their uncertainties
+
+    :param scale: pytheos scale object
+    :param n_samples: number of samples
+    :param seed: seed for the random number generator
+    :return: OrderedDict of (part, name) and samples for every uncertain
+        parameter.  Parameters that depend on the same `uncertainties`
+        variable are drawn together.
+    """
+    rng = np.random.default_rng(seed)
+    z = {}
+    samples = OrderedDict()
+    for group, params, eqn, __ in kernels.groups:
+        if (getattr(scale, eqn) is None) or (getattr(scale, params) is None):
+            continue
+        for name, value in getattr(scale, params).items():
+            if not getattr(value, 'std_dev', 0.):
+                continue
+            x = np.full(n_samples, value.nominal_value)
+            for variable, sigma_dx in value.error_components().items():
+                if variable not in z:
+                    z[variable] = rng.standard_normal(n_samples)
+                x += sigma_dx * z[variable]
+            samples[(group, name)] = x
+    return samples
+
+
+def _chunks(scale, v, temp, samples, max_elements):
+    """
+    evaluate the ensemble chunk by chunk
+
+    :return: generator of (sample slice, point slice, pressure)
+    """
+    keys = list(samples)
+    columns = [np.asarray(samples[key], dtype=float).ravel() for key in keys]
+    n_samples = columns[0].size if columns else 1
+    if any(c.size != n_samples for c in columns):
+        raise ValueError('all parameters need the same number of samples')
+    targets = [_targets(scale, key) for key in keys]
+    nominal = kernels.get_params(scale)
+    block = max(1, min(v.size, max_elements))
+    per_chunk = max(1, max_elements // block)
+    for start in range(0, v.size, block):
+        pts = slice(start, start + block)
+        for first in range(0, n_samples, per_chunk):
+            sl = slice(first, first + per_chunk)
+            params = {key: None if value is None else list(value)
+                      for key, value in nominal.items()}
+            for column, target in zip(columns, targets):
+                for group, i in target:
+                    params[group][i] = column[sl, None]
+            p = kernels.cal_p(scale, v[None, pts], temp[None, pts],
+                              params=params)[0]
+            yield sl, pts, np.broadcast_to(
+                p, (min(per_chunk, n_samples - first), v[pts].size))
+
+
+def _inputs(v, temp):
+    v = np.atleast_1d(np.asarray(v, dtype=float)).ravel()
+    temp = np.broadcast_to(np.asarray(temp, dtype=float), v.shape)
+    return v, temp
+
+
+def cal_p_ensemble(scale, v, temp, samples, max_elements=2 ** 21, out=None):
+    """
+    calculate pressure for every parameter sample at every point
+
+    :param scale: pytheos scale object (MGEOS)
+    :param v: unit-cell volume in A^3, 1D
+    :param temp: temperature in K, scalar or array
+    :param samples: dict of parameter name, or (part, name), and 1D samples
+        of the same length, e.g. from `sample_params`
+    :param max_elements: maximum number of values per chunk
+    :param out: array to write into, e.g. a memmap, (n_samples x n_points)
+    :return: pressure in GPa, (n_samples x n_points)
+    """
+    v, temp = _inputs(v, temp)
+    n_samples = len(next(iter(samples.values()))) if samples else 1
+    if out is None:
+        out = np.empty((n_samples, v.size))
+    for sl, pts, p in _chunks(scale, v, temp, samples, max_elements):
+        out[sl, pts] = p
+    return out
+
+
+def ensemble_budget(scale, v, temp, samples, max_elements=2 ** 21):
+    """
+    calculate spread and parameter budget of pressure over an ensemble
+
+    :param scale: pytheos scale object (MGEOS)
+    :param v: unit-cell volume in A^3, 1D
+    :param temp: temperature in K, scalar or array
+    :param samples: dict of parameter name, or (part, name), and 1D samples
+        of the same length, e.g. from `sample_params`
+    :param max_elements: maximum number of values per chunk
+    :return: BudgetResult
+    :note: the budget is first order and assumes independent parameters;
+        its sum falls short of std^2 where P is curved in the parameters.
+    """
+    v, temp = _inputs(v, temp)
+    names = list(samples)
+    x = np.stack([np.asarray(samples[key], dtype=float).ravel()
+                  for key in names], -1) if names else np.empty((1, 0))
+    dx = x - x.mean(axis=0)
+    ss = np.square(dx).sum(axis=0)
+    count = np.zeros(v.size)
+    mean = np.zeros(v.size)
+    m2 = np.zeros(v.size)
+    cov = np.zeros((len(names), v.size))
+    for sl, pts, p in _chunks(scale, v, temp, samples, max_elements):
+        n = p.shape[0]
+        n_a = count[pts]
+        mean_b = p.mean(axis=0)
+        # Chan et al. pairwise update of mean and M2
+        delta = mean_b - mean[pts]
+        mean[pts] += delta * n / (n_a + n)
+        m2[pts] += np.square(p - mean_b).sum(axis=0) + \
+            np.square(delta) * n_a * n / (n_a + n)
+        count[pts] += n
+        # dx sums to zero over all samples, so sum dx (p - mean) = sum dx p
+        cov[:, pts] += dx[sl].T.dot(p)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        slopes = cov / ss[:, None]
+    budget = np.square(slopes) * (ss / max(x.shape[0] - 1, 1))[:, None]
+    return BudgetResult(names, mean, np.sqrt(m2 / np.maximum(count - 1, 1)),
+                        slopes, budget, x.shape[0])
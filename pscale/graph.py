@@ -0,0 +1,218 @@
+"""
+Incremental execution of analysis stages as a dependency graph.
+
+Every node has a content hash made of its name, the code of its
+function, its own inputs (file contents, scale tokens, plot settings) and
+the hashes of the nodes it depends on.  Results are kept in a
+`pscale.cache.ResultCache` under that hash, so a run only computes nodes
+whose hash is not found; nodes that write a file are also computed when
+the file is missing.  Fresh nodes are not even loaded unless a stale node
+downstream needs them.  Node names start with their stage, e.g.
+'p/Pt_MgO_HiT/MgO/Speziale2001', and the report counts the skipped nodes
+of every stage.
+
+The code of a function is its bytecode, constants and default
+arguments, together with the code of the pscale functions and classes it
+refers to, followed recursively, so editing a helper a node calls makes
+the node stale.  Code outside pscale (numpy, pytheos) is not followed;
+change `Graph.version` after upgrading those.
+"""
+from collections import OrderedDict
+import hashlib
+import inspect
+import os
+import numpy as np
+from .cache import get_cache, make_key
+
+_STAMP = (np.zeros(0),)
+
+
+def file_token(filename):
+    """
+    :param filename: file name
+    :return: sha1 hex digest of the file contents
+    """
+    h = hashlib.sha1()
+    with open(filename, 'rb') as f:
+        for block in iter(lambda: f.read(2 ** 20), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _const_token(value, namespace, seen):
+    if inspect.iscode(value):
+        # nested functions and comprehensions see the same globals
+        return _code_token(value, namespace, seen)
+    if isinstance(value, frozenset):
+        # set order changes with string hash randomization
+        return repr(sorted(repr(v) for v in value))
+    if isinstance(value, tuple):
+        return '({})'.format(','.join(_const_token(v, namespace, seen)
+                                      for v in value))
+    return repr(value)
+
+
+def _code_token(code, namespace, seen):
+    """
+    :return: token of a code object and of the pscale objects it refers
+        to by name in namespace (globals or a module)
+    """
+    parts = [code.co_code.hex(),
+             _const_token(code.co_consts, namespace, seen),
+             repr(code.co_names)]
+    names = set(code.co_names)
+    for name in code.co_names:
+        value = namespace.get(name)
+        if inspect.ismodule(value) and _is_own(value):
+            # module.function, with both names in co_names
+            parts += [func_token(getattr(value, attr), seen)
+                      for attr in sorted(names)
+                      if _is_own(getattr(value, attr, None))]
+        elif _is_own(value):
+            parts.append(func_token(value, seen))
+    return '|'.join(parts)
+
+
+def _is_own(obj):
+    return (inspect.isfunction(obj) or inspect.isclass(obj) or
+            inspect.ismodule(obj)) and \
+        (getattr(obj, '__module__', None) or getattr(obj, '__name__', '')
+         ).split('.')[0] == __name__.split('.')[0]
+
+
+def func_token(func, seen=None):
+    """
+    :param func: function or class
+    :return: hex digest of its code, constants and defaults and of the
+        pscale functions and classes it refers to
+    """
+    seen = set() if seen is None else seen
+    func = inspect.unwrap(func)
+    if id(func) in seen or inspect.ismodule(func):
+        return ''
+    seen.add(id(func))
+    if inspect.isclass(func):
+        parts = [func.__qualname__] + [
+            func_token(value, seen) for __, value in
+            sorted(vars(func).items()) if inspect.isfunction(value)]
+    else:
+        code = getattr(func, '__code__', None)
+        if code is None:
+            return repr(func)
+        parts = [func.__qualname__, _code_token(code, func.__globals__, seen),
+                 repr(func.__defaults__),
+                 repr(sorted((func.__kwdefaults__ or {}).items()))]
+        for cell in func.__closure__ or ():
+            try:
+                value = cell.cell_contents
+            except ValueError:
+                continue
+            if _is_own(value):
+                parts.append(func_token(value, seen))
+    return hashlib.sha1('|'.join(parts).encode()).hexdigest()
+
+
+class Graph(object):
+    """
+    dependency graph of cached stages
+    """
+    version = '2'
+
+    def __init__(self, cache=True):
+        """
+        :param cache: ResultCache, True for the shared cache in
+            `pscale.cache`
+        """
+        self.cache = get_cache(cache)
+        if self.cache is None:
+            raise ValueError('a graph needs a cache')
+        self.nodes = OrderedDict()
+        self.status = OrderedDict()
+        self._hash = {}
+
+    def add(self, name, func, deps=(), key=(), output=None):
+        """
+        add a node
+
+        :param name: unique node name, e.g. 'p/Pt_MgO_HiT/MgO/Speziale2001'
+        :param func: called with the results of `deps` in order, returns a
+            tuple of arrays, or None for nodes that only write `output`
+        :param deps: names of the nodes this node depends on
+        :param key: strings or arrays that identify the other inputs
+        :param output: file written by the node
+        """
+        for dep in deps:
+            if dep not in self.nodes:
+                raise ValueError('{} depends on unknown node {}'.format(
+                    name, dep))
+        self.nodes[name] = (func, tuple(deps), tuple(key), output)
+        self._hash.pop(name, None)
+
+    def hash(self, name):
+        """
+        :param name: node name
+        :return: content hash of the node
+        """
+        if name not in self._hash:
+            func, deps, key, output = self.nodes[name]
+            self._hash[name] = make_key(
+                'graph', self.version, name, func_token(func),
+                str(output), *(list(key) + [self.hash(d) for d in deps]))
+        return self._hash[name]
+
+    def _evaluate(self, name, results):
+        if name in results:
+            return results[name]
+        func, deps, __, output = self.nodes[name]
+        key = self.hash(name)
+        value = self.cache.get(key)
+        if value is not None and (output is None or os.path.exists(output)):
+            self.status[name] = 'skipped'
+        else:
+            value = func(*[self._evaluate(d, results) for d in deps])
+            value = _STAMP if value is None else tuple(value)
+            self.cache.put(key, value)
+            self.status[name] = 'computed'
+        results[name] = value
+        return value
+
+    def run(self, targets=None):
+        """
+        bring nodes up to date
+
+        :param targets: node names, None for all nodes that no other node
+            depends on
+        :return: dict of node name and result for the nodes that were
+            evaluated
+        :note: nodes upstream of fresh nodes are not visited and count as
+            skipped
+        """
+        if targets is None:
+            used = set(d for node in self.nodes.values() for d in node[1])
+            targets = [name for name in self.nodes if name not in used]
+        self.status = OrderedDict()
+        results = {}
+        for name in targets:
+            self._evaluate(name, results)
+        self.status = OrderedDict((name, self.status.get(name, 'skipped'))
+                                  for name in self.nodes)
+        return results
+
+    def report(self):
+        """
+        :return: text with the status of every node of the last run and
+            the number of skipped nodes of every stage, the part of the
+            node name before the first '/'
+        """
+        lines = ['{:<9s} {}'.format(status, name)
+                 for name, status in self.status.items()]
+        stages = OrderedDict()
+        for name, status in self.status.items():
+            count = stages.setdefault(name.split('/')[0], [0, 0])
+            count[0] += status == 'skipped'
+            count[1] += 1
+        lines += ['{:<9s} {} of {} nodes skipped'.format(stage, *count)
+                  for stage, count in stages.items()]
+        n = sum(s == 'skipped' for s in self.status.values())
+        lines.append('{} of {} nodes skipped'.format(n, len(self.status)))
+        return '\n'.join(lines)
@@ -0,0 +1,107 @@
+"""
+Delta P maps of scale pairs on dense P-T grids.
+
+For a pair of scales (A, B) of the same material, the map is
+
+    Delta P(P, T) = P_B(V_A(P, T), T) - P,
+
+the pressure scale B gives to the volume at which scale A gives P.  It is
+zero everywhere for consistent scales.  (Scales of different materials
+can only be compared through measured volume pairs, as in the comparison
+figures.)
+
+The grid is cut into tiles of at most `tile` points.  Every tile is
+evaluated vectorized (`pscale.inverse.cal_v` once per distinct scale A,
+then the float kernels of every B) and written straight into a
+memory-mapped .npy file of shape (n_pairs x n_T x n_P), so peak memory
+depends on the tile size and the number of worker processes, not on the
+grid.  Tiles are spread over a process pool; every worker opens the
+output file itself.
+"""
+from concurrent.futures import ProcessPoolExecutor
+import itertools
+import os
+import numpy as np
+from . import kernels
+from .inverse import cal_v
+
+
+def scale_pairs(scales):
+    """
+    list all ordered pairs of scales of the same material
+
+    :param scales: dict of material and list of pytheos scale objects,
+        e.g. {'Au': std_Au, 'Pt': std_Pt, 'MgO': std_MgO}
+    :return: list of (label, scale A, scale B), label 'Au: A-B'
+    """
+    pairs = []
+    for material, objs in scales.items():
+        for a, b in itertools.permutations(objs, 2):
+            pairs.append(('{}: {}-{}'.format(material, type(a).__name__,
+                                             type(b).__name__), a, b))
+    return pairs
+
+
+def _tile(task):
+    """
+    evaluate one tile of the grid and write it to the output file
+    """
+    filename, pairs, p, temp, rows, cols = task
+    out = np.load(filename, mmap_mode='r+')
+    pp, tt = np.meshgrid(p[cols], temp[rows])
+    volumes = {}
+    for k, (a, b) in enumerate(pairs):
+        if id(a) not in volumes:
+            volumes[id(a)] = cal_v(a, pp.ravel(), tt.ravel())
+        v = volumes[id(a)]
+        ok = np.isfinite(v)
+        dp = np.full(v.shape, np.nan)
+        dp[ok] = kernels.cal_p_any(b, v[ok], tt.ravel()[ok],
+                                   deriv_t=False)[0] - pp.ravel()[ok]
+        out[k, rows, cols] = dp.reshape(pp.shape)
+    out.flush()
+    del out
+
+
+def dp_grid(pairs, p, temp, filename, dtype='float64', tile=2 ** 16,
+            processes=None):
+    """
+    calculate Delta P maps of scale pairs on a P-T grid
+
+    :param pairs: list of (label, scale A, scale B), see `scale_pairs`
+    :param p: pressures of the grid in GPa, 1D
+    :param temp: temperatures of the grid in K, 1D
+    :param filename: .npy file for the output, (n_pairs x n_T x n_P)
+    :param dtype: 'float64' or 'float32' for the output.  Tiles are
+        evaluated in float64 as the volume iteration needs it; float32
+        halves the file and the memory of the tiles being written.
+    :param tile: maximum number of grid points per tile
+    :param processes: number of worker processes, None for all cores,
+        1 to run in this process
+    :return: labels of the pairs and the output as a read-only memmap,
+        nan where scale A does not reach P at T
+    """
+    p = np.asarray(p, dtype=float)
+    temp = np.asarray(temp, dtype=float)
+    labels = [label for label, __, __ in pairs]
+    scales = [(a, b) for __, a, b in pairs]
+    out = np.lib.format.open_memmap(
+        filename, mode='w+', dtype=dtype,
+        shape=(len(pairs), temp.size, p.size))
+    del out
+    n_cols = max(1, min(p.size, tile))
+    n_rows = max(1, tile // n_cols)
+    tasks = [(filename, scales, p, temp, slice(i, i + n_rows),
+              slice(j, j + n_cols))
+             for i in range(0, temp.size, n_rows)
+             for j in range(0, p.size, n_cols)]
+    if processes is None:
+        processes = os.cpu_count() or 1
+    if processes > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            for __ in pool.map(_tile, tasks):
+                pass
+    else:
+        for task in tasks:
+            _tile(task)
+    return labels, np.load(filename, mmap_mode='r')
@@ -0,0 +1,300 @@
+"""
+P-T index over computed points for region queries and binning.
+
+Points (P, T) with optional value columns, e.g. Delta P of scale pairs,
+are kept sorted by the cell of a regular grid of `dp` x `dt`.  A cell is
+one int64 code, P column major, so the cells of one P column inside a T
+range are one contiguous run of the sorted codes.  A box query is then
+one `searchsorted` per P column of the box, all columns at once, and
+only points of the cells it touches are compared with the box.  Prefix
+sums of the values (shifted by their mean, which keeps the sums of
+squares accurate) give count, mean and standard deviation of any cell in
+constant time.  Nearest-neighbour queries use a k-d tree over the same
+points, with distances in cell units, (dP / dp, dT / dt).
+
+Appended points go to a buffer that is searched directly and folded into
+the sorted block once it holds more than `merge` of it, so appends cost
+amortized O(log n) per point and every query sees all points.
+"""
+from collections import namedtuple
+import numpy as np
+
+# cell numbers are offset to be positive, P by less so that codes fit int64
+_P_OFFSET = 2 ** 30
+_T_OFFSET = 2 ** 31
+
+CellStats = namedtuple('CellStats', ['p', 'temp', 'count', 'mean', 'std'])
+CellStats.__doc__ = """
+result of `PTIndex.aggregate`
+
+:param p: P at the cell centers in GPa, (n_cells)
+:param temp: T at the cell centers in K, (n_cells)
+:param count: number of points in every cell, (n_cells)
+:param mean: mean of every value column, (n_cells x n_values)
+:param std: standard deviation of every value column, nan for cells with
+    fewer than two points, (n_cells x n_values)
+"""
+
+
+def _runs(starts, stops):
+    """
+    :return: indices of all the ranges [start, stop), concatenated
+    """
+    lengths = np.maximum(stops - starts, 0)
+    offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+    return offsets + np.arange(lengths.sum())
+
+
+class PTIndex(object):
+    """
+    grid index of (P, T) points with value columns
+    """
+
+    def __init__(self, p=None, temp=None, values=None, dp=1., dt=50.,
+                 names=None, merge=0.125):
+        """
+        :param p: pressures in GPa
+        :param temp: temperatures in K
+        :param values: value columns, (n) or (n x n_values), e.g. Delta P
+        :param dp: cell size in P in GPa
+        :param dt: cell size in T in K
+        :param names: names of the value columns
+        :param merge: fraction of the sorted block the append buffer may
+            reach before it is sorted in
+        """
+        self.dp = float(dp)
+        self.dt = float(dt)
+        self.names = names
+        self.merge = merge
+        self.n = 0
+        self._n_values = None
+        self._main = None
+        self._buffer = []
+        self._buffer_tree = None
+        if p is not None:
+            self.append(p, temp, values)
+
+    def __len__(self):
+        """
+        :return: number of indexed points, rows with nan P or T excluded
+        """
+        n_main = 0 if self._main is None else self._main['id'].size
+        return n_main + sum(b['id'].size for b in self._buffer)
+
+    def _code(self, p, temp):
+        ip = np.floor(p / self.dp).astype(np.int64) + _P_OFFSET
+        it = np.floor(temp / self.dt).astype(np.int64) + _T_OFFSET
+        return ip * 2 ** 32 + it
+
+    def append(self, p, temp, values=None):
+        """
+        add points
+
+        :param p: pressures in GPa
+        :param temp: temperatures in K, scalar or array
+        :param values: value columns, (n) or (n x n_values)
+        :return: ids of the points, their running numbers over all appends
+        """
+        p = np.atleast_1d(np.asarray(p, dtype=float)).ravel()
+        temp = np.broadcast_to(np.asarray(temp, dtype=float), p.shape)
+        if values is None:
+            values = np.empty((p.size, 0))
+        values = np.asarray(values, dtype=float).reshape(p.size, -1)
+        if self._n_values is None:
+            self._n_values = values.shape[1]
+        elif values.shape[1] != self._n_values:
+            raise ValueError('expected {} value columns, got {}'.format(
+                self._n_values, values.shape[1]))
+        ids = np.arange(self.n, self.n + p.size)
+        self.n += p.size
+        ok = np.isfinite(p) & np.isfinite(temp)
+        self._buffer.append({'p': p[ok], 'temp': temp[ok],
+                             'values': values[ok], 'id': ids[ok],
+                             'code': self._code(p[ok], temp[ok])})
+        self._buffer_tree = None
+        n_main = 0 if self._main is None else self._main['id'].size
+        if sum(b['id'].size for b in self._buffer) > self.merge * n_main:
+            self._merge()
+        return ids
+
+    def _merge(self):
+        """
+        sort the buffer into the main block
+        """
+        blocks = self._buffer if self._main is None else \
+            [self._main] + self._buffer
+        main = {key: np.concatenate([b[key] for b in blocks])
+                for key in ('p', 'temp', 'values', 'id', 'code')}
+        order = np.argsort(main['code'], kind='stable')
+        for key in ('p', 'temp', 'values', 'id', 'code'):
+            main[key] = main[key][order]
+        main['cells'], main['start'] = np.unique(main['code'],
+                                                 return_index=True)
+        main['start'] = np.append(main['start'], main['code'].size)
+        main['limits'] = (main['p'].min(), main['p'].max(),
+                          main['temp'].min(), main['temp'].max())
+        values = main['values']
+        finite = np.isfinite(values)
+        main['shift'] = np.where(finite, values, 0.).sum(axis=0) / \
+            np.maximum(finite.sum(axis=0), 1)
+        shifted = np.nan_to_num(values - main['shift'])
+        main['csum'] = [np.concatenate([np.zeros((1,) + x.shape[1:]),
+                                        np.cumsum(x, axis=0)])
+                        for x in (finite, shifted, np.square(shifted))]
+        self._main = main
+        self._buffer = []
+        self._buffer_tree = None
+
+    def _cells(self, p_min, p_max, t_min, t_max):
+        """
+        :return: indices into main['cells'] of the cells overlapping the box
+        """
+        main = self._main
+        ip = np.arange(np.floor(p_min / self.dp), np.floor(p_max / self.dp) +
+                       1).astype(np.int64) + _P_OFFSET
+        it = np.floor(np.array([t_min, t_max]) / self.dt).astype(
+            np.int64) + _T_OFFSET
+        lo = np.searchsorted(main['cells'], ip * 2 ** 32 + it[0])
+        hi = np.searchsorted(main['cells'], ip * 2 ** 32 + it[1], 'right')
+        return _runs(lo, hi)
+
+    def _bounds(self, p_min, p_max, t_min, t_max):
+        inf = np.inf
+        return (-inf if p_min is None else p_min,
+                inf if p_max is None else p_max,
+                -inf if t_min is None else t_min,
+                inf if t_max is None else t_max)
+
+    def _clip(self, p_min, p_max, t_min, t_max):
+        """
+        :return: box limited to the main block, None if they do not overlap
+        """
+        if self._main is None or self._main['id'].size == 0:
+            return None
+        limits = self._main['limits']
+        p_min, p_max = max(p_min, limits[0]), min(p_max, limits[1])
+        t_min, t_max = max(t_min, limits[2]), min(t_max, limits[3])
+        if p_min > p_max or t_min > t_max:
+            return None
+        return p_min, p_max, t_min, t_max
+
+    def range(self, p_min=None, p_max=None, t_min=None, t_max=None):
+        """
+        find the points inside a box, edges included
+
+        :param p_min: lower P in GPa, None for no limit
+        :param p_max: upper P in GPa, None for no limit
+        :param t_min: lower T in K, None for no limit
+        :param t_max: upper T in K, None for no limit
+        :return: sorted ids of the points
+        """
+        box = self._bounds(p_min, p_max, t_min, t_max)
+        found = []
+        clipped = self._clip(*box)
+        blocks = list(self._buffer)
+        if clipped is not None:
+            cells = self._cells(*clipped)
+            rows = _runs(self._main['start'][cells],
+                         self._main['start'][cells + 1])
+            blocks.append({key: self._main[key][rows] for key in
+                           ('p', 'temp', 'id')})
+        for b in blocks:
+            inside = (b['p'] >= box[0]) & (b['p'] <= box[1]) & \
+                (b['temp'] >= box[2]) & (b['temp'] <= box[3])
+            found.append(b['id'][inside])
+        return np.sort(np.concatenate(found)) if found else \
+            np.empty(0, dtype=np.int64)
+
+    def nearest(self, p, temp, k=1):
+        """
+        find the nearest points, with distances in cell units
+
+        :param p: pressures of the queries in GPa
+        :param temp: temperatures of the queries in K
+        :param k: number of neighbours
+        :return: distances and ids, (n_queries x k), inf and -1 where
+            fewer than k points are indexed
+        """
+        from scipy.spatial import cKDTree
+        p = np.atleast_1d(np.asarray(p, dtype=float)).ravel()
+        temp = np.broadcast_to(np.asarray(temp, dtype=float), p.shape)
+        if self._buffer and self._buffer_tree is None:
+            self._buffer_tree = {key: np.concatenate([b[key] for b in
+                                                      self._buffer])
+                                 for key in ('p', 'temp', 'id')}
+        trees = []
+        # the tree of the sorted block is kept until the next merge
+        for b in (self._main, self._buffer_tree):
+            if b is None or b['id'].size == 0:
+                continue
+            if 'tree' not in b:
+                b['tree'] = cKDTree(np.stack([b['p'] / self.dp,
+                                              b['temp'] / self.dt], -1))
+            trees.append((b['tree'], b['id']))
+        query = np.stack([p / self.dp, temp / self.dt], -1)
+        dist = [np.full((p.size, k), np.inf)]
+        ids = [np.full((p.size, k), -1)]
+        for tree, tree_ids in trees:
+            d, i = tree.query(query, k=min(k, tree.n))
+            d, i = d.reshape(p.size, -1), i.reshape(p.size, -1)
+            dist.append(d)
+            ids.append(tree_ids[i])
+        dist = np.concatenate(dist, axis=1)
+        ids = np.concatenate(ids, axis=1)
+        order = np.argsort(dist, axis=1, kind='stable')[:, :k]
+        return np.take_along_axis(dist, order, 1), \
+            np.take_along_axis(ids, order, 1)
+
+    def aggregate(self, p_min=None, p_max=None, t_min=None, t_max=None):
+        """
+        count, mean and standard deviation of the values in every cell
+
+        :param p_min: lower P in GPa, None for no limit
+        :param p_max: upper P in GPa, None for no limit
+        :param t_min: lower T in K, None for no limit
+        :param t_max: upper T in K, None for no limit
+        :return: CellStats of the non-empty cells that overlap the box, in
+            the order of P columns then T
+        :note: nan values are left out of the statistics of their column.
+        """
+        box = self._bounds(p_min, p_max, t_min, t_max)
+        n_values = self._n_values or 0
+        shift = np.zeros(n_values) if self._main is None else \
+            self._main['shift']
+        # per cell: number of points, then per value column the number of
+        # finite values, the sum and the sum of squares of the shifted values
+        codes = [np.empty(0, dtype=np.int64)]
+        sums = [np.empty((0, 1 + 3 * n_values))]
+        clipped = self._clip(*box)
+        if clipped is not None:
+            cells = self._cells(*clipped)
+            start = self._main['start']
+            codes.append(self._main['cells'][cells])
+            sums.append(np.concatenate(
+                [(start[cells + 1] - start[cells])[:, None]] +
+                [c[start[cells + 1]] - c[start[cells]]
+                 for c in self._main['csum']], 1))
+        cell_box = np.floor(np.array(box) / np.repeat([self.dp, self.dt], 2))
+        for b in self._buffer:
+            ip = np.floor(b['p'] / self.dp)
+            it = np.floor(b['temp'] / self.dt)
+            keep = (ip >= cell_box[0]) & (ip <= cell_box[1]) & \
+                (it >= cell_box[2]) & (it <= cell_box[3])
+            values = b['values'][keep]
+            shifted = np.nan_to_num(values - shift)
+            codes.append(b['code'][keep])
+            sums.append(np.concatenate([np.ones((values.shape[0], 1)),
+                                        np.isfinite(values), shifted,
+                                        np.square(shifted)], 1))
+        cells, inverse = np.unique(np.concatenate(codes), return_inverse=True)
+        total = np.zeros((cells.size, 1 + 3 * n_values))
+        np.add.at(total, inverse, np.concatenate(sums))
+        n, s1, s2 = np.split(total[:, 1:], 3, axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean = s1 / n + shift
+            std = np.sqrt(np.maximum(s2 - s1 * s1 / n, 0.) / (n - 1))
+        std[n < 2] = np.nan
+        ip, it = divmod(cells, 2 ** 32)
+        return CellStats((ip - _P_OFFSET + 0.5) * self.dp,
+                         (it - _T_OFFSET + 0.5) * self.dt,
+                         total[:, 0].astype(np.int64), mean, std)
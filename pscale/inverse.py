@@ -0,0 +1,143 @@
+"""
+Vectorized inversion of pressure scales, V from (P, T).
+
+pytheos `cal_v` calls a scalar root finder per element through
+`np.vectorize`.  Here all points are iterated together with a
+safeguarded Newton method: every point keeps a bracket [v_lo, v_hi] with
+P(v_lo) >= P >= P(v_hi), takes a Newton step with the analytic dP/dV, and
+falls back to bisection when the step leaves the bracket.  Only points
+that have not converged are evaluated in each iteration.
+"""
+import numpy as np
+from . import kernels
+
+
+def get_v0(scale):
+    """
+    get the reference volume of a scale
+
+    :param scale: pytheos scale object, MGEOS or JHEOS
+    :return: V0 in A^3, nominal value
+    """
+    params = getattr(scale, 'params_st', None) or scale.params_therm
+    return getattr(params['v0'], 'nominal_value', params['v0'])
+
+
+def _hugoniot_min_strain(scale, min_strain, max_strain, n=11):
+    """
+    find the smallest V/V0 before the hugoniot of a scale diverges
+
+    :param scale: pytheos scale object with a hugoniot
+    :param min_strain: smallest V/V0 to consider
+    :param max_strain: largest V/V0 to consider
+    :param n: number of V/V0 points checked
+    :return: smallest V/V0 checked down to which pressure increases on
+        compression
+    """
+    v0 = get_v0(scale)
+    last = max_strain
+    p_last = -np.inf
+    for strain in np.linspace(max_strain, min_strain, n):
+        try:
+            p = kernels.cal_p_any(scale, np.array([v0 * strain]),
+                                  np.array([300.]), deriv_t=False)[0][0]
+        except (ValueError, ArithmeticError, UnboundLocalError):
+            # pytheos fails for states far off the hugoniot
+            break
+        if not p > p_last:
+            break
+        last, p_last = strain, p
+    return last
+
+
+def cal_v(scale, p, temp, min_strain=0.3, max_strain=1.3, n_grid=16,
+          p_tol=1.e-9, max_iter=100):
+    """
+    calculate unit-cell volume at given pressure and temperature
+
+    :param scale: pytheos scale object
+    :param p: pressure in GPa
+    :param temp: temperature in K
+    :param min_strain: smallest V/V0 searched
+    :param max_strain: largest V/V0 searched
+    :param n_grid: number of V/V0 grid points for the initial brackets
+    :param p_tol: convergence tolerance in GPa
+    :param max_iter: maximum number of iterations
+    :return: unit-cell volume in A^3, nan where P is not reached in the
+        search range or the iteration did not converge
+    :note: at high temperature and large volume some thermal models make
+        P(V) turn up again.  The bracket is the first grid interval,
+        going from small to large volume, that contains P, so the root on
+        the compressed branch is found.
+    :note: the hugoniot of Jamieson's scales is defined for compression
+        only and diverges at strong compression, so their search is
+        limited to V/V0 < 1 and to the range where P(V) at 300 K is
+        monotonic, at most down to V/V0 = 0.5.  These scales have no
+        analytic kernels, so the grid is reduced to the end points of
+        this range, as every evaluation runs through pytheos.
+    """
+    p, temp = np.broadcast_arrays(np.asarray(p, dtype=float),
+                                  np.asarray(temp, dtype=float))
+    shape = p.shape
+    p = p.ravel()
+    temp = temp.ravel()
+    v0 = get_v0(scale)
+    if not kernels.is_supported(scale):
+        max_strain = min(max_strain, 1. - 1.e-4)
+        min_strain = _hugoniot_min_strain(scale, max(min_strain, 0.5),
+                                          max_strain)
+        n_grid = 2
+    grid = v0 * np.linspace(min_strain, max_strain, n_grid)
+    p_grid = kernels.cal_p_any(scale, grid[:, None], temp[None, :],
+                               deriv_t=False)[0]
+    inside = (p_grid[:-1] >= p) & (p_grid[1:] <= p)
+    k = np.argmax(inside, axis=0)
+    active = np.flatnonzero(inside.any(axis=0))
+    k = k[active]
+    a = grid[k]
+    b = grid[k + 1]
+    p_a = p_grid[k, active]
+    p_b = p_grid[k + 1, active]
+    target = p[active]
+    t = temp[active]
+    v = np.full(p.size, np.nan)
+    # start from linear interpolation in the bracket
+    with np.errstate(divide='ignore', invalid='ignore'):
+        w = np.nan_to_num((p_a - target) / (p_a - p_b))
+    x = a + w * (b - a)
+    for __ in range(max_iter):
+        if active.size == 0:
+            break
+        f, dfdv, __ = kernels.cal_p_any(scale, x, t, deriv_t=False)
+        f = f - target
+        done = np.abs(f) <= p_tol
+        v[active[done]] = x[done]
+        # pressure decreases with volume
+        a = np.where(f > 0., x, a)
+        b = np.where(f < 0., x, b)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            step = x - f / dfdv
+        bad = ~((step > a) & (step < b))
+        step[bad] = 0.5 * (a[bad] + b[bad])
+        done |= (b - a) <= 1.e-13 * v0
+        v[active[done]] = np.where(np.abs(f[done]) <= p_tol, x[done],
+                                   step[done])
+        keep = ~done
+        active, x, a, b, target, t = active[keep], step[keep], a[keep], \
+            b[keep], target[keep], t[keep]
+    return v.reshape(shape)
+
+
+def cal_v_batch(scales, p, temp, **kwargs):
+    """
+    calculate unit-cell volumes for a list of scales
+
+    :param scales: list of pytheos scale objects
+    :param p: pressure in GPa
+    :param temp: temperature in K
+    :param kwargs: passed to `cal_v`
+    :return: volumes in A^3, (n_scales x n_points)
+    """
+    p = np.atleast_1d(np.asarray(p, dtype=float))
+    return np.stack([cal_v(scale, p, temp, **kwargs).ravel()
+                     for scale in scales])
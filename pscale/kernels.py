@@ -0,0 +1,641 @@
+"""
+Float kernels for the pytheos Mie-Gruneisen scales with analytic
+derivatives.
+
+pytheos evaluates scales through `uncertainties` objects and
+`np.vectorize`, one Python object per element.  The functions here
+reproduce the same equations on plain float64 arrays and return the
+partial derivatives dP/dV and dP/dT next to the pressure.
+
+The Debye energy is the same rational approximation pytheos uses
+(`pytheos.eqn_debye`), and its derivative is the derivative of that
+approximation, so values and sensitivities agree with pytheos to
+rounding.
+
+All kernels broadcast: parameters may be arrays (see `pscale.ensemble`),
+and they accept complex parameters so that parameter sensitivities can be
+taken by complex step (see `pscale.linear`).
+"""
+from collections import OrderedDict
+import numpy as np
+from scipy import constants
+from scipy.special import expi
+
+
+def vol_uc2mol(v, z):
+    """
+    convert unit-cell volume in A^3 to molar volume in m^3/mol
+
+    :param v: unit-cell volume in A^3
+    :param z: number of formula unit in a unit cell
+    :return: molar volume in m^3/mol
+    """
+    return v * 1.e-30 * constants.N_A / z
+
+
+def _expi(x):
+    """
+    exponential integral that also takes complex-step arguments
+
+    :param x: argument, real or with a small imaginary part
+    :return: Ei(x)
+    :note: scipy drops imaginary parts below ~1e-16, so the complex case
+        is extended to first order, which is exact for complex steps.
+    """
+    if np.iscomplexobj(x):
+        return expi(x.real) + 1j * x.imag * np.exp(x.real) / x.real
+    return expi(x)
+
+
+def debye_E(x):
+    """
+    calculate Debye energy and its derivative
+
+    :param x: Debye x value, theta / T
+    :return: Debye energy, d(Debye energy)/dx
+    :note: same piecewise approximation as pytheos.eqn_debye.debye_E
+    """
+    x = np.asarray(x)
+    dtype = np.result_type(x, float)
+    d = np.zeros(x.shape, dtype=dtype)
+    dd = np.zeros(x.shape, dtype=dtype)
+    xr = x.real
+    m1 = (xr > 0.) & (xr <= 0.1)
+    m2 = (xr > 0.1) & (xr <= 7.25)
+    m3 = xr > 7.25
+    if m1.any():
+        x1 = x[m1]
+        d[m1] = 1. - 0.375 * x1 + x1 * x1 * (0.05 - 5.952380953e-4 * x1 * x1)
+        dd[m1] = -0.375 + 0.1 * x1 - 4. * 5.952380953e-4 * x1 * x1 * x1
+    if m2.any():
+        x2 = x[m2]
+        num = (((.0946173 * x2 - 4.432582) * x2 + 85.07724) * x2 -
+               800.6087) * x2 + 3953.632
+        dnum = ((4. * .0946173 * x2 - 3. * 4.432582) * x2 +
+                2. * 85.07724) * x2 - 800.6087
+        den = (((x2 + 15.121491) * x2 + 143.155337) * x2 + 682.0012) * \
+            x2 + 3953.632
+        dden = ((4. * x2 + 3. * 15.121491) * x2 + 2. * 143.155337) * x2 + \
+            682.0012
+        d[m2] = num / den
+        dd[m2] = (dnum * den - num * dden) / (den * den)
+    if m3.any():
+        x3 = x[m3]
+        n_terms = np.round(25. / x3.real).astype(np.int64)
+        s = np.zeros(x3.shape, dtype=dtype)
+        ds = np.zeros(x3.shape, dtype=dtype)
+        for i in range(1, n_terms.max() + 1):
+            use = i <= n_terms
+            exx = np.exp(-i * x3)
+            ix = i * x3
+            s += np.where(use, exx * (6. + ix * (6. + ix * (3. + ix))) /
+                          float(i) ** 4, 0.)
+            ds += np.where(use, exx, 0.)
+        d3 = 3.0 * (6.493939402 - s) / (x3 * x3 * x3)
+        d[m3] = d3
+        dd[m3] = 3. * ds - 3. * d3 / x3
+    return d, dd
+
+
+# static equations, each returns pressure and dP/dV
+
+
+def bm3_p(v, v0, k0, k0p):
+    """
+    calculate pressure from 3rd order Birch-Murnaghan equation
+
+    :param v: unit-cell volume in A^3
+    :param v0: unit-cell volume in A^3 at 1 bar
+    :param k0: bulk modulus at reference conditions
+    :param k0p: pressure derivative of bulk modulus at reference conditions
+    :return: pressure in GPa, dP/dV in GPa/A^3
+    """
+    x = v / v0
+    f = np.power(x, -2. / 3.)
+    g = np.power(x, -5. / 3.)
+    u = 1. - f
+    a = -1.5 * k0 * u + 9. / 8. * k0 * (k0p - 4.) * u * u
+    da = (-1.5 * k0 + 9. / 4. * k0 * (k0p - 4.) * u) * (2. / 3.) * g
+    p = a * g
+    dpdx = da * g - 5. / 3. * a * g / x
+    return p, dpdx / v0
+
+
+def vinet_p(v, v0, k0, k0p):
+    """
+    calculate pressure from vinet equation
+
+    :param v: unit-cell volume in A^3
+    :param v0: unit-cell volume in A^3 at 1 bar
+    :param k0: bulk modulus at reference conditions
+    :param k0p: pressure derivative of bulk modulus at reference conditions
+    :return: pressure in GPa, dP/dV in GPa/A^3
+    """
+    return _kunc_p(v, v0, k0, k0p, 2, 1.5 * (k0p - 1.))
+
+
+def kunc_p(v, v0, k0, k0p, order=5):
+    """
+    calculate pressure from Kunc equation, see Dorogokupets 2015
+
+    :param v: unit-cell volume in A^3
+    :param v0: unit-cell volume in A^3 at 1 bar
+    :param k0: bulk modulus at reference conditions
+    :param k0p: pressure derivative of bulk modulus at reference conditions
+    :param order: order for the Kunc equation
+    :return: pressure in GPa, dP/dV in GPa/A^3
+    """
+    return _kunc_p(v, v0, k0, k0p, order, 1.5 * k0p - order + 0.5)
+
+
+def _kunc_p(v, v0, k0, k0p, order, eta):
+    """
+    common form of the vinet and Kunc equations
+
+    :note: internal function.  vinet is Kunc with order 2.
+    """
+    y = np.power(v / v0, 1. / 3.)
+    e = np.exp(eta * (1. - y))
+    yk = np.power(y, order)
+    p = 3. * k0 * (1. - y) / yk * e
+    dpdy = 3. * k0 * e / yk * (-1. - order * (1. - y) / y - eta * (1. - y))
+    return p, dpdy * y / (3. * v)
+
+
+# Gruneisen parameter models, each returns gamma, dgamma/dV and the Debye
+# (or Einstein) temperature for a given theta0.  For all of them
+# dtheta/dV = -gamma * theta / V.
+
+
+def constq_grun(v, v0, gamma0, q, theta0):
+    """
+    calculate Gruneisen parameter and Debye temperature for constant q
+
+    :param v: unit-cell volume in A^3
+    :param v0: unit-cell volume in A^3 at 1 bar
+    :param gamma0: Gruneisen parameter at 1 bar
+    :param q: logarithmic derivative of Gruneisen parameter
+    :param theta0: Debye temperature at 1 bar in K
+    :return: gamma, dgamma/dV, theta
+    """
+    gamma = gamma0 * np.power(v / v0, q)
+    theta = theta0 * np.exp((gamma0 - gamma) / q)
+    return gamma, q * gamma / v, theta
+
+
+def altshuler_grun(v, v0, gamma0, gamma_inf, beta, theta0):
+    """
+    calculate Gruneisen parameter and Debye temperature for Altshuler form
+
+    :param v: unit-cell volume in A^3
+    :param v0: unit-cell volume in A^3 at 1 bar
+    :param gamma0: Gruneisen parameter at 1 bar
+    :param gamma_inf: Gruneisen parameter at infinite pressure
+    :param beta: volume dependence of Gruneisen parameter
+    :param theta0: Debye temperature at 1 bar in K
+    :return: gamma, dgamma/dV, theta
+    """
+    x = v / v0
+    xb = np.power(x, beta)
+    gamma = gamma_inf + (gamma0 - gamma_inf) * xb
+    theta = theta0 * np.power(x, -1. * gamma_inf) * \
+        np.exp((gamma0 - gamma_inf) / beta * (1. - xb))
+    return gamma, beta * (gamma0 - gamma_inf) * xb / v, theta
+
+
+def tange_grun(v, v0, gamma0, a, b, theta0):
+    """
+    calculate Gruneisen parameter and Debye temperature for Tange form
+
+    :param v: unit-cell volume in A^3
+    :param v0: unit-cell volume in A^3 at 1 bar
+    :param gamma0: Gruneisen parameter at 1 bar
+    :param a: volume-independent adjustable parameters
+    :param b: volume-independent adjustable parameters
+    :param theta0: Debye temperature at 1 bar in K
+    :return: gamma, dgamma/dV, theta
+    """
+    x = v / v0
+    xb = np.power(x, b)
+    gamma = gamma0 * (1. + a * (xb - 1.))
+    theta = theta0 * np.power(x, -1. * (1. - a) * gamma0) * \
+        np.exp((gamma0 - gamma) / b)
+    return gamma, gamma0 * a * b * xb / v, theta
+
+
+def speziale_grun(v, v0, gamma0, q0, q1, theta0):
+    """
+    calculate Gruneisen parameter and Debye temperature for Speziale form
+
+    :param v: unit-cell volume in A^3
+    :param v0: unit-cell volume in A^3 at 1 bar
+    :param gamma0: Gruneisen parameter at 1 bar
+    :param q0: logarithmic derivative of Gruneisen parameter
+    :param q1: logarithmic derivative of Gruneisen parameter
+    :param theta0: Debye temperature at 1 bar in K
+    :return: gamma, dgamma/dV, theta
+    :note: pytheos integrates gamma/V with quad for every element.  The
+        integral has a closed form in the exponential integral Ei.
+    """
+    xq = np.power(v / v0, q1)
+    a = q0 / q1
+    gamma = gamma0 * np.exp(a * (xq - 1.))
+    integ = gamma0 * np.exp(-a) / q1 * (_expi(a * xq) - _expi(a))
+    theta = theta0 * np.exp(-integ)
+    return gamma, gamma * q0 * xq / v, theta
+
+
+# thermal pressure equations, each returns P_th, dP_th/dV and dP_th/dT
+
+
+def _debye_pth(v, temp, grun, n, z, t_ref, three_r):
+    """
+    Mie-Gruneisen thermal pressure with a Debye model
+
+    :param grun: (gamma, dgamma/dV, theta) from one of the *_grun functions
+    :note: internal function
+    """
+    gamma, dgamma, theta = grun
+    v_mol = vol_uc2mol(v, z)
+    d, dd = debye_E(theta / temp)
+    e_th = three_r * n * temp * d
+    de_dtheta = three_r * n * dd
+    cv = three_r * n * (d - theta / temp * dd)
+    if t_ref == 0.:
+        e_th0 = 0.
+        de0_dtheta = 0.
+    else:
+        d0, dd0 = debye_E(theta / t_ref)
+        e_th0 = three_r * n * t_ref * d0
+        de0_dtheta = three_r * n * dd0
+    del_e = e_th - e_th0
+    dtheta = -1. * gamma * theta / v
+    p_th = gamma / v_mol * del_e * 1.e-9
+    dpdv = ((dgamma - gamma / v) / v_mol * del_e +
+            gamma / v_mol * (de_dtheta - de0_dtheta) * dtheta) * 1.e-9
+    dpdt = gamma / v_mol * cv * 1.e-9
+    return p_th, dpdv, dpdt
+
+
+def constq_pth(v, temp, v0, gamma0, q, theta0, n, z, t_ref=300.,
+               three_r=3. * constants.R):
+    """
+    calculate thermal pressure for constant q
+
+    :param v: unit-cell volume in A^3
+    :param temp: temperature in K
+    :param v0: unit-cell volume in A^3 at 1 bar
+    :param gamma0: Gruneisen parameter at 1 bar
+    :param q: logarithmic derivative of Gruneisen parameter
+    :param theta0: Debye temperature in K
+    :param n: number of atoms in a formula unit
+    :param z: number of formula unit in a unit cell
+    :param t_ref: reference temperature
+    :param three_r: 3R in case adjustment is needed
+    :return: thermal pressure in GPa, dP/dV, dP/dT
+    """
+    return _debye_pth(v, temp, constq_grun(v, v0, gamma0, q, theta0),
+                      n, z, t_ref, three_r)
+
+
+def tange_pth(v, temp, v0, gamma0, a, b, theta0, n, z, t_ref=300.,
+              three_r=3. * constants.R):
+    """
+    calculate thermal pressure for the Tange equation
+
+    :param v: unit-cell volume in A^3
+    :param temp: temperature in K
+    :param v0: unit-cell volume in A^3 at 1 bar
+    :param gamma0: Gruneisen parameter at 1 bar
+    :param a: volume-independent adjustable parameters
+    :param b: volume-independent adjustable parameters
+    :param theta0: Debye temperature at 1 bar in K
+    :param n: number of atoms in a formula unit
+    :param z: number of formula unit in a unit cell
+    :param t_ref: reference temperature
+    :param three_r: 3R in case adjustment is needed
+    :return: thermal pressure in GPa, dP/dV, dP/dT
+    """
+    return _debye_pth(v, temp, tange_grun(v, v0, gamma0, a, b, theta0),
+                      n, z, t_ref, three_r)
+
+
+def speziale_pth(v, temp, v0, gamma0, q0, q1, theta0, n, z, t_ref=300.,
+                 three_r=3. * constants.R):
+    """
+    calculate thermal pressure for the Speziale equation
+
+    :param v: unit-cell volume in A^3
+    :param temp: temperature in K
+    :param v0: unit-cell volume in A^3 at 1 bar
+    :param gamma0: Gruneisen parameter at 1 bar
+    :param q0: logarithmic derivative of Gruneisen parameter
+    :param q1: logarithmic derivative of Gruneisen parameter
+    :param theta0: Debye temperature at 1 bar in K
+    :param n: number of atoms in a formula unit
+    :param z: number of formula unit in a unit cell
+    :param t_ref: reference temperature
+    :param three_r: 3R in case adjustment is needed
+    :return: thermal pressure in GPa, dP/dV, dP/dT
+    """
+    return _debye_pth(v, temp,
+                      speziale_grun(v, v0, gamma0, q0, q1, theta0),
+                      n, z, t_ref, three_r)
+
+
+def dorogokupets2007_pth(v, temp, v0, gamma0, gamma_inf, beta, theta0, n, z,
+                         t_ref=300., three_r=3. * constants.R):
+    """
+    calculate thermal pressure for Dorogokupets 2007 EOS
+
+    :param v: unit-cell volume in A^3
+    :param temp: temperature in K
+    :param v0: unit-cell volume in A^3 at 1 bar
+    :param gamma0: Gruneisen parameter at 1 bar
+    :param gamma_inf: Gruneisen parameter at infinite pressure
+    :param beta: volume dependence of Gruneisen parameter
+    :param theta0: Debye temperature at 1 bar in K
+    :param n: number of elements in a chemical formula
+    :param z: number of formula unit in a unit cell
+    :param t_ref: reference temperature, 300 K
+    :param three_r: 3 times gas constant
+    :return: thermal pressure in GPa, dP/dV, dP/dT
+    """
+    return _debye_pth(v, temp,
+                      altshuler_grun(v, v0, gamma0, gamma_inf, beta, theta0),
+                      n, z, t_ref, three_r)
+
+
+def _einstein(theta, temp):
+    """
+    Einstein energy term theta / (exp(theta/T) - 1) and its derivatives
+
+    :return: value, d/dtheta, d/dT
+    :note: internal function
+    """
+    y = theta / temp
+    ey = np.exp(y)
+    em1 = ey - 1.
+    f = theta / em1
+    df_dtheta = 1. / em1 - y * ey / (em1 * em1)
+    df_dt = y * y * ey / (em1 * em1)
+    return f, df_dtheta, df_dt
+
+
+def dorogokupets2015_pth(v, temp, v0, gamma0, gamma_inf, beta, theta01,
+                         m1, theta02, m2, n, z, t_ref=300.,
+                         three_r=3. * constants.R):
+    """
+    calculate thermal pressure for Dorogokupets 2015 EOS
+
+    :param v: unit-cell volume in A^3
+    :param temp: temperature in K
+    :param v0: unit-cell volume in A^3 at 1 bar
+    :param gamma0: Gruneisen parameter at 1 bar
+    :param gamma_inf: Gruneisen parameter at infinite pressure
+    :param beta: volume dependence of Gruneisen parameter
+    :param theta01: Einstein temperature at 1 bar in K
+    :param m1: weighting factor, see Dorogokupets 2015 for detail
+    :param theta02: Einstein temperature at 1 bar in K
+    :param m2: weighting factor, see Dorogokupets 2015 for detail
+    :param n: number of elements in a chemical formula
+    :param z: number of formula unit in a unit cell
+    :param t_ref: reference temperature, 300 K
+    :param three_r: 3 times gas constant
+    :return: thermal pressure in GPa, dP/dV, dP/dT
+    """
+    v_mol = vol_uc2mol(v, z)
+    p_th = 0.
+    dpdv = 0.
+    dpdt = 0.
+    for theta0, m in ((theta01, m1), (theta02, m2)):
+        gamma, dgamma, theta = altshuler_grun(v, v0, gamma0, gamma_inf,
+                                              beta, theta0)
+        c = m / (m1 + m2) * three_r * n * 1.e-9
+        f, df_dtheta, df_dt = _einstein(theta, temp)
+        f0, df0_dtheta, __ = _einstein(theta, t_ref)
+        dtheta = -1. * gamma * theta / v
+        p_th = p_th + c * gamma / v_mol * (f - f0)
+        dpdv = dpdv + c * ((dgamma - gamma / v) / v_mol * (f - f0) +
+                           gamma / v_mol * (df_dtheta - df0_dtheta) * dtheta)
+        dpdt = dpdt + c * gamma / v_mol * df_dt
+    return p_th, dpdv, dpdt
+
+
+def alphakt_pth(v, temp, v0, alpha0, k0, n, z, t_ref=300.,
+                three_r=3. * constants.R):
+    """
+    calculate thermal pressure from thermal expansion and bulk modulus
+
+    :param v: unit-cell volume in A^3
+    :param temp: temperature in K
+    :param v0: unit-cell volume in A^3 at 1 bar
+    :param alpha0: thermal expansion parameter at 1 bar in K-1
+    :param k0: bulk modulus in GPa
+    :param n: number of atoms in a formula unit
+    :param z: number of formula unit in a unit cell
+    :param t_ref: reference temperature
+    :param three_r: 3R in case adjustment is needed
+    :return: thermal pressure in GPa, dP/dV, dP/dT
+    """
+    p_th = alpha0 * k0 * (temp - t_ref)
+    return p_th, 0. * p_th, alpha0 * k0
+
+
+# electronic and anharmonic corrections
+
+
+def zharkov_pel(v, temp, v0, e0, g, n, z, t_ref=300.,
+                three_r=3. * constants.R):
+    """
+    calculate electronic contributions in pressure for the Zharkov equation
+
+    :param v: unit-cell volume in A^3
+    :param temp: temperature in K
+    :param v0: unit-cell volume in A^3 at 1 bar
+    :param e0: parameter in K-1 for the Zharkov equation
+    :param g: parameter for the Zharkov equation
+    :param n: number of atoms in a formula unit
+    :param z: number of formula unit in a unit cell
+    :param t_ref: reference temperature, 300 K
+    :param three_r: 3 times gas constant
+    :return: pressure in GPa, dP/dV, dP/dT
+    :note: the anharmonic term of Zharkov has the same form with
+        (a0, m) in place of (e0, g)
+    """
+    v_mol = vol_uc2mol(v, z)
+    c = three_r * n / 2. * e0 * np.power(v / v0, g) * g / v_mol * 1.e-9
+    dt2 = temp * temp - t_ref * t_ref
+    return c * dt2, c * (g - 1.) / v * dt2, 2. * c * temp
+
+
+zharkov_panh = zharkov_pel
+
+
+def tsuchiya_pel(v, temp, v0, a, b, c, d, n, z, t_ref=300.,
+                 three_r=3. * constants.R):
+    """
+    calculate electronic contributions in pressure for the Tsuchiya equation
+
+    :param v: unit-cell volume in A^3
+    :param temp: temperature in K
+    :param v0: unit-cell volume in A^3 at 1 bar
+    :param a: parameter for the Tsuchiya equation
+    :param b: parameter for the Tsuchiya equation
+    :param c: parameter for the Tsuchiya equation
+    :param d: parameter for the Tsuchiya equation
+    :param n: number of atoms in a formula unit
+    :param z: number of formula unit in a unit cell
+    :param t_ref: reference temperature, 300 K
+    :param three_r: 3 times gas constant
+    :return: pressure in GPa, dP/dV, dP/dT
+    """
+    def f(t):
+        return a + b * t + c * t * t + d * t * t * t
+    return f(temp) - f(t_ref), 0., b + 2. * c * temp + 3. * d * temp * temp
+
+
+func_st = {'bm3': bm3_p, 'vinet': vinet_p, 'kunc': kunc_p}
+func_th = {'constq': constq_pth, 'tange': tange_pth,
+           'speziale': speziale_pth, 'dorogokupets2007': dorogokupets2007_pth,
+           'dorogokupets2015': dorogokupets2015_pth, 'alphakt': alphakt_pth}
+func_el = {'zharkov': zharkov_pel, 'tsuchiya': tsuchiya_pel}
+func_anh = {'zharkov': zharkov_panh}
+
+groups = (('st', 'params_st', 'eqn_st', func_st),
+          ('th', 'params_th', 'eqn_th', func_th),
+          ('el', 'params_el', 'eqn_el', func_el),
+          ('anh', 'params_anh', 'eqn_anh', func_anh))
+
+
+def is_supported(scale):
+    """
+    check if a scale can be evaluated with the float kernels
+
+    :param scale: pytheos scale object
+    :return: True/False
+    :note: Mie-Gruneisen scales (MGEOS) are supported, Jamieson's hugoniot
+        scales (JHEOS) are not.
+    """
+    if getattr(scale, 'eqn_st', None) not in func_st:
+        return False
+    for __, params, eqn, funcs in groups[1:]:
+        if (getattr(scale, eqn) is None) or (getattr(scale, params) is None):
+            continue
+        if getattr(scale, eqn) not in funcs:
+            return False
+    return True
+
+
+def get_params(scale):
+    """
+    get nominal parameters of a scale
+
+    :param scale: pytheos scale object
+    :return: dict of parameter lists for 'st', 'th', 'el' and 'anh'.
+        None for a term the scale does not have.
+    """
+    out = {}
+    for key, params, eqn, __ in groups:
+        p = getattr(scale, params)
+        if (p is None) or (getattr(scale, eqn) is None):
+            out[key] = None
+        else:
+            out[key] = [getattr(value, 'nominal_value', value)
+                        for value in p.values()]
+    return out
+
+
+def cal_p_parts(scale, v, temp, params=None):
+    """
+    calculate the static, thermal, electronic and anharmonic pressures and
+    their partial derivatives on float arrays
+
+    :param scale: pytheos scale object (MGEOS)
+    :param v: unit-cell volume in A^3
+    :param temp: temperature in K
+    :param params: parameters from `get_params`, see `cal_p`
+    :return: OrderedDict of 'st', 'th', 'el' and 'anh' and (pressure in
+        GPa, dP/dV in GPa/A^3, dP/dT in GPa/K) for the terms the scale has.
+        All terms but 'st' are zero at t_ref.
+    """
+    if not is_supported(scale):
+        raise ValueError('{} is not supported by the float kernels'.format(
+            type(scale).__name__))
+    if params is None:
+        params = get_params(scale)
+    v = np.asarray(v)
+    temp = np.asarray(temp)
+    p, dpdv = func_st[scale.eqn_st](v, *params['st'])
+    parts = OrderedDict([('st', (p, dpdv, 0. * p))])
+    for key, __, eqn, funcs in groups[1:]:
+        if params[key] is None:
+            continue
+        parts[key] = funcs[getattr(scale, eqn)](
+            v, temp, *params[key], scale.n, scale.z, t_ref=scale.t_ref,
+            three_r=scale.three_r)
+    return parts
+
+
+def cal_p(scale, v, temp, params=None):
+    """
+    calculate total pressure and its partial derivatives on float arrays
+
+    :param scale: pytheos scale object (MGEOS)
+    :param v: unit-cell volume in A^3
+    :param temp: temperature in K
+    :param params: parameters from `get_params`, to replace the nominal
+        parameters of the scale.  Entries may be arrays that broadcast
+        with v and temp.
+    :return: pressure in GPa, dP/dV in GPa/A^3, dP/dT in GPa/K
+    """
+    p = dpdv = dpdt = 0.
+    for p_t, dpdv_t, dpdt_t in cal_p_parts(scale, v, temp,
+                                           params=params).values():
+        p = p + p_t
+        dpdv = dpdv + dpdv_t
+        dpdt = dpdt + dpdt_t
+    zero = np.zeros(np.broadcast(p, np.asarray(v), np.asarray(temp)).shape)
+    return p + zero, dpdv + zero, dpdt + zero
+
+
+def cal_p_any(scale, v, temp, dv=1.e-5, dt=1.e-2, deriv_t=True):
+    """
+    calculate pressure and partial derivatives for any pytheos scale
+
+    :param scale: pytheos scale object
+    :param v: unit-cell volume in A^3
+    :param temp: temperature in K
+    :param dv: relative volume step for numerical dP/dV
+    :param dt: temperature step in K for numerical dP/dT
+    :param deriv_t: calculate dP/dT, False saves two evaluations for
+        scales without analytic kernels
+    :return: pressure in GPa, dP/dV in GPa/A^3, dP/dT in GPa/K (None if
+        deriv_t is False and the scale has no analytic kernels)
+    :note: uses the analytic kernels when the scale is supported and
+        nominal pytheos evaluations with central differences otherwise
+        (Jamieson's hugoniot scales).
+    """
+    if is_supported(scale):
+        return cal_p(scale, v, temp)
+    v, temp = np.broadcast_arrays(np.asarray(v, dtype=float),
+                                  np.asarray(temp, dtype=float))
+    shape = v.shape
+    v = v.ravel()
+    temp = temp.ravel()
+    force_norm = scale.force_norm
+    scale.force_norm = True
+    try:
+        p = scale.cal_p(v, temp)
+        h = dv * v
+        dpdv = (scale.cal_p(v + h, temp) - scale.cal_p(v - h, temp)) / \
+            (2. * h)
+        if deriv_t:
+            dpdt = (scale.cal_p(v, temp + dt) -
+                    scale.cal_p(v, temp - dt)) / (2. * dt)
+            dpdt = dpdt.reshape(shape)
+        else:
+            dpdt = None
+    finally:
+        scale.force_norm = force_norm
+    return p.reshape(shape), dpdv.reshape(shape), dpdt
@@ -0,0 +1,101 @@
+"""
+Linear uncertainty propagation on float arrays.
+
+This gives the same numbers as `unp.nominal_values` and `unp.std_devs` of
+`scale.cal_p(unp.uarray(v, s_v), unp.uarray(temp, s_temp))` without
+building one `uncertainties` object per element.  dP/dV and dP/dT come
+from the analytic kernels, and sensitivities to the scale parameters that
+carry uncertainties are taken by complex step.
+"""
+import numpy as np
+from uncertainties import unumpy as unp
+from . import kernels
+from .cache import get_cache, make_key, scale_token
+
+# complex step for parameter sensitivities
+_H = 1.e-20
+
+
+def param_sensitivities(scale, v, temp):
+    """
+    calculate dP/dx times sigma(x) for every uncertain scale parameter
+
+    :param scale: pytheos scale object
+    :param v: unit-cell volume in A^3
+    :param temp: temperature in K
+    :return: dict of independent variable (`uncertainties` Variable) and
+        array
+    :note: parameters of pytheos scales are `uncertainties` variables.
+        The same value (e.g. v0) appears as separate variables in the
+        static and thermal parts, and they are kept separate here too.
+    """
+    nominal = kernels.get_params(scale)
+    terms = {}
+    for key, params, eqn, __ in kernels.groups:
+        if nominal[key] is None:
+            continue
+        for i, value in enumerate(getattr(scale, params).values()):
+            if not hasattr(value, 'error_components'):
+                continue
+            components = value.error_components()
+            if not any(components.values()):
+                continue
+            stepped = dict(nominal)
+            stepped[key] = list(nominal[key])
+            stepped[key][i] = nominal[key][i] + 1j * _H
+            dpdx = kernels.cal_p(scale, v, temp, params=stepped)[0].imag / _H
+            for variable, sigma_dx in components.items():
+                if variable in terms:
+                    terms[variable] = terms[variable] + dpdx * sigma_dx
+                else:
+                    terms[variable] = dpdx * sigma_dx
+    return terms
+
+
+def cal_p_linear(scale, v, temp, s_v=None, s_temp=None, params=True,
+                 cache=None):
+    """
+    calculate pressure and its linearly propagated uncertainty
+
+    :param scale: pytheos scale object
+    :param v: unit-cell volume in A^3
+    :param temp: temperature in K
+    :param s_v: uncertainty of volume, None for no uncertainty
+    :param s_temp: uncertainty of temperature, None for no uncertainty
+    :param params: include uncertainties of the scale parameters, as
+        pytheos does
+    :param cache: ResultCache, True for the shared cache in `pscale.cache`,
+        None for no caching
+    :return: nominal pressure in GPa, standard deviation in GPa
+    :note: falls back to `scale.cal_p` with `uncertainties` for scales the
+        float kernels do not cover (Jamieson's hugoniot scales).
+    """
+    v = np.asarray(v, dtype=float)
+    temp = np.asarray(temp, dtype=float)
+    cache = get_cache(cache)
+    if cache is not None:
+        shape = np.broadcast(v, temp).shape
+        key = make_key('cal_p_linear', scale_token(scale), str(params),
+                       *[np.broadcast_to(0. if x is None else x, shape)
+                         for x in (v, temp, s_v, s_temp)])
+        result = cache.get(key)
+        if result is None:
+            result = cal_p_linear(scale, v, temp, s_v=s_v, s_temp=s_temp,
+                                  params=params)
+            cache.put(key, result)
+        return result
+    if not kernels.is_supported(scale):
+        v_in = v if s_v is None else unp.uarray(v, s_v)
+        temp_in = temp if s_temp is None else unp.uarray(temp, s_temp)
+        p = scale.cal_p(v_in, temp_in)
+        return unp.nominal_values(p), unp.std_devs(p)
+    p, dpdv, dpdt = kernels.cal_p(scale, v, temp)
+    var = np.zeros(p.shape)
+    if s_v is not None:
+        var += np.square(dpdv * np.asarray(s_v, dtype=float))
+    if s_temp is not None:
+        var += np.square(dpdt * np.asarray(s_temp, dtype=float))
+    if params:
+        for term in param_sensitivities(scale, v, temp).values():
+            var += np.square(term)
+    return p, np.sqrt(var)
@@ -0,0 +1,244 @@
+"""
+Monte Carlo uncertainty propagation for pressure scales.
+
+Linear propagation misses the curvature of the thermal pressure at
+2000-3500 K.  Here (V, T) and, optionally, the uncertain scale parameters
+are sampled and pushed through the float kernels in `pscale.kernels`.
+
+Draws are made in chunks of at most `max_elements` values, each chunk is
+one broadcast (n_draws x n_points) evaluation, and chunks are spread
+over a process pool.  Only running moments and fixed-range histograms are
+kept, so memory does not grow with the number of draws.  Every chunk has
+its own child seed from `np.random.SeedSequence(seed)`, so results do not
+depend on the number of processes.
+"""
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+import os
+import numpy as np
+from . import kernels
+from .cache import get_cache, make_key, scale_token
+from .linear import cal_p_linear
+
+MCResult = namedtuple('MCResult', ['mean', 'std', 'q', 'percentiles',
+                                   'n_draws'])
+MCResult.__doc__ = """
+result of `cal_p_mc`
+
+:param mean: mean pressure in GPa, (n_scales x n_points)
+:param std: standard deviation in GPa, (n_scales x n_points)
+:param q: percentile levels
+:param percentiles: pressures at q, (n_q x n_scales x n_points)
+:param n_draws: number of draws per point
+"""
+
+
+def _draw_params(scale, rng, n):
+    """
+    draw scale parameters with their uncertainties
+
+    :param scale: pytheos scale object
+    :param rng: numpy random generator
+    :param n: number of draws
+    :return: parameters for `kernels.cal_p`, uncertain entries as (n x 1)
+    """
+    params = kernels.get_params(scale)
+    z = {}
+    for key, name, __, __ in kernels.groups:
+        if params[key] is None:
+            continue
+        params[key] = list(params[key])
+        for i, value in enumerate(getattr(scale, name).values()):
+            if not hasattr(value, 'error_components'):
+                continue
+            shift = 0.
+            for variable, sigma_dx in value.error_components().items():
+                if sigma_dx == 0.:
+                    continue
+                if variable not in z:
+                    z[variable] = rng.standard_normal((n, 1))
+                shift = shift + sigma_dx * z[variable]
+            params[key][i] = params[key][i] + shift
+    return params
+
+
+def _mc_chunk(task):
+    """
+    evaluate one chunk of draws for all scales
+
+    :param task: tuple of scales, v, temp, s_v, s_temp, number of draws,
+        seed, params flag and histogram (lower edge, bin width, n_bins)
+    :return: number of draws and a list of (mean, M2, histogram) per scale,
+        int32 histogram counts as a chunk has at most 2^31 draws
+    :note: internal function, runs in worker processes
+    """
+    scales, v, temp, s_v, s_temp, n, seed, params, lo, width, n_bins = task
+    rng = np.random.default_rng(seed)
+    vv = v if s_v is None else v + s_v * rng.standard_normal((n, v.size))
+    tt = temp if s_temp is None else \
+        temp + s_temp * rng.standard_normal((n, v.size))
+    out = []
+    for k, scale in enumerate(scales):
+        par = _draw_params(scale, rng, n) if params else None
+        p = np.broadcast_to(kernels.cal_p(scale, vv, tt, params=par)[0],
+                            (n, v.size))
+        mean = p.mean(axis=0)
+        m2 = np.square(p - mean).sum(axis=0)
+        hist = None
+        if n_bins:
+            idx = np.floor((p - lo[k]) / width[k]).astype(np.int64)
+            np.clip(idx, 0, n_bins - 1, out=idx)
+            idx += np.arange(v.size) * n_bins
+            hist = np.bincount(idx.ravel(), minlength=v.size * n_bins)
+            hist = hist.reshape(v.size, n_bins).astype(np.int32)
+        out.append((mean, m2, hist))
+    return n, out
+
+
+def _results(tasks, processes):
+    """
+    evaluate chunks in order, at most two per worker ahead of the caller
+
+    :return: generator of the `_mc_chunk` results
+    """
+    if processes > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            pending = deque()
+            for task in tasks:
+                pending.append(pool.submit(_mc_chunk, task))
+                if len(pending) >= 2 * processes:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+    else:
+        for task in tasks:
+            yield _mc_chunk(task)
+
+
+def _percentiles(hist, lo, width, q):
+    """
+    interpolate percentiles from per-point histograms
+
+    :param hist: counts, (n_points x n_bins)
+    :param lo: lower edge of the histogram, (n_points)
+    :param width: bin width, (n_points)
+    :param q: percentile levels in %
+    :return: pressures at q, (n_q x n_points)
+    """
+    cum = np.cumsum(hist, axis=1)
+    total = cum[:, -1:]
+    out = np.empty((len(q), hist.shape[0]))
+    for j, qq in enumerate(q):
+        target = qq / 100. * total
+        i = np.minimum((cum < target).sum(axis=1), hist.shape[1] - 1)
+        below = np.take_along_axis(cum, i[:, None], 1) - \
+            np.take_along_axis(hist, i[:, None], 1)
+        inbin = np.take_along_axis(hist, i[:, None], 1)
+        frac = np.where(inbin > 0, (target - below) / np.maximum(inbin, 1),
+                        0.5)
+        out[j] = lo + (i + frac[:, 0]) * width
+    return out
+
+
+def cal_p_mc(scales, v, temp, s_v=None, s_temp=None, n_draws=100000,
+             seed=0, params=True, q=(2.5, 50., 97.5), n_bins=256,
+             max_elements=2 ** 21, processes=None, cache=None):
+    """
+    calculate pressures and their uncertainties by Monte Carlo sampling
+
+    :param scales: list of pytheos scale objects
+    :param v: unit-cell volume in A^3
+    :param temp: temperature in K, scalar or array
+    :param s_v: uncertainty of volume, None for no uncertainty
+    :param s_temp: uncertainty of temperature, None for no uncertainty
+    :param n_draws: number of draws per point
+    :param seed: seed for the random number generator
+    :param params: also sample uncertain scale parameters, as the linear
+        mode includes them
+    :param q: percentile levels in %, None or () to skip percentiles
+    :param n_bins: histogram bins per point for percentiles.  The
+        histogram spans +/-10 linear standard deviations around the
+        nominal value and takes n_scales * n_points * n_bins * 4 bytes.
+    :param max_elements: maximum number of values per chunk
+    :param processes: number of worker processes, None for all cores,
+        1 to run in this process
+    :param cache: ResultCache, True for the shared cache in `pscale.cache`,
+        None for no caching
+    :return: MCResult
+    """
+    v = np.atleast_1d(np.asarray(v, dtype=float))
+    temp = np.broadcast_to(np.asarray(temp, dtype=float), v.shape).copy()
+    if s_v is not None:
+        s_v = np.broadcast_to(np.asarray(s_v, dtype=float), v.shape).copy()
+    if s_temp is not None:
+        s_temp = np.broadcast_to(np.asarray(s_temp, dtype=float),
+                                 v.shape).copy()
+    q = tuple(q or ())
+    n_bins = n_bins if q else 0
+    cache = get_cache(cache)
+    if cache is not None:
+        key = make_key('cal_p_mc', *[scale_token(s) for s in scales],
+                       str((n_draws, seed, params, q, n_bins, max_elements)),
+                       v, temp, s_v, s_temp)
+        result = cache.get(key)
+        if result is None:
+            result = cal_p_mc(scales, v, temp, s_v=s_v, s_temp=s_temp,
+                              n_draws=n_draws, seed=seed, params=params, q=q,
+                              n_bins=n_bins, max_elements=max_elements,
+                              processes=processes)
+            cache.put(key, (result.mean, result.std, result.percentiles))
+            return result
+        return MCResult(result[0], result[1], q, result[2], n_draws)
+    n_pts = v.size
+    block = max(1, min(n_pts, max_elements))
+    per_chunk = max(1, max_elements // block)
+    # histogram ranges from linear propagation
+    lo = np.zeros((len(scales), n_pts))
+    width = np.ones((len(scales), n_pts))
+    if n_bins:
+        for k, scale in enumerate(scales):
+            p_lin, s_lin = cal_p_linear(scale, v, temp, s_v=s_v,
+                                        s_temp=s_temp, params=params)
+            s_lin = np.maximum(s_lin, 1.e-6 * np.maximum(np.abs(p_lin), 1.))
+            lo[k] = p_lin - 10. * s_lin
+            width[k] = 20. * s_lin / n_bins
+    tasks = []
+    n_chunks = -(-n_draws // per_chunk)
+    seeds = np.random.SeedSequence(seed).spawn(
+        n_chunks * (-(-n_pts // block)))
+    for b, start in enumerate(range(0, n_pts, block)):
+        sl = slice(start, start + block)
+        for c in range(n_chunks):
+            n = min(per_chunk, n_draws - c * per_chunk)
+            tasks.append((sl, (
+                scales, v[sl], temp[sl],
+                None if s_v is None else s_v[sl],
+                None if s_temp is None else s_temp[sl],
+                n, seeds[b * n_chunks + c], params,
+                lo[:, sl], width[:, sl], n_bins)))
+    if processes is None:
+        processes = os.cpu_count() or 1
+    count = np.zeros(n_pts)
+    mean = np.zeros((len(scales), n_pts))
+    m2 = np.zeros((len(scales), n_pts))
+    hist = np.zeros((len(scales), n_pts, n_bins), dtype=np.int32) \
+        if n_bins else None
+    # chunks are folded in as they arrive, only a few are held at once
+    results = _results([t[1] for t in tasks], processes)
+    for (sl, __), (n, out) in zip(tasks, results):
+        n_a = count[sl]
+        for k, (mean_b, m2_b, hist_b) in enumerate(out):
+            # Chan et al. pairwise update of mean and M2
+            delta = mean_b - mean[k, sl]
+            mean[k, sl] += delta * n / (n_a + n)
+            m2[k, sl] += m2_b + np.square(delta) * n_a * n / (n_a + n)
+            if n_bins:
+                hist[k, sl] += hist_b
+        count[sl] += n
+    std = np.sqrt(m2 / np.maximum(count - 1, 1))
+    if n_bins:
+        perc = np.stack([_percentiles(hist[k], lo[k], width[k], q)
+                         for k in range(len(scales))], axis=1)
+    else:
+        perc = np.empty((0, len(scales), n_pts))
+    return MCResult(mean, std, q, perc, n_draws)
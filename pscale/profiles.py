@@ -0,0 +1,178 @@
+"""
+Adiabats and geotherms from the Mie-Gruneisen scales.
+
+For the quasi-harmonic thermal term dlnT/dlnV = -gamma along an
+adiabat, so T / theta(V) is constant, with theta the Debye (or Einstein)
+temperature of the thermal model.  The Gruneisen functions in
+`pscale.kernels` give theta(V) / theta0 in closed form, so an adiabat
+with potential temperature T_p (its temperature at P = 0) is
+
+    T(V) = T_p * theta(V) / theta(V_s),    P(V_s, T_p) = 0,
+
+and the volume at every pressure solves P(V, T(V)) = P with Newton
+iterations, using dP/dV + dP/dT dT/dV and dT/dV = -gamma T / V.  All
+potential temperatures and pressures are iterated together as one
+(n_adiabats x n_pressures) array.  A geotherm is the adiabat through an
+anchor point, e.g. 1873 K at 24 GPa at the 660 km discontinuity.
+
+This is an approximation for scales with electronic or anharmonic terms
+(e.g. the Dorogokupets scales): their entropy is left out of the
+adiabat, although their pressure is included in P(V, T).  The paths are
+the closed form above, not an integration of dT/dP.
+
+Profiles are keyed by the scale (all parameters, see
+`pscale.cache.scale_token`) and the inputs, and kept in the pscale
+result cache with `cache=True`, so figures can overlay the paths of all
+scales without computing them again.  `cal_p_along` gives the pressures
+other scales of the same material assign to the volumes and temperatures
+of a profile.
+"""
+from collections import namedtuple
+import numpy as np
+from . import kernels
+from .cache import get_cache, make_key, scale_token
+from .inverse import cal_v
+
+Profile = namedtuple('Profile', ['p', 'temp', 'v', 't_pot'])
+Profile.__doc__ = """
+result of `adiabat` and `geotherm`
+
+:param p: pressures in GPa, (n_p)
+:param temp: temperatures in K, (n_adiabats x n_p), nan where the
+    scale has no volume at P = 0 and T_p (e.g. Speziale2001 above
+    ~1900 K) or the iteration did not converge
+:param v: unit-cell volumes in A^3, (n_adiabats x n_p)
+:param t_pot: potential temperatures in K, (n_adiabats)
+"""
+
+# Gruneisen function and the number of parameters before theta0
+_grun_funcs = {'constq': (kernels.constq_grun, 3),
+               'tange': (kernels.tange_grun, 4),
+               'speziale': (kernels.speziale_grun, 4),
+               'dorogokupets2007': (kernels.altshuler_grun, 4),
+               'dorogokupets2015': (kernels.altshuler_grun, 4)}
+
+
+def _grun(scale, v):
+    """
+    :return: Gruneisen parameter and theta(V) / theta0
+    """
+    if not kernels.is_supported(scale) or scale.eqn_th not in _grun_funcs:
+        raise ValueError('{} has no Gruneisen parameter for adiabats'.format(
+            type(scale).__name__))
+    func, n = _grun_funcs[scale.eqn_th]
+    gamma, __, ratio = func(v, *kernels.get_params(scale)['th'][:n], 1.)
+    return gamma, ratio
+
+
+def _solve(scale, t_pot, p, p_tol, max_iter):
+    """
+    :return: temperature and volume on the adiabats of t_pot at p, both
+        broadcast, nan where the iteration did not converge
+    """
+    t_pot, p = np.broadcast_arrays(t_pot, p)
+    ratio_s = _grun(scale, cal_v(scale, 0., t_pot))[1]
+    # start from the isotherm at T_p, the adiabat is hotter at P > 0
+    x = cal_v(scale, p, t_pot)
+    done = np.zeros(x.shape, dtype=bool)
+    for __ in range(max_iter):
+        gamma, ratio = _grun(scale, x)
+        temp = t_pot * ratio / ratio_s
+        f, dpdv, dpdt = kernels.cal_p(scale, x, temp)
+        f = f - p
+        done = np.abs(f) <= p_tol
+        if np.all(done | ~np.isfinite(x)):
+            break
+        with np.errstate(divide='ignore', invalid='ignore'):
+            x = np.where(done, x, x - f / (dpdv - dpdt * gamma * temp / x))
+    temp = t_pot * _grun(scale, x)[1] / ratio_s
+    ok = done & np.isfinite(x)
+    return np.where(ok, temp, np.nan), np.where(ok, x, np.nan)
+
+
+def adiabat(scale, t_pot, p, p_tol=1.e-9, max_iter=50, cache=None):
+    """
+    calculate adiabats for many potential temperatures at once
+
+    :param scale: pytheos scale object (MGEOS with a Debye or Einstein
+        thermal model).  Electronic and anharmonic terms enter P but not
+        the adiabat, which is T / theta(V) = constant.
+    :param t_pot: potential temperatures in K, temperature at P = 0
+    :param p: pressures in GPa, 1D
+    :param p_tol: convergence tolerance in GPa
+    :param max_iter: maximum number of Newton iterations
+    :param cache: ResultCache, True for the shared cache in `pscale.cache`,
+        None for no caching
+    :return: Profile
+    """
+    t_pot = np.atleast_1d(np.asarray(t_pot, dtype=float)).ravel()
+    p = np.atleast_1d(np.asarray(p, dtype=float)).ravel()
+    cache = get_cache(cache)
+    if cache is not None:
+        key = make_key('adiabat', scale_token(scale), str((p_tol, max_iter)),
+                       t_pot, p)
+        result = cache.get(key)
+        if result is None:
+            result = adiabat(scale, t_pot, p, p_tol=p_tol, max_iter=max_iter)
+            cache.put(key, (result.temp, result.v))
+            return result
+        return Profile(p, result[0], result[1], t_pot)
+    temp, v = _solve(scale, t_pot[:, None], p[None, :], p_tol, max_iter)
+    return Profile(p, temp, v, t_pot)
+
+
+def geotherm(scale, p, t_anchor=1873., p_anchor=24., tol=1.e-6,
+             max_iter=20, cache=None):
+    """
+    calculate the adiabats through anchor points
+
+    :param scale: pytheos scale object, see `adiabat` for the
+        quasi-harmonic approximation
+    :param p: pressures in GPa, 1D
+    :param t_anchor: temperatures in K at the anchors, scalar or array
+    :param p_anchor: pressures in GPa of the anchors, scalar or array
+    :param tol: relative tolerance of the anchor temperature
+    :param max_iter: maximum number of iterations
+    :param cache: ResultCache, True for the shared cache in `pscale.cache`,
+        None for no caching
+    :return: Profile, one adiabat per anchor
+    """
+    t_anchor, p_anchor = [np.atleast_1d(x).ravel() for x in
+                          np.broadcast_arrays(np.asarray(t_anchor, float),
+                                              np.asarray(p_anchor, float))]
+    p = np.atleast_1d(np.asarray(p, dtype=float)).ravel()
+    cache = get_cache(cache)
+    if cache is not None:
+        key = make_key('geotherm', scale_token(scale), str((tol, max_iter)),
+                       p, t_anchor, p_anchor)
+        result = cache.get(key)
+        if result is None:
+            result = geotherm(scale, p, t_anchor, p_anchor, tol=tol,
+                              max_iter=max_iter)
+            cache.put(key, (result.temp, result.v, result.t_pot))
+            return result
+        return Profile(p, *result)
+    # T at the anchor is close to proportional to T_p
+    t_pot = np.array(t_anchor)
+    for __ in range(max_iter):
+        temp = _solve(scale, t_pot, p_anchor, 1.e-9, 50)[0]
+        t_pot = t_pot * t_anchor / temp
+        if np.all(np.abs(temp / t_anchor - 1.) <= tol):
+            break
+    return adiabat(scale, t_pot, p)
+
+
+def cal_p_along(profile, scales):
+    """
+    calculate pressures of other scales along a profile
+
+    :param profile: Profile from a scale of the same material
+    :param scales: list of pytheos scale objects
+    :return: pressures in GPa, (n_scales x n_adiabats x n_p)
+    """
+    ok = np.isfinite(profile.v)
+    out = np.full((len(scales),) + profile.v.shape, np.nan)
+    for k, scale in enumerate(scales):
+        out[k][ok] = kernels.cal_p_any(scale, profile.v[ok],
+                                       profile.temp[ok], deriv_t=False)[0]
+    return out
@@ -0,0 +1,103 @@
+"""
+Pressure scales by short ID.
+
+IDs are the labels of the figures: the material and the initial of the
+author with the year, e.g. 'MgO-S01' for periclase.Speziale2001,
+'Au-D07' for gold.Dorogokupets2007 and 'Pt-H89' for platinum.Holmes1989.
+Tsuchiya2003 is 'Au-T04' as in Mantle_Boundaries.  The long form
+'material-class name' used by `pscale.calibrate`, e.g.
+'Au-Dorogokupets2007', is accepted as well.
+
+The table of IDs is static, so listing and checking IDs imports nothing.
+`import pytheos` takes longer than the rest of pscale together (it loads
+lmfit and matplotlib), so pytheos is imported on the first lookup only,
+and one instance per scale is kept for the life of the process.  A
+short-lived worker pays for the import once and never constructs a scale
+twice.  The instances are shared: do not change their parameters.
+"""
+from collections import OrderedDict
+import importlib
+
+# pytheos.scales modules of the materials
+modules = OrderedDict([('Au', 'gold'), ('Pt', 'platinum'),
+                       ('MgO', 'periclase'), ('Ne', 'neon'),
+                       ('NaCl', 'sodium_chloride'),
+                       ('NaClB2', 'sodium_chloride_b2')])
+
+# short code and class name of every scale of a material
+codes = {
+    'Au': [('J82L', 'Jamieson1982L'), ('J82H', 'Jamieson1982H'),
+           ('H84', 'Heinz1984'), ('T04', 'Tsuchiya2003'),
+           ('F07v', 'Fei2007vinet'), ('F07', 'Fei2007bm3'),
+           ('F04', 'Fei2004'), ('S02', 'Shim2002'), ('D12', 'Dorfman2012'),
+           ('Y17', 'Ye2017'), ('Y09', 'Yokoo2009'),
+           ('D07', 'Dorogokupets2007'), ('D15', 'Dorogokupets2015')],
+    'Pt': [('F04', 'Fei2004'), ('F07v', 'Fei2007vinet'),
+           ('F07', 'Fei2007bm3'), ('D12', 'Dorfman2012'), ('Y17', 'Ye2017'),
+           ('Y09', 'Yokoo2009'), ('J82', 'Jamieson1982'),
+           ('H89', 'Holmes1989'), ('D07', 'Dorogokupets2007'),
+           ('D15', 'Dorogokupets2015')],
+    'MgO': [('J82', 'Jamieson1982'), ('Z00', 'Zha2000'), ('Y17', 'Ye2017'),
+            ('S01', 'Speziale2001'), ('T09', 'Tange2009'),
+            ('D07', 'Dorogokupets2007'), ('D15', 'Dorogokupets2015')],
+    'Ne': [('F07v', 'Fei2007vinet'), ('F07', 'Fei2007bm3')],
+    'NaCl': [('D07', 'Dorogokupets2007')],
+    'NaClB2': [('D07', 'Dorogokupets2007'), ('F07v', 'Fei2007vinet'),
+               ('F07', 'Fei2007bm3')]}
+
+_instances = {}
+
+
+def _resolve(scale_id):
+    """
+    :return: material and pytheos class name of a short or long ID
+    """
+    material, __, name = scale_id.partition('-')
+    for code, class_name in codes.get(material, ()):
+        if name in (code, class_name):
+            return material, class_name
+    raise KeyError('unknown pressure scale {!r}'.format(scale_id))
+
+
+def scale_ids(material=None):
+    """
+    list the short IDs of the scales
+
+    :param material: 'Au', 'Pt', 'MgO', ..., None for all materials
+    :return: list of IDs, e.g. ['MgO-J82', 'MgO-Z00', ...]
+    """
+    materials = modules if material is None else [material]
+    return ['{}-{}'.format(m, code) for m in materials
+            for code, __ in codes[m]]
+
+
+def has_scale(scale_id):
+    """
+    check a short or long ID without importing pytheos
+
+    :param scale_id: e.g. 'Au-D07' or 'Au-Dorogokupets2007'
+    :return: True if the scale exists
+    """
+    try:
+        _resolve(scale_id)
+    except KeyError:
+        return False
+    return True
+
+
+def get_scale(scale_id):
+    """
+    get the shared instance of a scale, importing pytheos on first use
+
+    :param scale_id: e.g. 'MgO-S01' or 'MgO-Speziale2001'
+    :return: pytheos scale object, the same object for every call with
+        the same scale
+    """
+    key = _resolve(scale_id)
+    scale = _instances.get(key)
+    if scale is None:
+        material, class_name = key
+        module = importlib.import_module('pytheos.scales.' +
+                                         modules[material])
+        scale = _instances[key] = getattr(module, class_name)()
+    return scale
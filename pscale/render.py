@@ -0,0 +1,149 @@
+"""
+Reusable 2 x 2 template for the Delta P figures.
+
+`errorbar` makes a container of one line per marker set plus one
+collection per error direction, and the notebooks call `tight_layout`
+once per panel.  Here the axes, labels, ticks, legends and layout are
+built once, and every marker set of a panel is one `Line2D` for the
+symbols and one `LineCollection` holding its x and y error bars, which
+`draw` refills in place.  The layout and the bounding box used for
+saving are computed once per figure, so drawing a new dataset and saving
+it again costs one render.
+
+With `rasterized=True` the symbols and error bars are embedded in the
+PDF as an image at `dpi` while axes and text stay vector, which keeps
+files small for large datasets.
+"""
+import numpy as np
+
+
+class DPTemplate(object):
+    """
+    2 x 2 figure of Delta P against P(MgO)
+    """
+
+    def __init__(self, markers=('Au', 'Pt'), colors=('b', 'r'), xerr=False,
+                 xlim=(0., 160.), ylim=(-8., 4.), thin_yticks=False,
+                 rasterized=False, figsize=(8, 6)):
+        """
+        :param markers: marker names for the legend
+        :param colors: colors of the markers
+        :param xerr: show error bars of P(MgO)
+        :param xlim: pressure range in GPa
+        :param ylim: Delta P range in GPa
+        :param thin_yticks: keep every other y tick
+        :param rasterized: embed symbols and error bars as an image
+        :param figsize: figure size in inches
+        """
+        import matplotlib.pyplot as plt
+        from matplotlib.collections import LineCollection
+        self.xerr = xerr
+        self.rasterized = rasterized
+        self.figure, axarr = plt.subplots(2, 2, figsize=figsize)
+        self.axes = axarr.ravel()
+        self._bbox = None
+        self.symbols = []
+        self.bars = []
+        for i, ax in enumerate(self.axes):
+            ax.axhline(y=0, c='k', ls=':')
+            symbols = []
+            bars = []
+            for marker, color in zip(markers, colors):
+                bar = LineCollection([], colors=color, linewidths=0.4,
+                                     rasterized=rasterized)
+                ax.add_collection(bar, autolim=False)
+                symbols += ax.plot([], [], 'o', c=color, mec='w', mew=0.7,
+                                   ms=8, label=marker,
+                                   rasterized=rasterized)
+                bars.append(bar)
+            self.symbols.append(symbols)
+            self.bars.append(bars)
+            ax.set_xlabel('P(MgO) (GPa)')
+            ax.set_ylabel(r'$\mathdefault{{\Delta} P}$ (GPa)')
+            leg = ax.legend(loc=3, numpoints=1, fontsize=10)
+            leg.get_frame().set_linewidth(0.5)
+            ax.set_ylim(*ylim)
+            ax.set_xlim(*xlim)
+            ax.set_xticks(ax.get_xticks()[::2])
+            if thin_yticks:
+                ax.set_yticks(ax.get_yticks()[::2])
+            ax.text(0.08, 0.83, 'abcd'[i], horizontalalignment='center',
+                    verticalalignment='bottom', transform=ax.transAxes,
+                    fontsize=24)
+        # nothing that changes with the data affects the layout
+        self.figure.tight_layout(pad=0.4)
+
+    def draw(self, panels):
+        """
+        replace the data of the figure
+
+        :param panels: for every panel, a list of (P(MgO), Delta P,
+            sigma P(MgO), sigma Delta P) per marker
+        :return: the figure
+        """
+        for symbols, bars, panel in zip(self.symbols, self.bars, panels):
+            for symbol, bar, (p, dp, s_p, s_dp) in zip(symbols, bars, panel):
+                p, dp, s_p, s_dp = np.broadcast_arrays(
+                    *[np.asarray(a, dtype=float) for a in (p, dp, s_p, s_dp)])
+                ok = np.isfinite(p) & np.isfinite(dp)
+                p, dp, s_p, s_dp = p[ok], dp[ok], s_p[ok], s_dp[ok]
+                symbol.set_data(p, dp)
+                # segments (n x 2 points x (x, y)), y bars then x bars
+                y_bars = np.stack([np.stack([p, dp - s_dp], -1),
+                                   np.stack([p, dp + s_dp], -1)], 1)
+                if self.xerr:
+                    x_bars = np.stack([np.stack([p - s_p, dp], -1),
+                                       np.stack([p + s_p, dp], -1)], 1)
+                    y_bars = np.concatenate([y_bars, x_bars])
+                bar.set_segments(y_bars[np.isfinite(y_bars).all(axis=(1, 2))])
+        return self.figure
+
+    def save(self, filename, dpi=300, pad_inches=0.1):
+        """
+        save the figure with a tight bounding box
+
+        :param filename: figure file
+        :param dpi: resolution of rasterized layers and raster formats
+        :param pad_inches: padding around the tight bounding box
+        """
+        if self._bbox is None:
+            renderer = self.figure.canvas.get_renderer()
+            self._bbox = self.figure.get_tightbbox(renderer).padded(
+                pad_inches)
+        self.figure.savefig(filename, dpi=dpi, bbox_inches=self._bbox)
+
+    def close(self):
+        """
+        close the figure
+        """
+        import matplotlib.pyplot as plt
+        plt.close(self.figure)
+
+
+def plot_dp(results, filename=None, markers=('Au', 'Pt'), xerr=False,
+            xlim=(0., 160.), ylim=(-8., 4.), thin_yticks=False,
+            rasterized=False):
+    """
+    plot Delta P against P(MgO), one panel per scale pair
+
+    :param results: `pscale.cal_dp` results, one per marker, with four
+        scale pairs each
+    :param filename: figure file, None to not save
+    :param markers: marker names for the legend
+    :param xerr: show error bars of P(MgO).  The Delta P error bars are
+        then those of P(marker), as in the 300 K figure, otherwise those
+        of Delta P.
+    :param xlim: pressure range in GPa
+    :param ylim: Delta P range in GPa
+    :param thin_yticks: keep every other y tick
+    :param rasterized: embed symbols and error bars as an image
+    :return: DPTemplate with the data drawn
+    """
+    template = DPTemplate(markers=markers, xerr=xerr, xlim=xlim, ylim=ylim,
+                          thin_yticks=thin_yticks, rasterized=rasterized)
+    template.draw([[(r.p_mgo[i], r.dp[i], r.s_p_mgo[i],
+                     r.s_p[i] if xerr else r.s_dp[i]) for r in results]
+                   for i in range(len(results[0].dp))])
+    if filename is not None:
+        template.save(filename)
+    return template
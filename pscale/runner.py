@@ -0,0 +1,170 @@
+"""
+Headless batch runner for the analysis scripts.
+
+The .py files are notebook exports and call `get_ipython()` to set up
+the inline backend, so they only run inside IPython.  Here every script
+runs in its own worker process with the Agg backend and a stand-in for
+`get_ipython`, from the directory of the script so that ./data and the
+figure files resolve as in the notebooks.  Independent scripts run at
+the same time, so regenerating all figures takes about as long as the
+slowest one.  With --trace every script is instrumented with
+`pscale.trace` and leaves a Chrome trace and a stage report in DIR.
+
+    python -m pscale.runner [-j PROCESSES] [--path DIR] [--trace DIR]
+        [SCRIPT ...]
+"""
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import argparse
+import contextlib
+import io
+import os
+import runpy
+import time
+import traceback
+
+# analyses of the tutorial, each writes one figure
+analyses = ('DataDistribution', 'Comparison_300K', 'Comparison_High_T',
+            'Mantle_Boundaries')
+
+
+class _IPython(object):
+    """
+    stand-in for `get_ipython()` in notebook exports, magics do nothing
+    """
+
+    def run_line_magic(self, *args, **kwargs):
+        pass
+
+    def run_cell_magic(self, *args, **kwargs):
+        pass
+
+
+def run_script(filename, trace=None, trace_memory=False):
+    """
+    run one notebook export headless
+
+    :param filename: .py file
+    :param trace: directory for the trace file and stage report of
+        `pscale.trace`, None for no tracing
+    :param trace_memory: also trace allocated bytes
+    :return: wall time in s, printed output, traceback or None
+    :note: runs in the directory of the script
+    """
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    from . import trace as tracing
+    ipython = _IPython()
+    cwd = os.getcwd()
+    out = io.StringIO()
+    error = None
+    name = os.path.splitext(os.path.basename(filename))[0]
+    if trace is not None:
+        trace = os.path.abspath(trace)
+        tracing.enable(memory=trace_memory)
+    t0 = time.time()
+    try:
+        os.chdir(os.path.dirname(os.path.abspath(filename)))
+        with contextlib.redirect_stdout(out), tracing.stage('script',
+                                                            script=name):
+            runpy.run_path(os.path.basename(filename), run_name='__main__',
+                           init_globals={'get_ipython': lambda: ipython})
+    except BaseException:
+        error = traceback.format_exc()
+    finally:
+        plt.close('all')
+        os.chdir(cwd)
+    wall = time.time() - t0
+    if trace is not None:
+        os.makedirs(trace, exist_ok=True)
+        tracer = tracing.finish(os.path.join(trace, name + '.trace.json'),
+                                report=False)
+        with open(os.path.join(trace, name + '.txt'), 'w') as f:
+            f.write(tracer.report() + '\n')
+    return wall, out.getvalue(), error
+
+
+def run_all(scripts, processes=None, report=None, trace=None,
+            trace_memory=False):
+    """
+    run notebook exports concurrently
+
+    :param scripts: list of .py files
+    :param processes: number of worker processes, None for one per script
+        up to the number of cores, 1 to run in this process
+    :param report: function called with (script, wall time, output, error)
+        as every script finishes
+    :param trace: directory for trace files, see `run_script`
+    :param trace_memory: also trace allocated bytes
+    :return: dict of script and (wall time, output, error)
+    """
+    if processes is None:
+        processes = min(len(scripts), os.cpu_count() or 1)
+    results = {}
+    if processes > 1 and len(scripts) > 1:
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            futures = {pool.submit(run_script, s, trace, trace_memory): s
+                       for s in scripts}
+            for future in as_completed(futures):
+                results[futures[future]] = future.result()
+                if report is not None:
+                    report(futures[future], *results[futures[future]])
+    else:
+        for s in scripts:
+            results[s] = run_script(s, trace, trace_memory)
+            if report is not None:
+                report(s, *results[s])
+    return results
+
+
+def main(argv=None):
+    """
+    command line entry point
+
+    :param argv: command line arguments, None for sys.argv
+    :return: exit status, 1 if any script failed
+    """
+    parser = argparse.ArgumentParser(
+        prog='python -m pscale.runner',
+        description='Run the analysis notebook exports headless.')
+    parser.add_argument('scripts', nargs='*', metavar='SCRIPT',
+                        help='analyses to run, default: ' +
+                        ' '.join(analyses))
+    parser.add_argument('--path', default='.',
+                        help='directory with the scripts (default: .)')
+    parser.add_argument('-j', '--processes', type=int, default=None,
+                        help='number of worker processes')
+    parser.add_argument('-v', '--verbose', action='store_true',
+                        help='show the printed output of the scripts')
+    parser.add_argument('--trace', default=None, metavar='DIR',
+                        help='write a Chrome trace and a stage report of '
+                        'every script to DIR')
+    parser.add_argument('--trace-memory', action='store_true',
+                        help='with --trace, also record allocated bytes')
+    args = parser.parse_args(argv)
+    os.environ['MPLBACKEND'] = 'Agg'
+    scripts = [os.path.join(args.path, s if s.endswith('.py') else s + '.py')
+               for s in (args.scripts or analyses)]
+
+    def report(script, wall, out, error):
+        status = 'ok' if error is None else 'FAILED'
+        print('{:<24s} {:8.2f} s  {}'.format(
+            os.path.basename(script), wall, status), flush=True)
+        if args.verbose and out:
+            print(out, flush=True)
+        if error is not None:
+            print(error, flush=True)
+        if args.trace is not None:
+            name = os.path.splitext(os.path.basename(script))[0]
+            with open(os.path.join(args.trace, name + '.txt')) as f:
+                print(f.read(), flush=True)
+
+    t0 = time.time()
+    results = run_all(scripts, processes=args.processes, report=report,
+                      trace=args.trace, trace_memory=args.trace_memory)
+    print('{:<24s} {:8.2f} s'.format('total (wall)', time.time() - t0))
+    return int(any(r[2] is not None for r in results.values()))
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
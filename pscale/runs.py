@@ -0,0 +1,189 @@
+"""
+Parallel evaluation of many marker-MgO run files.
+
+Run files are CSV files shaped like Pt_MgO_HiT.csv: V and sigma V of a
+marker (Au or Pt) and of MgO, and optionally T and sigma T.  Their
+columns are loaded through `pscale.store.DataStore` and copied once into
+one shared-memory block of six rows (V, sigma V, V(MgO), sigma V(MgO),
+T, sigma T) over all points of all runs.  Worker processes attach to the
+block and to a shared output block when they start, so a task is only a
+run, a scale pair and a row range, and no array is pickled per task.
+Workers write P(MgO), Delta P and their uncertainties (`pscale.cal_dp`,
+with the T error shared by both pressures) straight into the output
+block, and the result is returned as one table indexed by run and
+point.
+
+Tasks never cross run boundaries and are at most `chunk` points long, so
+the load is spread evenly over the workers whether there are a few large
+runs or hundreds of small ones.
+"""
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import fnmatch
+import os
+import numpy as np
+from .deltap import cal_dp
+from .store import DataStore, find_pairs
+
+_QUANTITIES = ('P(MgO)', 'dP', 'sP(MgO)', 'sdP', 'sP(marker)')
+_worker = {}
+
+
+def discover(path='./data', pattern='*.csv', markers=('Au', 'Pt')):
+    """
+    find run files of marker-MgO pairs
+
+    :param path: directory with the CSV files
+    :param pattern: file name pattern
+    :param markers: marker phases to accept
+    :return: sorted dataset names (file names without extension)
+    """
+    names = []
+    for f in sorted(os.listdir(path)):
+        if not (f.endswith('.csv') and fnmatch.fnmatch(f, pattern)):
+            continue
+        with open(os.path.join(path, f)) as csv:
+            pairs = find_pairs([c.strip() for c in csv.readline().split(',')])
+        if 'MgO' in pairs and any(m in pairs for m in markers):
+            names.append(os.path.splitext(f)[0])
+    return names
+
+
+def _label(scales, i):
+    """
+    :return: label of the i-th scale pair, 'Speziale2001/Fei2007bm3'
+    """
+    markers = OrderedDict((type(objs[i]).__name__, None)
+                          for material, objs in scales.items()
+                          if material != 'MgO')
+    return '{}/{}'.format(type(scales['MgO'][i]).__name__,
+                          '|'.join(markers))
+
+
+def _attach(name):
+    """
+    attach to a shared memory block created by `process_runs`
+    """
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # before Python 3.13 the block is registered again with the
+        # resource tracker that workers share with the parent, which is a
+        # no-op; only the parent unlinks it
+        return shared_memory.SharedMemory(name=name)
+
+
+def _init(in_name, out_name, n, n_pairs, scales):
+    shm_in, shm_out = _attach(in_name), _attach(out_name)
+    _worker.update(
+        shm=(shm_in, shm_out), scales=scales,
+        data=np.ndarray((6, n), dtype=float, buffer=shm_in.buf),
+        out=np.ndarray((n_pairs, len(_QUANTITIES), n), dtype=float,
+                       buffer=shm_out.buf))
+
+
+def _task(task):
+    """
+    calculate P(MgO) and Delta P of one row range with one scale pair
+    """
+    marker, i, start, stop = task
+    data = _worker['data'][:, start:stop]
+    # rows with a nan input stay nan in the output block
+    ok = ~np.isnan(data).any(axis=0)
+    if not ok.any():
+        return
+    v, s_v, v_mgo, s_v_mgo, temp, s_temp = data[:, ok]
+    scales = _worker['scales']
+    # sigma of Delta P with the T error and parameters P(MgO) shares
+    r = cal_dp([scales[marker][i]], [scales['MgO'][i]], v, v_mgo, temp,
+               s_v=s_v, s_v_mgo=s_v_mgo, s_temp=s_temp)
+    out = _worker['out'][i, :, start:stop]
+    out[:, ok] = r.p_mgo[0], r.dp[0], r.s_p_mgo[0], r.s_dp[0], r.s_p[0]
+
+
+def process_runs(names, scales, path='./data', processes=None,
+                 chunk=2 ** 14):
+    """
+    calculate P(MgO) and Delta P of many runs in parallel
+
+    :param names: dataset names, see `discover`
+    :param scales: dict of material and list of pytheos scale objects of
+        the same length, e.g. {'MgO': std_MgO, 'Au': std_Au,
+        'Pt': std_Pt}.  The i-th marker scale is paired with the i-th MgO
+        scale, as in the panels of the comparison figures.
+    :param path: directory with the CSV files
+    :param processes: number of worker processes, None for all cores,
+        1 to run in this process
+    :param chunk: maximum number of points per task
+    :return: pandas DataFrame indexed by (run, point) with the marker,
+        T and, for every scale pair 'MgO scale/marker scale', P(MgO),
+        Delta P, their standard deviations 'sP(MgO)' and 'sdP', and the
+        standard deviation of P(marker) 'sP(marker)' (linear
+        propagation, see `pscale.cal_dp`)
+    """
+    import pandas as pd
+    store = DataStore(path)
+    runs = OrderedDict()
+    for name in names:
+        runs[name] = store[name].marker_columns()
+    sizes = [len(columns[1]) for columns in runs.values()]
+    offsets = np.concatenate([[0], np.cumsum(sizes)]).astype(int)
+    n = int(offsets[-1])
+    n_pairs = len(scales['MgO'])
+    data = out = None
+    shm_in = shared_memory.SharedMemory(create=True,
+                                        size=max(1, 6 * n * 8))
+    shm_out = shared_memory.SharedMemory(
+        create=True, size=max(1, n_pairs * len(_QUANTITIES) * n * 8))
+    try:
+        data = np.ndarray((6, n), dtype=float, buffer=shm_in.buf)
+        out = np.ndarray((n_pairs, len(_QUANTITIES), n), dtype=float,
+                         buffer=shm_out.buf)
+        out[...] = np.nan
+        tasks = []
+        for j, (marker, *columns) in enumerate(runs.values()):
+            sl = slice(offsets[j], offsets[j + 1])
+            for row, column in enumerate(columns):
+                data[row, sl] = 0. if column is None else column
+            for i in range(n_pairs):
+                for start in range(offsets[j], offsets[j + 1], chunk):
+                    tasks.append((marker, i, int(start),
+                                  int(min(start + chunk, offsets[j + 1]))))
+        initargs = (shm_in.name, shm_out.name, n, n_pairs, scales)
+        if processes is None:
+            processes = os.cpu_count() or 1
+        if processes > 1 and len(tasks) > 1:
+            with ProcessPoolExecutor(max_workers=processes,
+                                     initializer=_init,
+                                     initargs=initargs) as pool:
+                for __ in pool.map(_task, tasks, chunksize=max(
+                        1, len(tasks) // (4 * processes))):
+                    pass
+        else:
+            _init(*initargs)
+            try:
+                for task in tasks:
+                    _task(task)
+            finally:
+                _worker.clear()
+        table = OrderedDict()
+        table[('', 'marker')] = np.repeat(
+            [columns[0] for columns in runs.values()], sizes)
+        table[('', 'T')] = data[4].copy()
+        for i in range(n_pairs):
+            label = _label(scales, i)
+            for q, quantity in enumerate(_QUANTITIES):
+                table[(label, quantity)] = out[i, q].copy()
+    finally:
+        # views must be released before the blocks are closed
+        data = out = None
+        shm_in.close()
+        shm_in.unlink()
+        shm_out.close()
+        shm_out.unlink()
+    index = pd.MultiIndex.from_arrays(
+        [np.repeat(list(runs), sizes),
+         np.concatenate([np.arange(s) for s in sizes] or [[]]).astype(int)],
+        names=['run', 'point'])
+    return pd.DataFrame(table, index=index)
@@ -0,0 +1,284 @@
+"""
+Columnar, memory-mapped store for the (V, T) datasets.
+
+Every CSV file in the data directory is converted once into a binary
+file that holds its columns as contiguous little-endian float64 blocks,
+next to a JSON schema with the column names, the value/sigma column pairs
+of every phase (V(Pt) and sV(Pt), T and sT, ...) and the size and
+modification time of the source.  Opening a dataset maps the file, and
+columns come back as zero-copy float64 views, so nothing is parsed or
+copied at startup.  A dataset is converted again when its CSV changes.
+
+The validity of every column (not nan) is kept as a bitmap, one bit per
+row, in a third file, and the schema has the number of valid rows of
+every column.  Columns without any valid row, e.g. V(Ne) and sV(Ne) of
+the 300 K files, are not written to the binary file at all; they read
+as a nan view with zero strides and `Dataset.valid` tells which rows of
+the other columns can be computed on.
+"""
+from collections import OrderedDict
+import json
+import os
+import numpy as np
+
+_DTYPE = '<f8'
+
+
+def _phase(column):
+    """
+    :return: phase name of a value column, 'Pt' for 'V(Pt)'
+    """
+    if column.startswith('V(') and column.endswith(')'):
+        return column[2:-1]
+    return column
+
+
+def find_pairs(columns):
+    """
+    find value/sigma column pairs
+
+    :param columns: list of column names
+    :return: OrderedDict of phase and (value column, sigma column), sigma
+        column None if the file has none
+    """
+    pairs = OrderedDict()
+    for column in columns:
+        if column.startswith('s') and column[1:] in columns:
+            continue
+        sigma = 's' + column
+        pairs[_phase(column)] = (column, sigma if sigma in columns else None)
+    return pairs
+
+
+def _source(filename):
+    st = os.stat(filename)
+    return {'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+
+
+def convert_csv(csv_file, path):
+    """
+    convert a CSV file of floats to the columnar layout
+
+    :param csv_file: CSV file with a header line
+    :param path: directory of the store
+    :return: schema dict
+    :note: empty fields become nan, ValueError is raised for text columns
+    """
+    name = os.path.splitext(os.path.basename(csv_file))[0]
+    with open(csv_file) as f:
+        columns = [c.strip() for c in f.readline().strip().split(',')]
+        first = f.readline().strip().split(',')
+    data = np.genfromtxt(csv_file, delimiter=',', skip_header=1, dtype=float,
+                         ndmin=2)
+    if data.size == 0:
+        data = np.empty((0, len(columns)))
+    for field, value in zip(first, data[0] if data.shape[0] else ()):
+        if np.isnan(value) and field.strip() not in ('', 'nan', 'NaN'):
+            raise ValueError('{} has non-numeric columns'.format(csv_file))
+    valid = ~np.isnan(data.T)
+    n_valid = valid.sum(axis=1)
+    schema = {'name': name, 'columns': columns, 'n_rows': data.shape[0],
+              'dtype': _DTYPE, 'pairs': find_pairs(columns),
+              'n_valid': [int(n) for n in n_valid],
+              'source': _source(csv_file)}
+    os.makedirs(path, exist_ok=True)
+    filename = os.path.join(path, name)
+    tmp = '.{}.tmp'.format(os.getpid())
+    np.ascontiguousarray(data.T[n_valid > 0], dtype=_DTYPE).tofile(
+        filename + '.f8' + tmp)
+    np.packbits(valid, axis=1).tofile(filename + '.valid' + tmp)
+    with open(filename + '.json' + tmp, 'w') as f:
+        json.dump(schema, f, indent=1)
+    # the schema is replaced last, it marks the binary files as complete
+    for ext in ('.f8', '.valid', '.json'):
+        os.replace(filename + ext + tmp, filename + ext)
+    return schema
+
+
+class Dataset(object):
+    """
+    one dataset of the store, columns are mapped on first use
+    """
+
+    def __init__(self, filename, schema):
+        """
+        :param filename: binary file written by `convert_csv`
+        :param schema: schema dict written by `convert_csv`
+        """
+        self.filename = filename
+        self.name = schema['name']
+        self.columns = list(schema['columns'])
+        self.pairs = OrderedDict((k, tuple(v))
+                                 for k, v in schema['pairs'].items())
+        self.n_rows = schema['n_rows']
+        self.n_valid = OrderedDict(zip(self.columns, schema['n_valid']))
+        # row of every stored (non-empty) column in the binary file
+        self._rows = OrderedDict((c, i) for i, c in enumerate(
+            c for c in self.columns if self.n_valid[c]))
+        self._block = None
+        self._bits = None
+
+    @property
+    def block(self):
+        """
+        :return: stored columns, read-only (n_stored x n_rows) float64
+            view, empty columns left out
+        """
+        if self._block is None:
+            shape = (len(self._rows), self.n_rows)
+            if self.n_rows == 0 or not self._rows:
+                self._block = np.empty(shape)
+            else:
+                self._block = np.memmap(self.filename, dtype=_DTYPE,
+                                        mode='r', shape=shape)
+        return self._block
+
+    def __len__(self):
+        return self.n_rows
+
+    def __getitem__(self, column):
+        """
+        :param column: column name, e.g. 'V(Pt)'
+        :return: float64 view of the column, a read-only nan view with
+            zero strides for an empty column
+        """
+        if not self.n_valid[column]:
+            return np.broadcast_to(np.nan, (self.n_rows,))
+        return self.block[self._rows[column]].view(np.ndarray)
+
+    def empty(self):
+        """
+        :return: names of the columns without any valid row
+        """
+        return [c for c in self.columns if not self.n_valid[c]]
+
+    def valid(self, *columns):
+        """
+        :param columns: column names or phase names, e.g. 'V(Pt)' or 'Pt'
+            for the value and sigma columns of a phase
+        :return: boolean mask of the rows where all the columns are valid
+        """
+        if self._bits is None:
+            n_bytes = -(-self.n_rows // 8)
+            self._bits = np.fromfile(
+                os.path.splitext(self.filename)[0] + '.valid',
+                dtype=np.uint8).reshape(len(self.columns), n_bytes)
+        names = []
+        for column in columns:
+            if column in self.pairs:
+                names.extend(c for c in self.pairs[column] if c is not None)
+            else:
+                names.append(column)
+        mask = np.ones(self.n_rows, dtype=bool)
+        for column in names:
+            if not self.n_valid[column]:
+                return np.zeros(self.n_rows, dtype=bool)
+            mask &= np.unpackbits(self._bits[self.columns.index(column)],
+                                  count=self.n_rows).view(bool)
+        return mask
+
+    def pair(self, phase):
+        """
+        :param phase: phase name, e.g. 'Pt' or 'T'
+        :return: values and sigmas (None if there is no sigma column)
+        """
+        value, sigma = self.pairs[phase]
+        return self[value], None if sigma is None else self[sigma]
+
+    def marker(self):
+        """
+        :return: the marker phase of a marker-MgO dataset, e.g. 'Au'
+        """
+        return [m for m in self.pairs if m not in ('MgO', 'Ne', 'T')][0]
+
+    def marker_columns(self):
+        """
+        columns of a marker-MgO dataset
+
+        :return: marker, V, sigma V, V(MgO), sigma V(MgO), T, sigma T;
+            300 K without uncertainty for datasets without T
+        """
+        marker = self.marker()
+        v, s_v = self.pair(marker)
+        v_mgo, s_v_mgo = self.pair('MgO')
+        if 'T' in self.pairs:
+            temp, s_temp = self.pair('T')
+        else:
+            temp, s_temp = np.full(self.n_rows, 300.), np.zeros(self.n_rows)
+        return marker, v, s_v, v_mgo, s_v_mgo, temp, s_temp
+
+    def marker_valid(self):
+        """
+        :return: boolean mask of the rows of a marker-MgO dataset where
+            the marker, MgO and T columns are valid
+        """
+        return self.valid(*[phase for phase in (self.marker(), 'MgO', 'T')
+                            if phase in self.pairs])
+
+    def to_frame(self):
+        """
+        :return: pandas DataFrame of the dataset (a copy)
+        """
+        import pandas as pd
+        return pd.DataFrame(OrderedDict((c, np.array(self[c]))
+                                        for c in self.columns))
+
+    def tail(self, n=5):
+        """
+        :return: pandas DataFrame of the last n rows, for display
+        """
+        import pandas as pd
+        start = max(self.n_rows - n, 0)
+        return pd.DataFrame(
+            OrderedDict((c, self[c][start:]) for c in self.columns),
+            index=np.arange(start, self.n_rows))
+
+
+class DataStore(object):
+    """
+    columnar store of the CSV datasets in a directory
+    """
+
+    def __init__(self, path='./data', store_path=None):
+        """
+        :param path: directory with the CSV files
+        :param store_path: directory for the binary files, default
+            `path`/store
+        """
+        self.path = path
+        self.store_path = os.path.join(path, 'store') if store_path is None \
+            else store_path
+        self._datasets = {}
+
+    def names(self):
+        """
+        :return: sorted names of the datasets (CSV files without extension)
+        """
+        return sorted(os.path.splitext(f)[0] for f in os.listdir(self.path)
+                      if f.endswith('.csv'))
+
+    def __getitem__(self, name):
+        """
+        :param name: dataset name, e.g. 'Pt_MgO_HiT'
+        :return: Dataset, converted from the CSV file if it is new or has
+            changed
+        """
+        csv_file = os.path.join(self.path, name + '.csv')
+        schema = None
+        try:
+            with open(os.path.join(self.store_path, name + '.json')) as f:
+                schema = json.load(f)
+        except (OSError, ValueError):
+            pass
+        if os.path.exists(csv_file) and \
+                (schema is None or schema['source'] != _source(csv_file) or
+                 'n_valid' not in schema):
+            schema = None
+        dataset = self._datasets.get(name)
+        if dataset is not None and schema is not None:
+            return dataset
+        if schema is None:
+            schema = convert_csv(csv_file, self.store_path)
+        dataset = Dataset(os.path.join(self.store_path, name + '.f8'), schema)
+        self._datasets[name] = dataset
+        return dataset
@@ -0,0 +1,285 @@
+"""
+Streaming evaluation of an append-only dataset during beamtime.
+
+`CSVTail` remembers how far a CSV file has been read and parses only the
+complete lines appended since.  `StreamMonitor` evaluates the configured
+(marker, MgO) scale pairs on those rows only and folds Delta P into
+running per-bin statistics of Delta P against P(MgO) (count, mean and
+sum of squared deviations, merged with the Chan et al. update).  An
+update therefore costs time proportional to the new rows, and the
+summary costs time proportional to the number of bins.
+
+    python -m pscale.stream data/Pt_MgO_HiT.csv --summary dp.csv
+"""
+import argparse
+import io
+import os
+import time
+import numpy as np
+from . import kernels
+from .registry import get_scale
+from .store import find_pairs
+
+
+class CSVTail(object):
+    """
+    incremental reader of an append-only CSV file
+    """
+
+    def __init__(self, filename):
+        """
+        :param filename: CSV file with a header line
+        """
+        self.filename = filename
+        self.columns = None
+        self.offset = 0
+        self.n_rows = 0
+
+    def read(self):
+        """
+        :return: new complete rows as a (n_new x n_columns) float array,
+            empty fields as nan
+        """
+        with open(self.filename, 'rb') as f:
+            f.seek(self.offset)
+            chunk = f.read()
+        end = chunk.rfind(b'\n') + 1
+        chunk = chunk[:end]
+        self.offset += end
+        if self.columns is None:
+            if not chunk:
+                return np.empty((0, 0))
+            header, chunk = chunk.split(b'\n', 1)
+            self.columns = [c.strip() for c in header.decode().split(',')]
+        n_columns = len(self.columns)
+        if not chunk.strip():
+            return np.empty((0, n_columns))
+        rows = np.genfromtxt(io.BytesIO(chunk), delimiter=',', dtype=float,
+                             ndmin=2).reshape(-1, n_columns)
+        self.n_rows += rows.shape[0]
+        return rows
+
+
+class BinnedStats(object):
+    """
+    running count, mean and standard deviation of values in bins
+    """
+
+    def __init__(self, edges, n_series=1):
+        """
+        :param edges: bin edges
+        :param n_series: number of series binned on the same edges
+        """
+        self.edges = np.asarray(edges, dtype=float)
+        n_bins = self.edges.size - 1
+        self.count = np.zeros((n_series, n_bins))
+        self.mean = np.zeros((n_series, n_bins))
+        self.m2 = np.zeros((n_series, n_bins))
+
+    def update(self, x, y):
+        """
+        add values
+
+        :param x: bin coordinates, (n_series x n)
+        :param y: values, (n_series x n)
+        """
+        n_bins = self.edges.size - 1
+        for k, (xk, yk) in enumerate(zip(np.atleast_2d(x), np.atleast_2d(y))):
+            i = np.searchsorted(self.edges, xk, side='right') - 1
+            ok = (i >= 0) & (i < n_bins) & np.isfinite(yk)
+            i, yk = i[ok], yk[ok]
+            n_b = np.bincount(i, minlength=n_bins).astype(float)
+            mean_b = np.bincount(i, yk, minlength=n_bins) / np.maximum(n_b, 1)
+            m2_b = np.bincount(i, np.square(yk - mean_b[i]), minlength=n_bins)
+            seen = n_b > 0
+            n_a = self.count[k, seen]
+            n_b = n_b[seen]
+            delta = mean_b[seen] - self.mean[k, seen]
+            total = n_a + n_b
+            # Chan et al. pairwise update of mean and M2
+            self.mean[k, seen] += delta * n_b / total
+            self.m2[k, seen] += m2_b[seen] + np.square(delta) * n_a * n_b / \
+                total
+            self.count[k, seen] = total
+
+    @property
+    def std(self):
+        """
+        :return: standard deviation in every bin, nan for fewer than two
+            values
+        """
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(self.count > 1,
+                            np.sqrt(self.m2 / (self.count - 1)), np.nan)
+
+    @property
+    def centers(self):
+        """
+        :return: bin centers
+        """
+        return 0.5 * (self.edges[1:] + self.edges[:-1])
+
+
+class StreamMonitor(object):
+    """
+    binned Delta P against P(MgO) of a growing dataset
+    """
+
+    def __init__(self, filename, marker_scales, mgo_scales,
+                 edges=np.arange(0., 162., 2.), summary=None, plot=False):
+        """
+        :param filename: append-only CSV file with V(marker), V(MgO) and
+            optionally T columns, 300 K without T
+        :param marker_scales: pytheos scales of the marker
+        :param mgo_scales: pytheos scales of MgO, paired with marker_scales
+        :param edges: P(MgO) bin edges in GPa
+        :param summary: file rewritten with the binned statistics after
+            every update, None for none
+        :param plot: show a live matplotlib plot
+        """
+        self.tail = CSVTail(filename)
+        self.scales = list(zip(marker_scales, mgo_scales))
+        self.stats = BinnedStats(edges, n_series=len(self.scales))
+        self.summary = summary
+        self.plot = plot
+        self._lines = None
+
+    def _columns(self):
+        pairs = find_pairs(self.tail.columns)
+        marker = [m for m in pairs if m not in ('MgO', 'Ne', 'T')][0]
+        index = self.tail.columns.index
+        temp = index(pairs['T'][0]) if 'T' in pairs else None
+        return index(pairs[marker][0]), index(pairs['MgO'][0]), temp
+
+    def update(self):
+        """
+        process the rows appended since the last update
+
+        :return: number of new rows
+        """
+        rows = self.tail.read()
+        if rows.shape[0] == 0:
+            return 0
+        i_marker, i_mgo, i_temp = self._columns()
+        ok = np.isfinite(rows[:, i_marker]) & np.isfinite(rows[:, i_mgo])
+        temp = 300. if i_temp is None else rows[:, i_temp]
+        if i_temp is not None:
+            ok &= np.isfinite(temp)
+            temp = temp[ok]
+        x = np.empty((len(self.scales), np.count_nonzero(ok)))
+        y = np.empty_like(x)
+        for k, (scale, scale_mgo) in enumerate(self.scales):
+            x[k] = kernels.cal_p_any(scale_mgo, rows[ok, i_mgo], temp,
+                                     deriv_t=False)[0]
+            y[k] = kernels.cal_p_any(scale, rows[ok, i_marker], temp,
+                                     deriv_t=False)[0] - x[k]
+        self.stats.update(x, y)
+        if self.summary is not None:
+            self.write_summary(self.summary)
+        if self.plot:
+            self.draw()
+        return rows.shape[0]
+
+    def write_summary(self, filename):
+        """
+        write the binned statistics as CSV, bins without data are left
+        out
+
+        :param filename: output file, replaced atomically
+        """
+        s = self.stats
+        header = ['P_lo', 'P_hi']
+        for scale, scale_mgo in self.scales:
+            name = '{}-{}'.format(type(scale).__name__,
+                                  type(scale_mgo).__name__)
+            header += ['n({})'.format(name), 'dP({})'.format(name),
+                       'sdP({})'.format(name)]
+        used = s.count.sum(axis=0) > 0
+        table = [s.edges[:-1][used], s.edges[1:][used]]
+        std = s.std
+        for k in range(len(self.scales)):
+            table += [s.count[k, used],
+                      np.where(s.count[k, used] > 0, s.mean[k, used], np.nan),
+                      std[k, used]]
+        tmp = '{}.{}.tmp'.format(filename, os.getpid())
+        np.savetxt(tmp, np.transpose(table), delimiter=',', fmt='%.6e',
+                   header=','.join(header), comments='')
+        os.replace(tmp, filename)
+
+    def draw(self):
+        """
+        update the live plot
+        """
+        import matplotlib.pyplot as plt
+        s = self.stats
+        if self._lines is None:
+            plt.ion()
+            f, ax = plt.subplots(figsize=(6, 4))
+            ax.axhline(y=0, c='k', ls=':')
+            self._lines = [ax.plot([], [], 'o-', ms=4, label='{}-{}'.format(
+                type(a).__name__, type(b).__name__))[0]
+                for a, b in self.scales]
+            ax.set_xlabel('P(MgO) (GPa)')
+            ax.set_ylabel(r'$\mathdefault{{\Delta} P}$ (GPa)')
+            ax.legend(loc=3, fontsize=8)
+            self._ax = ax
+        for k, line in enumerate(self._lines):
+            used = s.count[k] > 0
+            line.set_data(s.centers[used], s.mean[k, used])
+        self._ax.relim()
+        self._ax.autoscale_view()
+        self._ax.figure.canvas.draw_idle()
+        plt.pause(0.001)
+
+    def run(self, interval=1., max_updates=None):
+        """
+        poll the file and update until interrupted
+
+        :param interval: seconds between polls
+        :param max_updates: stop after this many polls, None to run until
+            KeyboardInterrupt
+        """
+        n = 0
+        try:
+            while max_updates is None or n < max_updates:
+                self.update()
+                n += 1
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            pass
+
+
+def main(argv=None):
+    """
+    command line entry point
+
+    :param argv: command line arguments, None for sys.argv
+    """
+    parser = argparse.ArgumentParser(
+        prog='python -m pscale.stream',
+        description='Follow an append-only dataset and keep binned '
+        'Delta P against P(MgO) for the scales of the notebooks.')
+    parser.add_argument('filename', help='CSV file to follow')
+    parser.add_argument('--summary', default=None,
+                        help='CSV file for the binned statistics')
+    parser.add_argument('--plot', action='store_true', help='live plot')
+    parser.add_argument('--interval', type=float, default=1.,
+                        help='seconds between polls')
+    parser.add_argument('--bin', type=float, default=2.,
+                        help='P(MgO) bin width in GPa')
+    args = parser.parse_args(argv)
+    from .analyses import scales
+    with open(args.filename) as f:
+        columns = [c.strip() for c in f.readline().split(',')]
+    marker = [m for m in find_pairs(columns) if m not in ('MgO', 'Ne', 'T')][0]
+    monitor = StreamMonitor(
+        args.filename,
+        [get_scale('{}-{}'.format(marker, n)) for n in scales[marker]],
+        [get_scale('MgO-' + n) for n in scales['MgO']],
+        edges=np.arange(0., 160. + args.bin, args.bin),
+        summary=args.summary, plot=args.plot)
+    monitor.run(interval=args.interval)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""
+Thermodynamic derivatives of the pressure scales.
+
+The float kernels in `pscale.kernels` return dP/dV and dP/dT analytically
+next to the pressure, term by term.  One evaluation therefore gives
+
+    K_T     = -V (dP/dV)_T          isothermal bulk modulus
+    alpha K_T = (dP/dT)_V           thermal pressure coefficient
+    alpha   = (dP/dT)_V / K_T       thermal expansivity
+    P_th    = P - P_st              thermal pressure, the sum of all terms
+                                    but the static one, zero at t_ref
+
+for whole datasets, without the repeated `cal_p` calls of finite
+differences.
+
+The same derivatives convert a Clapeyron slope between scales.  A
+boundary at (V, T) of the standard with slope s_A = dP_A/dT in scale A
+moves along dV/dT = (s_A - dP_A/dT) / (dP_A/dV), so in scale B
+
+    s_B = dP_B/dV (s_A - dP_A/dT) / (dP_A/dV) + dP_B/dT.
+
+Jamieson's hugoniot scales have no kernels.  Their derivatives are
+central differences of pytheos evaluations and P_th takes one more
+evaluation at t_ref.
+"""
+from collections import namedtuple
+import numpy as np
+from . import kernels
+
+Thermo = namedtuple('Thermo', ['p', 'p_th', 'k_t', 'alpha_kt', 'alpha',
+                               'dpdv', 'dpdt'])
+Thermo.__doc__ = """
+result of `cal_thermo`
+
+:param p: pressure in GPa
+:param p_th: thermal pressure in GPa, P(V, T) - P(V, t_ref)
+:param k_t: isothermal bulk modulus in GPa
+:param alpha_kt: alpha K_T = (dP/dT)_V in GPa/K
+:param alpha: thermal expansivity in 1/K
+:param dpdv: (dP/dV)_T in GPa/A^3
+:param dpdt: (dP/dT)_V in GPa/K
+"""
+
+
+def cal_thermo(scale, v, temp):
+    """
+    calculate pressure, bulk modulus, alpha K_T and thermal pressure
+
+    :param scale: pytheos scale object
+    :param v: unit-cell volume in A^3
+    :param temp: temperature in K
+    :return: Thermo, arrays of the broadcast shape of v and temp
+    """
+    v, temp = np.broadcast_arrays(np.asarray(v, dtype=float),
+                                  np.asarray(temp, dtype=float))
+    if kernels.is_supported(scale):
+        parts = kernels.cal_p_parts(scale, v, temp)
+        p = dpdv = dpdt = p_th = 0.
+        for key, (p_t, dpdv_t, dpdt_t) in parts.items():
+            p = p + p_t
+            dpdv = dpdv + dpdv_t
+            dpdt = dpdt + dpdt_t
+            if key != 'st':
+                p_th = p_th + p_t
+        zero = np.zeros(v.shape)
+        p, dpdv, dpdt, p_th = p + zero, dpdv + zero, dpdt + zero, p_th + zero
+    else:
+        p, dpdv, dpdt = kernels.cal_p_any(scale, v, temp)
+        p_th = p - kernels.cal_p_any(scale, v, np.full(v.shape, scale.t_ref),
+                                     deriv_t=False)[0]
+    k_t = -1. * v * dpdv
+    return Thermo(p, p_th, k_t, dpdt, dpdt / k_t, dpdv, dpdt)
+
+
+def convert_slope(slope, dpdv_a, dpdt_a, dpdv_b, dpdt_b):
+    """
+    convert Clapeyron slopes with derivatives already evaluated
+
+    :param slope: dP/dT of the boundary in scale A in GPa/K
+    :param dpdv_a: (dP/dV)_T of scale A on the boundary in GPa/A^3
+    :param dpdt_a: (dP/dT)_V of scale A on the boundary in GPa/K
+    :param dpdv_b: (dP/dV)_T of scale B at the same V and T
+    :param dpdt_b: (dP/dT)_V of scale B at the same V and T
+    :return: dP/dT of the boundary in scale B in GPa/K
+    """
+    return dpdv_b * (slope - dpdt_a) / dpdv_a + dpdt_b
+
+
+def clapeyron(scale_a, scale_b, v, temp, slope):
+    """
+    convert Clapeyron slopes of a boundary between two scales
+
+    :param scale_a: pytheos scale object the slope is given in
+    :param scale_b: pytheos scale object of the same material
+    :param v: unit-cell volume of the standard on the boundary in A^3
+    :param temp: temperature on the boundary in K
+    :param slope: dP/dT of the boundary in scale A in GPa/K
+    :return: dP/dT of the boundary in scale B in GPa/K
+    """
+    __, dpdv_a, dpdt_a = kernels.cal_p_any(scale_a, v, temp)
+    __, dpdv_b, dpdt_b = kernels.cal_p_any(scale_b, v, temp)
+    return convert_slope(np.asarray(slope, dtype=float), dpdv_a, dpdt_a,
+                         dpdv_b, dpdt_b)
@@ -0,0 +1,321 @@
+"""
+Per-stage timing and memory instrumentation.
+
+Tracing wraps the functions where the analyses spend their time: CSV
+parsing (`pd.read_csv`, `np.genfromtxt`, `DataStore`), `unp.uarray`
+construction, pressure evaluation (pytheos `cal_p`, the float kernels and
+the pscale propagation functions), Delta P, bootstrap trends,
+cross-calibration and geotherms, result cache lookups, and plotting
+(`errorbar`, `tight_layout`, `savefig`).  Every call is recorded with its
+wall time, CPU time and the peak RSS of the process (through `resource`,
+or psutil where `resource` is missing, e.g. on Windows), and, with memory
+tracing, the bytes allocated at its peak through `tracemalloc`.
+
+Nothing is wrapped until tracing is enabled, so the functions run
+unchanged when it is off.  Enable it with
+
+    PSCALE_TRACE=trace.json python Comparison_High_T.py
+
+(PSCALE_TRACE_MEMORY=1 adds allocated bytes, at some cost in speed), with
+`python -m pscale.runner --trace DIR`, or with `enable()`.  At the end a
+per-stage report is printed and the events are written in the Chrome
+trace format, which chrome://tracing, Perfetto and speedscope load.
+"""
+from collections import OrderedDict
+import atexit
+import contextlib
+import functools
+import importlib
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+
+# (module, object, attribute, stage)
+targets = (
+    ('pandas', None, 'read_csv', 'csv'),
+    ('numpy', None, 'genfromtxt', 'csv'),
+    ('pscale.store', 'DataStore', '__getitem__', 'load'),
+    ('uncertainties.unumpy', None, 'uarray', 'uarray'),
+    ('pytheos.scales.objs', 'MGEOS', 'cal_p', 'cal_p'),
+    ('pytheos.scales.objs', 'JHEOS', 'cal_p', 'cal_p'),
+    ('pscale.kernels', None, 'cal_p', 'cal_p'),
+    ('pscale.linear', None, 'cal_p_linear', 'cal_p_linear'),
+    ('pscale.batch', None, 'cal_p_batch', 'cal_p_batch'),
+    ('pscale.montecarlo', None, 'cal_p_mc', 'cal_p_mc'),
+    ('pscale.deltap', None, 'cal_dp', 'cal_dp'),
+    ('pscale.bootstrap', None, 'dp_trend', 'dp_trend'),
+    ('pscale.calibration', None, 'calibrate', 'calibrate'),
+    ('pscale.profiles', None, 'adiabat', 'geotherm'),
+    ('pscale.profiles', None, 'geotherm', 'geotherm'),
+    ('pscale.cache', 'ResultCache', 'get', 'cache'),
+    ('pscale.cache', 'ResultCache', 'put', 'cache'),
+    ('matplotlib.axes', 'Axes', 'errorbar', 'errorbar'),
+    ('matplotlib.figure', 'Figure', 'tight_layout', 'tight_layout'),
+    ('matplotlib.figure', 'Figure', 'savefig', 'savefig'))
+
+_tracer = None
+_patched = []
+
+
+def _peak_rss():
+    """
+    :return: peak resident set size of the process in bytes, None where
+        neither `resource` (Unix) nor psutil is available
+    """
+    try:
+        import resource
+    except ImportError:
+        try:
+            import psutil
+        except ImportError:
+            return None
+        info = psutil.Process().memory_info()
+        # peak working set on Windows
+        return getattr(info, 'peak_wset', info.rss)
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+
+class Tracer(object):
+    """
+    recorder of stage events
+    """
+
+    def __init__(self, memory=False):
+        """
+        :param memory: record allocated bytes with `tracemalloc`
+        """
+        self.memory = memory
+        self.events = []
+        self.t0 = time.perf_counter()
+        self._stack = []
+        # tracemalloc is stopped on `disable` only if it was started here
+        self.started = memory and not tracemalloc.is_tracing()
+        if self.started:
+            tracemalloc.start()
+
+    def _fold_peak(self):
+        # the traced peak since the last event belongs to every open stage
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        for frame in self._stack:
+            frame[1] = max(frame[1], peak)
+        return current
+
+    @contextlib.contextmanager
+    def stage(self, name, **args):
+        """
+        record one stage
+
+        :param name: stage name, e.g. 'cal_p'
+        :param args: details shown with the event, e.g. the scale
+        """
+        frame = [0, 0]
+        if self.memory:
+            frame[0] = frame[1] = self._fold_peak()
+        self._stack.append(frame)
+        cpu = time.process_time()
+        t = time.perf_counter()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - t
+            cpu = time.process_time() - cpu
+            if self.memory:
+                self._fold_peak()
+            self._stack.pop()
+            event = OrderedDict([
+                ('name', name), ('start', t - self.t0), ('wall', wall),
+                ('cpu', cpu), ('rss', _peak_rss()),
+                ('depth', len(self._stack)),
+                ('thread', threading.get_ident())])
+            if self.memory:
+                event['alloc'] = frame[1] - frame[0]
+            event.update(args)
+            self.events.append(event)
+
+    def summary(self):
+        """
+        :return: OrderedDict of stage name and dict of calls, wall, cpu,
+            peak rss (None if unavailable) and alloc (largest single
+            call), in order of total wall time.  Times of nested stages
+            of the same name are counted once.
+        """
+        stages = {}
+        open_names = {}
+        for e in sorted(self.events, key=lambda e: (e['start'], e['depth'])):
+            s = stages.setdefault(e['name'], {'calls': 0, 'wall': 0.,
+                                              'cpu': 0., 'rss': None,
+                                              'alloc': None})
+            s['calls'] += 1
+            end = open_names.get(e['name'], -1.)
+            if e['start'] >= end:
+                s['wall'] += e['wall']
+                s['cpu'] += e['cpu']
+                open_names[e['name']] = e['start'] + e['wall']
+            if e['rss'] is not None:
+                s['rss'] = max(s['rss'] or 0, e['rss'])
+            if 'alloc' in e:
+                s['alloc'] = max(s['alloc'] or 0, e['alloc'])
+        return OrderedDict(sorted(stages.items(),
+                                  key=lambda item: -item[1]['wall']))
+
+    def report(self):
+        """
+        :return: text table of the stages
+        """
+        total = time.perf_counter() - self.t0
+        lines = ['{:<14s}{:>8s}{:>11s}{:>11s}{:>7s}{:>12s}{:>12s}'.format(
+            'stage', 'calls', 'wall (s)', 'cpu (s)', 'wall%',
+            'peak RSS', 'alloc')]
+        for name, s in self.summary().items():
+            lines.append(
+                '{:<14s}{:>8d}{:>11.3f}{:>11.3f}{:>6.1f}%{}{}'.format(
+                    name, s['calls'], s['wall'], s['cpu'],
+                    100. * s['wall'] / total,
+                    '{:>9.1f} MB'.format(s['rss'] / 2. ** 20)
+                    if s['rss'] is not None else '{:>12s}'.format('-'),
+                    '{:>9.1f} MB'.format(s['alloc'] / 2. ** 20)
+                    if s['alloc'] is not None else '{:>12s}'.format('-')))
+        lines.append('{:<14s}{:>8s}{:>11.3f}'.format('total', '', total))
+        return '\n'.join(lines)
+
+    def write_trace(self, filename):
+        """
+        write the events in the Chrome trace event format
+
+        :param filename: JSON file
+        """
+        pid = os.getpid()
+        trace = []
+        for e in self.events:
+            args = OrderedDict((k, v) for k, v in e.items()
+                               if k not in ('name', 'start', 'wall', 'depth',
+                                            'thread'))
+            trace.append(OrderedDict([
+                ('name', e['name']), ('cat', 'pscale'), ('ph', 'X'),
+                ('ts', 1.e6 * e['start']), ('dur', 1.e6 * e['wall']),
+                ('pid', pid), ('tid', e['thread']), ('args', args)]))
+            if e['rss'] is None:
+                continue
+            trace.append(OrderedDict([
+                ('name', 'peak RSS (MB)'), ('ph', 'C'),
+                ('ts', 1.e6 * (e['start'] + e['wall'])), ('pid', pid),
+                ('args', {'rss': e['rss'] / 2. ** 20})]))
+        with open(filename, 'w') as f:
+            json.dump({'traceEvents': trace, 'displayTimeUnit': 'ms'}, f)
+
+
+def _wrap(func, name):
+    @functools.wraps(func)
+    def traced(*args, **kwargs):
+        if _tracer is None:
+            return func(*args, **kwargs)
+        details = {}
+        if name == 'cal_p' and args:
+            details['scale'] = type(args[0]).__name__
+        with _tracer.stage(name, **details):
+            return func(*args, **kwargs)
+    traced.__wrapped__ = func
+    return traced
+
+
+def _patch():
+    for module_name, owner, attr, name in targets:
+        try:
+            module = importlib.import_module(module_name)
+        except ImportError:
+            continue
+        obj = module if owner is None else getattr(module, owner)
+        original = getattr(obj, attr)
+        wrapped = _wrap(original, name)
+        setattr(obj, attr, wrapped)
+        _patched.append((obj, attr, original))
+        if owner is None and module_name.startswith('pscale.'):
+            # pscale modules import each other's functions by name
+            for other in list(sys.modules.values()):
+                if getattr(other, '__name__', '').startswith('pscale') and \
+                        getattr(other, attr, None) is original:
+                    setattr(other, attr, wrapped)
+                    _patched.append((other, attr, original))
+
+
+def is_enabled():
+    """
+    :return: True if tracing is on
+    """
+    return _tracer is not None
+
+
+def enable(memory=False):
+    """
+    start tracing, restarts the recording if tracing is on
+
+    :param memory: also record allocated bytes with `tracemalloc`
+    :return: Tracer
+    """
+    global _tracer
+    started = False
+    if _tracer is None:
+        _patch()
+    else:
+        started = _tracer.started
+    _tracer = Tracer(memory=memory)
+    _tracer.started = _tracer.started or started
+    return _tracer
+
+
+def disable():
+    """
+    stop tracing and restore the wrapped functions
+
+    :return: Tracer with the recorded events, None if tracing was off
+    """
+    global _tracer
+    tracer = _tracer
+    _tracer = None
+    while _patched:
+        obj, attr, original = _patched.pop()
+        setattr(obj, attr, original)
+    if tracer is not None and tracer.started:
+        tracemalloc.stop()
+    return tracer
+
+
+def stage(name, **args):
+    """
+    context manager that records a stage if tracing is on
+
+    :param name: stage name
+    :param args: details shown with the event
+    """
+    if _tracer is None:
+        return contextlib.nullcontext()
+    return _tracer.stage(name, **args)
+
+
+def finish(filename=None, report=True):
+    """
+    stop tracing, write the trace file and print the report
+
+    :param filename: Chrome trace file, None for none
+    :param report: print the per-stage report to stderr
+    :return: Tracer, None if tracing was off
+    """
+    tracer = disable()
+    if tracer is None:
+        return None
+    if filename:
+        tracer.write_trace(filename)
+    if report:
+        print(tracer.report(), file=sys.stderr)
+    return tracer
+
+
+if os.environ.get('PSCALE_TRACE'):
+    enable(memory=os.environ.get('PSCALE_TRACE_MEMORY', '') not in
+           ('', '0'))
+    atexit.register(finish, os.environ['PSCALE_TRACE'])